@@ -0,0 +1,165 @@
+# audio_codec.py
+from typing import Optional
+
+import numpy as np
+
+# Telephony audio conversion between G.711 µ-law 8 kHz (what the OpenAI
+# realtime session speaks) and 16-bit linear PCM at other rates (e.g. Vonage
+# websockets: L16 16 kHz, little-endian, 640 byte / 20 ms frames).
+# Table driven and vectorised with NumPy; the resamplers keep their filter
+# state between frames so 20 ms chunks join without clicks.
+
+ULAW_RATE = 8000
+ULAW_BIAS = 0x84
+ULAW_CLIP = 32635
+
+L16_DTYPE = np.dtype("<i2")
+
+TAPS_PER_RATE_STEP = 64
+FILTER_CUTOFF = 0.46  # of the lower Nyquist rate
+
+
+def _build_ulaw_decode_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return np.where(sign, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_ulaw_encode_table() -> np.ndarray:
+    # Indexed by the int16 sample reinterpreted as uint16; same rounding as
+    # the reference g711.c encoder (14-bit magnitude, bias 33)
+    samples = np.arange(65536, dtype=np.int32)
+    samples = np.where(samples >= 32768, samples - 65536, samples) >> 2
+    mask = np.where(samples < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(samples), ULAW_CLIP >> 2) + 0x21
+    segment = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    code = (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)
+    return (code ^ mask).astype(np.uint8)
+
+
+ULAW_DECODE_TABLE = _build_ulaw_decode_table()
+ULAW_ENCODE_TABLE = _build_ulaw_encode_table()
+
+
+def ulaw_decode(data: bytes) -> np.ndarray:
+    """G.711 µ-law bytes -> int16 samples"""
+    return ULAW_DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def ulaw_encode(samples: np.ndarray) -> bytes:
+    """int16 samples -> G.711 µ-law bytes"""
+    return ULAW_ENCODE_TABLE[samples.astype(np.int16, copy=False).view(np.uint16)].tobytes()
+
+
+def l16_decode(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=L16_DTYPE)
+
+
+def l16_encode(samples: np.ndarray) -> bytes:
+    return samples.astype(L16_DTYPE, copy=False).tobytes()
+
+
+def design_lowpass(num_taps: int, cutoff: float, gain: float = 1.0) -> np.ndarray:
+    """Kaiser-windowed sinc; cutoff in cycles/sample (0..0.5)"""
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(num_taps, 8.0)
+    return taps * (gain / taps.sum())
+
+
+class PolyphaseResampler:
+    """
+    Streaming rational resampler (up by `up`, down by `down`).
+
+    Each output sample only evaluates the filter phase it needs, and the tail
+    of the input plus the phase position carry over between calls, so a
+    signal fed frame by frame comes out the same as fed in one go.
+    """
+
+    def __init__(self, up: int, down: int, taps_per_phase: Optional[int] = None):
+        self.up = up
+        self.down = down
+        # ~64 taps per output-rate period keeps the transition band narrow
+        # enough for the 300-3400 Hz telephone band at 8 kHz
+        self.taps_per_phase = taps_per_phase or -(-TAPS_PER_RATE_STEP * max(up, down) // up)
+        taps = design_lowpass(
+            self.taps_per_phase * up, FILTER_CUTOFF / max(up, down), gain=float(up)
+        )
+        # phases[p, j] = taps[p + (taps_per_phase - 1 - j) * up]: phase p's taps,
+        # oldest input first so a row lines up with an input window
+        self.phases = taps.reshape(self.taps_per_phase, up).T[:, ::-1].copy()
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float64)
+        # Position of the next output sample, in upsampled units from the chunk start
+        self._position = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        count = len(samples)
+        buffer = np.concatenate((self._history, samples.astype(np.float64, copy=False)))
+
+        available = count * self.up - self._position
+        n_out = max(0, -(-available // self.down))
+        positions = self._position + np.arange(n_out) * self.down
+        input_index, phase = np.divmod(positions, self.up)
+
+        # windows[i] = buffer[input_index[i] : input_index[i] + taps_per_phase]
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps_per_phase)
+        output = np.einsum("ij,ij->i", windows[input_index], self.phases[phase])
+
+        self._position += n_out * self.down - count * self.up
+        self._history = buffer[len(buffer) - (self.taps_per_phase - 1):]
+        return output
+
+
+def _to_int16(samples: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+
+
+class UlawToL16:
+    """µ-law 8 kHz -> 16-bit PCM at `rate`"""
+
+    def __init__(self, rate: int = 16000):
+        self.resampler = PolyphaseResampler(*_ratio(ULAW_RATE, rate))
+
+    def convert(self, data: bytes) -> bytes:
+        return l16_encode(_to_int16(self.resampler.process(ulaw_decode(data))))
+
+
+class L16ToUlaw:
+    """16-bit PCM at `rate` -> µ-law 8 kHz"""
+
+    def __init__(self, rate: int = 16000):
+        self.resampler = PolyphaseResampler(*_ratio(rate, ULAW_RATE))
+
+    def convert(self, data: bytes) -> bytes:
+        return ulaw_encode(_to_int16(self.resampler.process(l16_decode(data))))
+
+
+def _ratio(source_rate: int, target_rate: int):
+    divisor = np.gcd(source_rate, target_rate)
+    return int(target_rate // divisor), int(source_rate // divisor)
+
+
+class FrameBuffer:
+    """Re-chunks a byte stream into fixed size frames (e.g. Vonage's 640 byte frames)"""
+
+    def __init__(self, frame_bytes: int):
+        self.frame_bytes = frame_bytes
+        self._pending = bytearray()
+
+    def push(self, data: bytes) -> list:
+        self._pending += data
+        usable = len(self._pending) - len(self._pending) % self.frame_bytes
+        frames = [
+            bytes(self._pending[i:i + self.frame_bytes])
+            for i in range(0, usable, self.frame_bytes)
+        ]
+        del self._pending[:usable]
+        return frames
+
+    def clear(self):
+        self._pending.clear()
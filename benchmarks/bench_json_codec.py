@@ -0,0 +1,100 @@
+"""
+Microbenchmark for json_codec.py: every installed backend against stdlib json.
+
+    python benchmarks/bench_json_codec.py [--number 20000]
+
+"frame" cases are OpenAI realtime events as relayed by the phone services,
+"article" cases are a news_article row's JSON columns (parse_json_field) and a
+17-article GraphQL response body.
+"""
+import os
+import sys
+import base64
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import json_codec  # noqa: E402
+
+
+def sample_payloads():
+    audio = base64.b64encode(os.urandom(4800)).decode()  # 600 ms of µ-law
+    audio_delta = {
+        "type": "response.audio.delta",
+        "event_id": "event_123",
+        "response_id": "resp_123",
+        "item_id": "item_123",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": audio,
+    }
+    transcript_done = {
+        "type": "conversation.item.input_audio_transcription.completed",
+        "event_id": "event_456",
+        "item_id": "item_456",
+        "content_index": 0,
+        "transcript": "Tekoäly voi auttaa toimittajia, mutta päätökset kuuluvat ihmisille. " * 3,
+    }
+    body_blocks = [
+        {"order_index": i, "type": "paragraph", "content": "Lorem ipsum dolor sit amet. " * 8}
+        for i in range(12)
+    ]
+    sources = [
+        {"title": f"Lähde {i}", "url": f"https://example.com/{i}", "type": "web"}
+        for i in range(5)
+    ]
+    article = {
+        "id": "123",
+        "canonical_news_id": 45,
+        "language": "fi",
+        "lead": "Lyhyt ingressi uutisesta.",
+        "summary": "Tiivistelmä " * 20,
+        "published_at": "2025-01-01T12:00:00",
+        "categories": ["politiikka", "talous"],
+        "hero_image_url": "/static/images/123.jpg",
+        "body_blocks": body_blocks,
+        "sources": sources,
+    }
+    graphql_response = {"data": {"news": [dict(article, id=str(i)) for i in range(17)]}}
+    return audio_delta, transcript_done, body_blocks, sources, graphql_response
+
+
+def run(number: int):
+    audio_delta, transcript_done, body_blocks, sources, graphql_response = sample_payloads()
+    stdlib_json = json_codec._stdlib_codec()[1]
+    audio_delta_text = stdlib_json(audio_delta)
+    transcript_text = stdlib_json(transcript_done)
+    body_blocks_text = stdlib_json(body_blocks)
+    sources_text = stdlib_json(sources)
+
+    backends = []
+    for name, factory in json_codec._CODECS.items():
+        try:
+            backends.append(factory())
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+
+    cases = [
+        ("frame: decode audio delta", lambda c: c[3](audio_delta_text)),
+        ("frame: decode transcript event", lambda c: c[3](transcript_text)),
+        ("frame: encode audio delta", lambda c: c[1](audio_delta)),
+        ("article: parse JSON columns", lambda c: (c[3](body_blocks_text), c[3](sources_text))),
+        ("article: render 17-article response", lambda c: c[2](graphql_response)),
+    ]
+
+    print(f"{'case':40} {'backend':8} {'µs/op':>9} {'vs stdlib':>9}")
+    for label, case in cases:
+        baseline = None
+        for codec in sorted(backends, key=lambda c: c[0] != "stdlib"):
+            seconds = timeit.timeit(lambda: case(codec), number=number)
+            per_op = seconds / number * 1e6
+            baseline = baseline or per_op
+            print(f"{label:40} {codec[0]:8} {per_op:9.2f} {baseline / per_op:8.1f}x")
+    print(f"selected backend: {json_codec.BACKEND}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    run(parser.parse_args().number)
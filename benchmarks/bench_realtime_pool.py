@@ -0,0 +1,133 @@
+"""
+Time to first audio with and without realtime_pool.py, against a local fake
+OpenAI realtime server.
+
+    python benchmarks/bench_realtime_pool.py [--calls 20] [--connect-ms 150] ...
+    python benchmarks/bench_realtime_pool.py --serve [--port 8765]
+
+The fake server delays the websocket handshake by --connect-ms, answers
+session.update with session.updated after --configure-ms and a
+response.create with a response.audio.delta after --first-audio-ms. "cold"
+is what a call did before the pool (connect, configure, wait 250 ms, then
+the greeting); "warm" takes a pre-configured connection from the pool.
+
+--serve only runs the fake server: point OPENAI_REALTIME_URL at
+ws://127.0.0.1:<port> to exercise the phone service without OpenAI.
+"""
+import os
+import sys
+import time
+import json
+import base64
+import asyncio
+import logging
+import argparse
+import statistics
+
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from realtime_pool import RealtimeConnectionPool  # noqa: E402
+
+SESSION_UPDATE = {
+    "type": "session.update",
+    "session": {"voice": "shimmer", "instructions": "Tervehdi ja esitä kysymykset."},
+}
+AUDIO_DELTA = json.dumps({
+    "type": "response.audio.delta",
+    "delta": base64.b64encode(b"\xff" * 160).decode(),
+})
+
+
+def fake_realtime_server(connect_ms: float, configure_ms: float, first_audio_ms: float):
+    async def process_request(connection, request):
+        await asyncio.sleep(connect_ms / 1000)
+
+    async def handler(ws):
+        await ws.send(json.dumps({"type": "session.created"}))
+        async for message in ws:
+            event = json.loads(message)
+            if event["type"] == "session.update":
+                await asyncio.sleep(configure_ms / 1000)
+                await ws.send(json.dumps({"type": "session.updated", "session": event["session"]}))
+            elif event["type"] == "response.create":
+                await asyncio.sleep(first_audio_ms / 1000)
+                await ws.send(AUDIO_DELTA)
+
+    return process_request, handler
+
+
+async def first_audio(ws) -> None:
+    await ws.send(json.dumps({"type": "response.create"}))
+    async for message in ws:
+        if json.loads(message)["type"] == "response.audio.delta":
+            return
+
+
+async def cold_call(url: str) -> float:
+    started = time.perf_counter()
+    async with websockets.connect(url) as ws:
+        await asyncio.sleep(0.25)  # the old fixed delay before session.update
+        await ws.send(json.dumps(SESSION_UPDATE))
+        await first_audio(ws)
+    return (time.perf_counter() - started) * 1000
+
+
+async def warm_call(pool: RealtimeConnectionPool) -> float:
+    started = time.perf_counter()
+    ws = await pool.acquire(SESSION_UPDATE)
+    try:
+        await first_audio(ws)
+    finally:
+        await ws.close()
+    return (time.perf_counter() - started) * 1000
+
+
+def summary(label: str, samples) -> str:
+    ordered = sorted(samples)
+    return (
+        f"{label:5} p50 {statistics.median(ordered):7.1f} ms   "
+        f"p95 {ordered[int(len(ordered) * 0.95)]:7.1f} ms   max {ordered[-1]:7.1f} ms"
+    )
+
+
+async def run(args):
+    # Warm-ups cancelled by pool.stop() mid-handshake are expected here
+    logging.getLogger("websockets.server").setLevel(logging.CRITICAL)
+    process_request, handler = fake_realtime_server(
+        args.connect_ms, args.configure_ms, args.first_audio_ms
+    )
+    async with websockets.serve(handler, "127.0.0.1", args.port, process_request=process_request):
+        url = f"ws://127.0.0.1:{args.port}"
+        if args.serve:
+            print(f"fake realtime server on {url}")
+            await asyncio.Future()
+
+        cold = [await cold_call(url) for _ in range(args.calls)]
+
+        pool = RealtimeConnectionPool(url=url, api_key="test", interval=0.05)
+        pool.keep_warm(SESSION_UPDATE)
+        pool.start()
+        warm = []
+        for _ in range(args.calls):
+            # Calls arrive further apart than a warm-up takes
+            await asyncio.sleep((args.connect_ms + args.configure_ms) / 1000 + 0.1)
+            warm.append(await warm_call(pool))
+        stats = pool.stats()
+        await pool.stop()
+
+    print(summary("cold", cold))
+    print(summary("warm", warm))
+    print(f"pool: {stats['warm_hits']} warm hits, {stats['cold_opens']} cold opens")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connect-ms", type=float, default=150)
+    parser.add_argument("--configure-ms", type=float, default=100)
+    parser.add_argument("--first-audio-ms", type=float, default=60)
+    parser.add_argument("--serve", action="store_true")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,202 @@
+"""
+Row-mapping throughput with JSON columns as text vs decoded by the pool's
+json/jsonb codecs (database.init_connection).
+
+    python benchmarks/bench_row_mapping.py [--rows 10000] [--repeat 5]
+
+A synthetic result set of --rows full news_article rows. "text" is what
+asyncpg returned before: location_tags, sources, body_blocks and interviews
+as JSON strings, parsed by the parse_* helpers (with stdlib json, the
+original parser, and with json_codec). "codec" is rows as the pool returns
+them now: the decode runs in asyncpg's codec hook (timed separately, it
+still happens once per value) and map_db_row_to_news_article only validates.
+
+Page: one --page article page of decoded rows as asyncpg Records, mapped
+by the legacy mapper (dict(row) copy, every field built) and by
+ArticleRowMapper, for all columns and for a typical list projection.
+Results must be identical.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+
+from asyncpg.protocol.protocol import _create_record
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import json_codec  # noqa: E402
+import utils  # noqa: E402
+from schema import NewsArticle  # noqa: E402
+from utils import (  # noqa: E402
+    format_datetime,
+    map_db_row_to_news_article,
+    map_db_rows_to_news_articles,
+    parse_body_blocks,
+    parse_interviews,
+    parse_location_tags,
+    parse_sources,
+    remove_markdown_syntax,
+)
+
+JSON_COLUMNS = ("location_tags", "sources", "body_blocks", "interviews")
+LIST_PROJECTION = ("id", "language", "lead", "published_at", "categories", "hero_image_url")
+
+
+def legacy_map_db_row_to_news_article(row) -> NewsArticle:
+    """The mapper before ArticleRowMapper, called as legacy(dict(row))"""
+    return NewsArticle(
+        id=str(row["id"]),
+        canonical_news_id=row.get("canonical_news_id", 0),
+        language=row["language"],
+        version=row.get("version"),
+        lead=remove_markdown_syntax(row.get("lead")) if row.get("lead") else None,
+        summary=row.get("summary"),
+        status=row.get("status"),
+        location_tags=parse_location_tags(row.get("location_tags")),
+        sources=parse_sources(row.get("sources")),
+        interviews=parse_interviews(row.get("interviews")),
+        review_status=row.get("review_status"),
+        author=row.get("author"),
+        body_blocks=parse_body_blocks(row.get("body_blocks")),
+        enrichment_status=row.get("enrichment_status"),
+        markdown_content=row.get("markdown_content"),
+        published_at=format_datetime(row.get("published_at")),
+        updated_at=format_datetime(row.get("updated_at")),
+        original_article_type=row.get("original_article_type"),
+        featured=row.get("featured"),
+        categories=row.get("categories", []),
+        hero_image_url=row.get("hero_image_url"),
+    )
+
+
+def selected_values(article: NewsArticle, columns) -> dict:
+    """The fields a client selecting `columns` gets; shared empty tuples read as lists"""
+    return {
+        column: list(value) if isinstance(value, tuple) else value
+        for column in columns
+        for value in [getattr(article, column)]
+    }
+
+
+def synthetic_rows(count: int):
+    published = datetime(2025, 1, 1)
+    for i in range(count):
+        yield {
+            "id": i,
+            "canonical_news_id": i // 3,
+            "language": ("fi", "sv", "en")[i % 3],
+            "version": 1,
+            "lead": f"Helsingin kaupunginvaltuusto hyväksyi talousarvion {i}.",
+            "summary": "Valtuusto äänesti budjetista pitkän keskustelun jälkeen. " * 3,
+            "status": "published",
+            "location_tags": json.dumps({"locations": [
+                {"city": "Helsinki", "region": "Uusimaa", "country": "Finland", "continent": "Europe"},
+            ]}),
+            "sources": json.dumps([
+                {"url": f"https://example.com/{i}", "title": "Lähde", "source": "STT"},
+                f"https://example.org/{i}",
+            ]),
+            "interviews": json.dumps(["Haastattelu kaupunginjohtajan kanssa"]),
+            "review_status": "approved",
+            "author": "Toimitus",
+            "body_blocks": json.dumps([
+                {"type": "text", "order": n, "content": "Kappale tekstiä. " * 20, "html": None}
+                for n in range(6)
+            ]),
+            "enrichment_status": "done",
+            "markdown_content": None,
+            "published_at": published + timedelta(minutes=i),
+            "updated_at": published + timedelta(minutes=i, seconds=30),
+            "original_article_type": "news",
+            "featured": i % 10 == 0,
+            "categories": ["politiikka", "talous"],
+            "hero_image_url": None,
+        }
+
+
+def decode_columns(rows, loads):
+    """What the json/jsonb codec does while asyncpg reads the result"""
+    for row in rows:
+        for column in JSON_COLUMNS:
+            row[column] = loads(row[column])
+    return rows
+
+
+def best_of(repeat: int, function) -> float:
+    # Like timeit: no cyclic GC passes over the large result set while timing
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return best * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--page", type=int, default=100)
+    args = parser.parse_args()
+
+    text_rows = list(synthetic_rows(args.rows))
+
+    def map_rows(rows):
+        return [map_db_row_to_news_article(row) for row in rows]
+
+    def map_text_rows_with(loads):
+        original = utils.json_codec.loads
+        utils.json_codec.loads = loads
+        try:
+            map_rows(text_rows)
+        finally:
+            utils.json_codec.loads = original
+
+    map_rows(text_rows)  # warm the lead cache for every variant alike
+
+    text_stdlib = best_of(args.repeat, lambda: map_text_rows_with(json.loads))
+    text_codec = best_of(args.repeat, lambda: map_rows(text_rows))
+    decode = best_of(args.repeat, lambda: decode_columns([dict(r) for r in text_rows], json_codec.loads))
+    copy = best_of(args.repeat, lambda: [dict(r) for r in text_rows])
+    decode -= copy
+    decoded_rows = decode_columns([dict(r) for r in text_rows], json_codec.loads)
+    mapped = best_of(args.repeat, lambda: map_rows(decoded_rows))
+
+    assert map_rows(decoded_rows) == map_rows(text_rows)
+
+    def line(label, ms):
+        print(f"{label:38} {ms:8.1f} ms  {args.rows / ms * 1000:9.0f} rows/s")
+
+    print(f"{args.rows} rows, JSON codec {json_codec.BACKEND}")
+    line("text columns, map (stdlib json)", text_stdlib)
+    line(f"text columns, map ({json_codec.BACKEND})", text_codec)
+    line("pool codec: map only", mapped)
+    line("pool codec: decode in codec + map", decode + mapped)
+
+    print(f"\n{args.page}-article page, best of {args.repeat * 20}")
+    for label, columns in (("all columns", tuple(text_rows[0])), ("list projection", LIST_PROJECTION)):
+        # Records as asyncpg builds them for a result set with these columns
+        record_columns = {column: index for index, column in enumerate(columns)}
+        page = [
+            _create_record(record_columns, tuple(row[column] for column in columns))
+            for row in decoded_rows[: args.page]
+        ]
+        for legacy, new in zip(
+            (legacy_map_db_row_to_news_article(dict(row)) for row in page),
+            map_db_rows_to_news_articles(page),
+        ):
+            assert selected_values(legacy, columns) == selected_values(new, columns)
+        legacy_us = best_of(args.repeat * 20, lambda: [
+            legacy_map_db_row_to_news_article(dict(row)) for row in page
+        ]) * 1000
+        new_us = best_of(args.repeat * 20, lambda: map_db_rows_to_news_articles(page)) * 1000
+        print(f"{label:16} legacy {legacy_us:8.0f} µs   ArticleRowMapper {new_us:8.0f} µs "
+              f"({legacy_us / new_us:.1f}x)")
@@ -0,0 +1,99 @@
+"""
+Outbound Twilio messages per call with coalesced playback marks.
+
+    python benchmarks/bench_twilio_marks.py [--seconds 30] [--interval-ms 500]
+
+Replays one AI response of --seconds of audio as OpenAI sends it (deltas of
+20-200 ms, far faster than real time) and compares the old relay, one
+"responsePart" mark per delta in a list drained with pop(0), with
+PlaybackMarks: media + mark messages sent, mark bookkeeping time, and how far
+behind the real playback position the position known from echoed marks can
+be. The barge-in truncation point (audio sent - TRUNCATE_BUFFER_MS) does not
+depend on the marks and is the same for both.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from media_frames import PlaybackMarks, twilio_mark_frame  # noqa: E402
+
+
+def deltas(seconds: float, seed: int = 1):
+    rng = random.Random(seed)
+    remaining = int(seconds * 1000)
+    while remaining > 0:
+        ms = min(rng.choice((20, 40, 60, 100, 120, 200)), remaining)
+        remaining -= ms
+        yield ms
+
+
+def old_relay(chunks):
+    """One mark per delta; Twilio echoes them in order as playback proceeds"""
+    queue = []
+    started = time.perf_counter()
+    for _ in chunks:
+        queue.append("responsePart")
+    while queue:
+        queue.pop(0)
+    return len(chunks), (time.perf_counter() - started) * 1000
+
+
+def new_relay(chunks, interval_ms: int):
+    marks = PlaybackMarks(interval_ms)
+    sent = 0
+    boundaries = []
+    started = time.perf_counter()
+    for ms in chunks:
+        name = marks.audio_sent(ms)
+        if name is not None:
+            twilio_mark_frame("MZ00000000000000000000000000000000", name)
+            sent += 1
+            boundaries.append(marks.marked_ms)
+    if marks.flush() is not None:
+        sent += 1
+        boundaries.append(marks.marked_ms)
+    for ms in list(marks.pending):
+        marks.played(str(ms))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    # Between two echoes the known position lags the real one by up to the gap
+    gaps = [b - a for a, b in zip([0] + boundaries, boundaries)]
+    return sent, elapsed_ms, max(gaps)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--interval-ms", type=int, default=500)
+    args = parser.parse_args()
+
+    chunks = list(deltas(args.seconds))
+    old_marks, old_ms = old_relay(chunks)
+    new_marks, new_ms, lag_ms = new_relay(chunks, args.interval_ms)
+    old_total = len(chunks) + old_marks
+    new_total = len(chunks) + new_marks
+
+    print(f"{args.seconds:.0f} s of AI audio in {len(chunks)} deltas")
+    print(f"old: {old_total:5d} messages ({old_marks} marks), {old_total / args.seconds:6.1f}/s, "
+          f"bookkeeping {old_ms:.3f} ms, played position exact to one delta")
+    print(f"new: {new_total:5d} messages ({new_marks} marks), {new_total / args.seconds:6.1f}/s, "
+          f"bookkeeping {new_ms:.3f} ms, played position lags by at most {lag_ms} ms")
+    print(f"outbound messages -{(1 - new_total / old_total) * 100:.0f}%")
+
+    # The old queue at its worst: a long response buffered ahead of playback
+    for size in (1000, 10000, 50000):
+        queue = ["responsePart"] * size
+        started = time.perf_counter()
+        while queue:
+            queue.pop(0)
+        list_ms = (time.perf_counter() - started) * 1000
+        marks = PlaybackMarks(1)
+        for _ in range(size):
+            marks.audio_sent(1)
+        started = time.perf_counter()
+        marks.played(str(size))
+        deque_ms = (time.perf_counter() - started) * 1000
+        print(f"drain {size:6d} pending marks: list.pop(0) {list_ms:8.3f} ms, deque {deque_ms:8.3f} ms")
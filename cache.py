@@ -0,0 +1,239 @@
+# cache.py
+import os
+import time
+import asyncio
+import inspect
+import logging
+import functools
+import dataclasses
+from enum import Enum
+from collections import OrderedDict
+from strawberry import Info
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Bounded in-process cache with per-entry TTL and LRU eviction"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at, value, tags), oldest first
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, FrozenSet[str]]]" = (
+            OrderedDict()
+        )
+        # tag -> keys, so invalidation only touches the affected entries
+        self._tag_index: Dict[str, Set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so in-flight misses know their result may be stale
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value) and mark the entry as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl_seconds: Optional[float] = None,
+        tags: Iterable[str] = (),
+    ):
+        """Store value, evicting the least recently used entries when full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if key in self._entries:
+            self._remove(key)
+        entry_tags = frozenset(tags)
+        self._entries[key] = (time.monotonic() + ttl, value, entry_tags)
+        for tag in entry_tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop a single entry, returns True if it existed"""
+        if key not in self._entries:
+            return False
+        self._remove(key)
+        self.invalidations += 1
+        return True
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying any of the tags, returns how many were dropped"""
+        keys = set()
+        for tag in tags:
+            keys.update(self._tag_index.get(tag, ()))
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+        self.generation += 1
+        return len(keys)
+
+    def clear(self):
+        """Drop every entry"""
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._tag_index.clear()
+        self.generation += 1
+
+    def _remove(self, key: Hashable):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the /metrics endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared cache for GraphQL list resolvers
+resolver_cache = TTLCache(
+    max_entries=int(os.getenv("RESOLVER_CACHE_MAX_ENTRIES", 512)),
+    ttl_seconds=float(os.getenv("RESOLVER_CACHE_TTL_SECONDS", 60)),
+)
+
+# Misses currently being fetched, so concurrent requests share one DB query
+_inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+
+def normalize_cache_arg(value: Any) -> Hashable:
+    """Turn resolver arguments (enums, input types, lists) into a hashable key part"""
+    if isinstance(value, Enum):
+        return value.value
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return tuple(
+            (field.name, normalize_cache_arg(getattr(value, field.name)))
+            for field in dataclasses.fields(value)
+        )
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_cache_arg(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize_cache_arg(v)) for k, v in value.items()))
+    return value
+
+
+def cached_resolver(
+    name: str,
+    ttl_seconds: Optional[float] = None,
+    tags: Optional[Callable[[Dict[str, Any]], Iterable[str]]] = None,
+    vary_on: Optional[Callable[[Info], Hashable]] = None,
+):
+    """
+    Cache a Strawberry resolver's result keyed on name plus normalized arguments.
+
+    `tags` maps the bound arguments to invalidation tags (see cache_invalidation.py).
+    `vary_on` adds part of the Info (e.g. the projected columns) to the key, for
+    resolvers whose result depends on the selection set.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key_parts = []
+            for arg_name, arg_value in bound.arguments.items():
+                if arg_name == "self":
+                    continue
+                if isinstance(arg_value, Info):
+                    if vary_on:
+                        key_parts.append((arg_name, vary_on(arg_value)))
+                    continue
+                key_parts.append((arg_name, normalize_cache_arg(arg_value)))
+            key = (name, tuple(key_parts))
+
+            while True:
+                found, value = resolver_cache.get(key)
+                if found:
+                    return value
+
+                pending = _inflight.get(key)
+                if pending is None:
+                    break
+                try:
+                    return await asyncio.shield(pending)
+                except asyncio.CancelledError:
+                    # Only pass on our own cancellation; when the request that
+                    # was fetching got cancelled, fetch (or wait) again instead
+                    if not pending.cancelled() or asyncio.current_task().cancelling():
+                        raise
+
+            future = asyncio.get_running_loop().create_future()
+            _inflight[key] = future
+            generation = resolver_cache.generation
+            try:
+                value = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Waiters re-raise it; mark retrieved so asyncio does not warn
+                future.exception()
+                raise
+            else:
+                # Skip storing if an invalidation arrived while we were querying
+                if generation == resolver_cache.generation:
+                    resolver_cache.set(
+                        key,
+                        value,
+                        ttl_seconds,
+                        tags(bound.arguments) if tags else (),
+                    )
+                future.set_result(value)
+                return value
+            finally:
+                _inflight.pop(key, None)
+
+        return wrapper
+
+    return decorator
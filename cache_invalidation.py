@@ -0,0 +1,153 @@
+# cache_invalidation.py
+import os
+import json
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
+
+from cache import resolver_cache
+from database import NotificationListener, db_replica_lag_window
+
+logger = logging.getLogger(__name__)
+
+# Channel the triggers from migrations.py (0001_news_change_notify) publish to
+NEWS_CHANGES_CHANNEL = "news_changes"
+
+# While LISTEN is active, changes are pushed to us, so cached entries can live longer
+LISTEN_TTL_SECONDS = float(os.getenv("RESOLVER_CACHE_LISTEN_TTL_SECONDS", 3600))
+FALLBACK_TTL_SECONDS = resolver_cache.ttl_seconds
+
+LIST_KINDS = ("regular", "featured")
+
+listener: Optional[NotificationListener] = None
+
+
+# Tags attached to cached resolver results (used with cached_resolver(tags=...))
+def list_tags(featured: bool) -> Set[str]:
+    return {f"list:{_kind(featured)}"}
+
+
+def category_list_tags(slug: str, featured: bool) -> Set[str]:
+    kind = _kind(featured)
+    return {f"category:{slug}:{kind}", f"categories:{kind}"}
+
+
+def article_tags(article_id: Any) -> Set[str]:
+    return {f"article:{article_id}"}
+
+
+TOP_CATEGORIES_TAG = "top_categories"
+
+
+def _kind(featured: bool) -> str:
+    return "featured" if featured else "regular"
+
+
+def _kinds(*flags: Optional[bool]) -> Iterable[str]:
+    """List kinds affected by a change; unknown flags mean both kinds"""
+    known = {_kind(flag) for flag in flags if flag is not None}
+    return known or LIST_KINDS
+
+
+def tags_for_change(change: Dict[str, Any]) -> Set[str]:
+    """Map a news_changes notification payload to the cache tags it invalidates"""
+    table = change.get("table")
+    tags: Set[str] = set()
+
+    if table == "news_article":
+        tags.add(f"article:{change.get('id')}")
+        if change.get("op") != "INSERT":
+            # Language / publish date feed the category counters
+            tags.add(TOP_CATEGORIES_TAG)
+        slugs = change.get("slugs")
+        for kind in _kinds(change.get("featured"), change.get("old_featured")):
+            tags.add(f"list:{kind}")
+            if slugs is None:
+                # Category links unknown (e.g. already cascaded away on delete)
+                tags.add(f"categories:{kind}")
+            else:
+                tags.update(f"category:{slug}:{kind}" for slug in slugs)
+
+    elif table == "news_article_category":
+        tags.add(f"article:{change.get('article_id')}")
+        tags.add(TOP_CATEGORIES_TAG)
+        slug = change.get("slug")
+        for kind in _kinds(change.get("featured")):
+            tags.add(f"category:{slug}:{kind}" if slug else f"categories:{kind}")
+
+    elif table == "category":
+        tags.add(TOP_CATEGORIES_TAG)
+        for slug in filter(None, (change.get("slug"), change.get("old_slug"))):
+            tags.update(f"category:{slug}:{kind}" for kind in LIST_KINDS)
+
+    return tags
+
+
+def handle_news_change(payload: str):
+    """Drop exactly the cached entries affected by one notification"""
+    try:
+        change = json.loads(payload)
+    except ValueError:
+        logger.warning(f"Ignoring malformed {NEWS_CHANGES_CHANNEL} payload: {payload!r}")
+        return
+
+    tags = tags_for_change(change)
+    if not tags:
+        resolver_cache.clear()
+        _after_replica_lag(resolver_cache.clear)
+        return
+
+    dropped = resolver_cache.invalidate_tags(tags)
+    _after_replica_lag(resolver_cache.invalidate_tags, tags)
+    logger.debug(f"{change.get('table')} {change.get('op')}: dropped {dropped} cache entries")
+
+
+def _after_replica_lag(invalidate, *args):
+    """
+    Invalidate again once the replicas have caught up: a read served by a
+    replica right after the notification may still see the old rows, and
+    would otherwise stay cached for LISTEN_TTL_SECONDS.
+    """
+    window = db_replica_lag_window()
+    if window is not None:
+        asyncio.get_running_loop().call_later(window, invalidate, *args)
+
+
+def _on_listen_connected():
+    # Changes may have been missed while disconnected
+    resolver_cache.clear()
+    _after_replica_lag(resolver_cache.clear)
+    resolver_cache.ttl_seconds = LISTEN_TTL_SECONDS
+
+
+def _on_listen_disconnected():
+    resolver_cache.ttl_seconds = FALLBACK_TTL_SECONDS
+
+
+def cache_invalidation_stats() -> Dict[str, Any]:
+    return {
+        "listening": bool(listener and listener.connected),
+        "channel": NEWS_CHANGES_CHANNEL,
+        "notifications_received": listener.notifications_received if listener else 0,
+    }
+
+
+async def start_cache_invalidation():
+    """Start LISTENing for news changes on a dedicated connection"""
+    global listener
+    if listener is None:
+        listener = NotificationListener(
+            NEWS_CHANGES_CHANNEL,
+            handle_news_change,
+            on_connect=_on_listen_connected,
+            on_disconnect=_on_listen_disconnected,
+        )
+        listener.start()
+
+
+async def stop_cache_invalidation():
+    global listener
+    if listener is not None:
+        await listener.stop()
+        listener = None
+        _on_listen_disconnected()
@@ -0,0 +1,151 @@
+# call_control.py
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from twilio.rest import Client
+
+logger = logging.getLogger(__name__)
+
+TWILIO_API_TIMEOUT_SECONDS = float(os.getenv("TWILIO_API_TIMEOUT_SECONDS", 10))
+TWILIO_API_MAX_RETRIES = int(os.getenv("TWILIO_API_MAX_RETRIES", 3))
+TWILIO_API_RETRY_DELAY_SECONDS = float(os.getenv("TWILIO_API_RETRY_DELAY_SECONDS", 0.5))
+# Point at a local stub of the REST API for testing (default: https://api.twilio.com)
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL")
+
+
+def _is_throttled(error: Exception) -> bool:
+    return isinstance(error, TwilioRestException) and error.status == 429
+
+
+def _never_reached_twilio(error: Exception) -> bool:
+    """Safe to retry even non-idempotent requests: Twilio did not act on them"""
+    return _is_throttled(error) or isinstance(error, aiohttp.ClientConnectorError)
+
+
+def _is_transient(error: Exception) -> bool:
+    return (
+        _never_reached_twilio(error)
+        or isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError))
+        or (isinstance(error, TwilioRestException) and error.status >= 500)
+    )
+
+
+class TwilioCallControl:
+    """
+    Non-blocking Twilio call control over one shared aiohttp connection pool.
+
+    Requests have a timeout and are retried with exponential backoff; creating a
+    call is only retried when Twilio can't have placed it (throttled or no
+    connection), ending a call is idempotent and retried on any transient error.
+    """
+
+    def __init__(
+        self,
+        account_sid: Optional[str],
+        auth_token: Optional[str],
+        timeout: float = TWILIO_API_TIMEOUT_SECONDS,
+        max_retries: int = TWILIO_API_MAX_RETRIES,
+        retry_delay: float = TWILIO_API_RETRY_DELAY_SECONDS,
+        base_url: Optional[str] = TWILIO_API_BASE_URL,
+    ):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.base_url = base_url
+        self._client: Optional[Client] = None
+        self._http_client: Optional[AsyncTwilioHttpClient] = None
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _get_client(self) -> Client:
+        # Created lazily: the aiohttp session must belong to the running loop
+        if self._client is None:
+            self._http_client = AsyncTwilioHttpClient(timeout=self.timeout)
+            self._client = Client(
+                self.account_sid, self.auth_token, http_client=self._http_client
+            )
+            if self.base_url:
+                self._client.api.base_url = self.base_url
+        return self._client
+
+    async def create_call(self, to: str, from_: str, url: str) -> str:
+        """Place an outbound call and return its Call SID"""
+        call = await self._run(
+            "create_call",
+            lambda client: client.calls.create_async(to=to, from_=from_, url=url),
+            retryable=_never_reached_twilio,
+        )
+        return call.sid
+
+    async def end_call(self, call_sid: str):
+        await self._run(
+            "end_call",
+            lambda client: client.calls(call_sid).update_async(status="completed"),
+            retryable=_is_transient,
+        )
+
+    async def _run(
+        self,
+        operation: str,
+        request: Callable[[Client], Awaitable[Any]],
+        retryable: Callable[[Exception], bool],
+    ) -> Any:
+        stats = self._stats.setdefault(
+            operation,
+            {"calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0},
+        )
+        client = self._get_client()
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                return await asyncio.wait_for(request(client), self.timeout)
+            except Exception as e:
+                if attempt >= self.max_retries or not retryable(e):
+                    stats["errors"] += 1
+                    raise
+                logger.warning(f"Twilio {operation} failed ({e!r}), retrying")
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                stats["calls"] += 1
+                stats["total_ms"] += elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+            stats["retries"] += 1
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-operation request counts and latencies for /metrics"""
+        return {
+            operation: {
+                **stats,
+                "avg_ms": round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                "total_ms": round(stats["total_ms"], 3),
+                "max_ms": round(stats["max_ms"], 3),
+            }
+            for operation, stats in sorted(self._stats.items())
+        }
+
+    async def close(self):
+        if self._http_client is not None:
+            await self._http_client.close()
+        self._client = None
+        self._http_client = None
+
+
+call_control = TwilioCallControl(
+    os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN")
+)
+
+
+async def stop_call_control():
+    """Close the shared HTTP session (FastAPI shutdown)"""
+    await call_control.close()
@@ -0,0 +1,139 @@
+# call_sessions.py
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long a started call may wait for its media stream before it is forgotten
+CALL_SESSION_TTL_SECONDS = float(os.getenv("CALL_SESSION_TTL_SECONDS", 300))
+# Upper bound on calls waiting for their stream (live calls are never evicted)
+CALL_SESSION_MAX_IDLE = int(os.getenv("CALL_SESSION_MAX_IDLE", 1000))
+
+
+class CallSession:
+    """Per-call state: the interview script, the article it belongs to and the transcript"""
+
+    __slots__ = (
+        "keys",
+        "provider",
+        "call_id",
+        "stream_id",
+        "phone_script",
+        "system_prompt",
+        "article_id",
+        "conversation_log",
+        "created_at",
+        "active",
+    )
+
+    def __init__(
+        self,
+        provider: str,
+        call_id: Optional[str] = None,
+        phone_script: Optional[dict] = None,
+        system_prompt: Optional[str] = None,
+        article_id: Optional[int] = None,
+    ):
+        self.keys: List[str] = []
+        self.provider = provider
+        self.call_id = call_id
+        self.stream_id: Optional[str] = None
+        self.phone_script = phone_script
+        self.system_prompt = system_prompt
+        self.article_id = article_id
+        self.conversation_log: List[Dict[str, str]] = []
+        self.created_at = time.monotonic()
+        self.active = False
+
+
+class CallSessionRegistry:
+    """
+    Call sessions by any of their ids (Call SID, stream SID, Vonage UUID...).
+
+    Sessions created when a call is placed wait in an insertion-ordered idle
+    list until their media stream attaches; idle ones older than the TTL, or
+    beyond max_idle, are evicted from its head as new calls come in, so calls
+    that never connect don't pile up. Attached sessions live until remove().
+    """
+
+    def __init__(
+        self, ttl: float = CALL_SESSION_TTL_SECONDS, max_idle: int = CALL_SESSION_MAX_IDLE
+    ):
+        self.ttl = ttl
+        self.max_idle = max_idle
+        self.created = 0
+        self.evicted = 0
+        self._by_key: Dict[str, CallSession] = {}
+        self._idle: "OrderedDict[int, CallSession]" = OrderedDict()
+        self._active = 0
+
+    def create(self, key: str, provider: str, **fields) -> CallSession:
+        """Register a call that has been placed but not connected yet"""
+        self._evict(reserve=1)
+        session = CallSession(provider, **fields)
+        self.created += 1
+        self._idle[id(session)] = session
+        self.link(key, session)
+        return session
+
+    def link(self, key: str, session: CallSession):
+        """Make the session reachable by another id"""
+        previous = self._by_key.get(key)
+        if previous is not None and previous is not session:
+            logger.warning(f"Call session key {key} reassigned")
+            previous.keys.remove(key)
+        self._by_key[key] = session
+        if key not in session.keys:
+            session.keys.append(key)
+
+    def get(self, key: Optional[str]) -> Optional[CallSession]:
+        return self._by_key.get(key) if key else None
+
+    def attach(self, key: str, provider: str) -> CallSession:
+        """Session for a media stream that just connected (created for unknown, e.g. inbound, calls)"""
+        session = self.get(key) or self.create(key, provider)
+        if not session.active:
+            session.active = True
+            self._idle.pop(id(session), None)
+            self._active += 1
+        return session
+
+    def remove(self, session: CallSession):
+        for key in session.keys:
+            if self._by_key.get(key) is session:
+                del self._by_key[key]
+        session.keys.clear()
+        if session.active:
+            session.active = False
+            self._active -= 1
+        else:
+            self._idle.pop(id(session), None)
+
+    def _evict(self, reserve: int = 0):
+        deadline = time.monotonic() - self.ttl
+        while self._idle:
+            session = next(iter(self._idle.values()))
+            if session.created_at > deadline and len(self._idle) + reserve <= self.max_idle:
+                break
+            logger.info(f"Evicting call session {session.keys} that never connected")
+            self.remove(session)
+            self.evicted += 1
+
+    def __len__(self) -> int:
+        return self._active + len(self._idle)
+
+    def stats(self) -> Dict[str, Any]:
+        """Session counts for /metrics"""
+        self._evict()
+        return {
+            "active": self._active,
+            "idle": len(self._idle),
+            "created": self.created,
+            "evicted": self.evicted,
+        }
+
+
+call_sessions = CallSessionRegistry()
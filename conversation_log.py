@@ -0,0 +1,178 @@
+# conversation_log.py
+import os
+import re
+import gzip
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+# Finished call transcripts are appended as one compact JSON line per call
+# (NDJSON) by a background task, so file-system latency never lands on the
+# event loop that is relaying audio for the other live calls.
+CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR", "conversations_log")
+CONVERSATION_LOG_QUEUE_SIZE = int(os.getenv("CONVERSATION_LOG_QUEUE_SIZE", 1000))
+CONVERSATION_LOG_COMPRESS = os.getenv("CONVERSATION_LOG_COMPRESS", "false").lower() == "true"
+CONVERSATION_LOG_MAX_BYTES = int(os.getenv("CONVERSATION_LOG_MAX_BYTES", 64 * 1024 * 1024))
+
+_LOG_FILE = re.compile(r"^conversations_(\d{8})_(\d+)\.ndjson(\.gz)?$")
+
+
+class ConversationLogWriter:
+    """
+    Background writer for conversation logs fed by a bounded queue.
+
+    submit() never blocks: when the queue is full the record is dropped and
+    counted. The writer drains whatever is queued in one batch and appends it
+    from a worker thread, to conversations_<date>_<n>.ndjson (or .ndjson.gz,
+    one gzip member per batch), starting a new file on a new day or once the
+    current one reaches max_bytes.
+    """
+
+    def __init__(
+        self,
+        directory: str = CONVERSATION_LOG_DIR,
+        queue_size: int = CONVERSATION_LOG_QUEUE_SIZE,
+        compress: bool = CONVERSATION_LOG_COMPRESS,
+        max_bytes: int = CONVERSATION_LOG_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.bytes_written = 0
+        self.current_path: Optional[str] = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Flush what is queued (up to drain_timeout), then stop the writer"""
+        if self._task:
+            try:
+                await asyncio.wait_for(self._queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Conversation log writer stopped with {self._queue.qsize()} records unwritten"
+                )
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue one record for writing; False if it was dropped"""
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error("Conversation log queue full, record dropped")
+            return False
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                data = b"".join(json_codec.dumps_bytes(record) + b"\n" for record in batch)
+                self.bytes_written += await asyncio.to_thread(self._append, data)
+                self.written += len(batch)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Failed to write {len(batch)} conversation log records: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _append(self, data: bytes) -> int:
+        # Runs in a worker thread
+        path = self._target_path()
+        if self.compress:
+            data = gzip.compress(data)
+        with open(path, "ab") as f:
+            f.write(data)
+        return len(data)
+
+    def _target_path(self) -> str:
+        day = datetime.now().strftime("%Y%m%d")
+        path = self.current_path
+        if (
+            path is None
+            or _LOG_FILE.match(os.path.basename(path)).group(1) != day
+            or (os.path.exists(path) and os.path.getsize(path) >= self.max_bytes)
+        ):
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, self._file_name(day, self._next_index(day, path)))
+            self.current_path = path
+        return path
+
+    def _next_index(self, day: str, current: Optional[str]) -> int:
+        # Continue after the files of earlier runs today; reuse the newest one
+        # if it still has room
+        indexes = [
+            int(match.group(2))
+            for match in map(_LOG_FILE.match, os.listdir(self.directory))
+            if match and match.group(1) == day and bool(match.group(3)) == self.compress
+        ]
+        if not indexes:
+            return 1
+        newest = max(indexes)
+        newest_path = os.path.join(self.directory, self._file_name(day, newest))
+        if newest_path != current and os.path.getsize(newest_path) < self.max_bytes:
+            return newest
+        return newest + 1
+
+    def _file_name(self, day: str, index: int) -> str:
+        suffix = ".ndjson.gz" if self.compress else ".ndjson"
+        return f"conversations_{day}_{index:03d}{suffix}"
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and write counters for /metrics"""
+        return {
+            "backlog": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "bytes_written": self.bytes_written,
+            "current_file": self.current_path,
+        }
+
+
+conversation_log_writer = ConversationLogWriter()
+
+
+def conversation_record(
+    provider: str, call_id: str, messages: List[dict], dialogue_turns: List[dict], **extra
+) -> Dict[str, Any]:
+    """One NDJSON line: the raw messages and the merged speaker turns of a call"""
+    return {
+        "provider": provider,
+        "call_id": call_id,
+        "saved_at": datetime.now().isoformat(),
+        **extra,
+        "messages": messages,
+        "dialogue_turns": dialogue_turns,
+    }
+
+
+async def start_conversation_log_writer():
+    conversation_log_writer.start()
+
+
+async def stop_conversation_log_writer():
+    await conversation_log_writer.stop()
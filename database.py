@@ -1,43 +1,562 @@
 # database.py
 import asyncpg
+import asyncio
 import os
+import time
 import logging
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
 from dotenv import load_dotenv
 
+import json_codec
+from statements import PreparedConnection, registry
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-# Database connection pool
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+# How long a request waits for a free connection before failing
+DB_POOL_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT_SECONDS", 10))
+# Server-side statement_timeout of pool connections (0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+# Connections are closed on release once this old (0 disables), and when idle this long
+DB_CONNECTION_MAX_LIFETIME_SECONDS = float(os.getenv("DB_CONNECTION_MAX_LIFETIME_SECONDS", 3600))
+DB_CONNECTION_MAX_IDLE_SECONDS = float(os.getenv("DB_CONNECTION_MAX_IDLE_SECONDS", 300))
+DB_HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("DB_HEALTH_CHECK_INTERVAL_SECONDS", 30))
+DB_HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("DB_HEALTH_CHECK_TIMEOUT_SECONDS", 5))
+
+# Read replicas for GraphQL reads: "host[:port],host[:port]" (same database and user)
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+# round_robin | least_busy | lag_aware
+DB_REPLICA_SELECTION = os.getenv("DB_REPLICA_SELECTION", "least_busy").lower()
+# Replicas further behind than this are skipped (reads go to the primary if all are)
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", 5))
+DB_REPLICA_CHECK_INTERVAL_SECONDS = float(os.getenv("DB_REPLICA_CHECK_INTERVAL_SECONDS", 5))
+
+# Probe errors that mean the pooled connections are broken, not just the query
+CONNECTION_ERRORS = (
+    asyncpg.exceptions.PostgresConnectionError,
+    asyncpg.exceptions.AdminShutdownError,
+    asyncpg.exceptions.CrashShutdownError,
+    asyncpg.exceptions.CannotConnectNowError,
+    asyncpg.exceptions.InterfaceError,
+    OSError,
+)
+
+# Upper bounds (ms) of the acquire wait histogram buckets; the last one is open
+ACQUIRE_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Seconds of replay lag; 0 when the replica has replayed everything it received
+# (the replay timestamp alone grows while the primary is idle)
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+    END::float8
+"""
+
+# Database connection pool (primary) and the read replica router
 db_pool = None
+replica_router = None
 
-async def get_db_pool():
-    """Get or create database connection pool"""
-    global db_pool
-    if db_pool is None:
+
+def get_connection_kwargs() -> dict:
+    """Connection settings shared by the pool and dedicated connections"""
+    return {
+        "host": os.getenv('DB_HOST'),
+        "port": int(os.getenv('DB_PORT', 5432)),
+        "database": os.getenv('DB_NAME'),
+        "user": os.getenv('DB_USER'),
+        "password": os.getenv('DB_PASSWORD'),
+    }
+
+
+def get_replica_connection_kwargs() -> List[dict]:
+    """Connection settings of each DB_REPLICA_HOSTS entry"""
+    replicas = []
+    for entry in DB_REPLICA_HOSTS.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(":")
+        replicas.append({**get_connection_kwargs(), "host": host, "port": int(port or 5432)})
+    return replicas
+
+
+class DatabasePool:
+    """
+    The asyncpg pool behind an instrumented acquire().
+
+    acquire() waits at most acquire_timeout for a connection and records
+    the wait in a histogram, along with the number of waiters and the
+    connections in use, so the pool can be sized from data. Connections
+    older than max_lifetime are closed on release (the pool opens a fresh
+    one when needed). A background probe runs SELECT 1 every
+    health_interval (on a replica it reads the replay lag instead). When it
+    fails with a connection error, every connection is expired so broken
+    ones are replaced instead of handed out. A probe that gets no connection
+    in time only counts as saturation: recycling a busy pool would make the
+    overload worse.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        name: str = "primary",
+        replica: bool = False,
+        acquire_timeout: float = DB_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        max_lifetime: float = DB_CONNECTION_MAX_LIFETIME_SECONDS,
+        health_interval: float = DB_HEALTH_CHECK_INTERVAL_SECONDS,
+        health_timeout: float = DB_HEALTH_CHECK_TIMEOUT_SECONDS,
+    ):
+        self.pool = pool
+        self.name = name
+        self.replica = replica
+        self.lag_seconds: Optional[float] = None
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.waiting = 0
+        self.max_waiting = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.acquired = 0
+        self.acquire_timeouts = 0
+        self.max_acquire_ms = 0.0
+        self.recycled = 0
+        self.healthy: Optional[bool] = None
+        self.health_failures = 0
+        self.saturated_checks = 0
+        self.last_health_check: Optional[float] = None
+        self.last_health_ms: Optional[float] = None
+        self._acquire_histogram = [0] * (len(ACQUIRE_BUCKETS_MS) + 1)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.health_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.pool.close()
+
+    @asynccontextmanager
+    async def acquire(self, timeout: Optional[float] = None):
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = time.perf_counter()
         try:
-            db_pool = await asyncpg.create_pool(
-                host=os.getenv('DB_HOST'),
-                port=int(os.getenv('DB_PORT', 5432)),
-                database=os.getenv('DB_NAME'),
-                user=os.getenv('DB_USER'),
-                password=os.getenv('DB_PASSWORD'),
-                min_size=1,
-                max_size=10
+            conn = await self.pool.acquire(timeout=timeout or self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            logger.warning(
+                f"No database connection free within {timeout or self.acquire_timeout}s "
+                f"({self.in_use} in use, {self.waiting - 1} other waiters)"
             )
+            raise
+        finally:
+            self.waiting -= 1
+        self._record_acquire((time.perf_counter() - started) * 1000)
+
+        self.in_use += 1
+        self.max_in_use = max(self.max_in_use, self.in_use)
+        try:
+            yield conn
+        finally:
+            self.in_use -= 1
+            try:
+                if self._expired(conn):
+                    self.recycled += 1
+                    # The pool replaces a closed connection on a later acquire
+                    await conn.close()
+            finally:
+                await self.pool.release(conn)
+
+    def _expired(self, conn) -> bool:
+        created_at = getattr(conn, "created_at", None)
+        return (
+            self.max_lifetime > 0
+            and created_at is not None
+            and time.monotonic() - created_at > self.max_lifetime
+            and not conn.is_closed()
+            and not conn.is_in_transaction()
+        )
+
+    def _record_acquire(self, elapsed_ms: float):
+        self.acquired += 1
+        self.max_acquire_ms = max(self.max_acquire_ms, elapsed_ms)
+        self._acquire_histogram[bisect_left(ACQUIRE_BUCKETS_MS, elapsed_ms)] += 1
+
+    async def check_health(self) -> Optional[bool]:
+        """SELECT 1 (replica: its lag) on a pooled connection; None when no connection was free"""
+        started = time.perf_counter()
+        acquired = False
+        try:
+            async with self.acquire(timeout=self.health_timeout) as conn:
+                acquired = True
+                if self.replica:
+                    self.lag_seconds = await conn.fetchval(
+                        REPLICA_LAG_SQL, timeout=self.health_timeout
+                    )
+                else:
+                    await conn.fetchval("SELECT 1", timeout=self.health_timeout)
+            healthy = True
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            if acquired:
+                healthy = False
+                self.health_failures += 1
+                logger.error(f"Database health check ({self.name}) timed out")
+            else:
+                # Saturated, not broken; acquire() has logged it
+                self.saturated_checks += 1
+                return None
+        except CONNECTION_ERRORS as e:
+            healthy = False
+            self.health_failures += 1
+            logger.error(
+                f"Database health check ({self.name}) failed, recycling pool connections: {e}"
+            )
+            await self.pool.expire_connections()
+        except Exception as e:
+            healthy = False
+            self.health_failures += 1
+            logger.error(f"Database health check ({self.name}) failed: {e}")
+        self.last_health_check = time.time()
+        self.last_health_ms = round((time.perf_counter() - started) * 1000, 3)
+        if healthy and self.healthy is False:
+            logger.info(f"Database health check ({self.name}) recovered")
+        self.healthy = healthy
+        return healthy
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Database health probe failed: {e}")
+
+    def health(self) -> Dict[str, Any]:
+        """Last probe result for /health"""
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "last_check": self.last_health_check,
+            "last_check_ms": self.last_health_ms,
+        }
+
+    def busy(self) -> float:
+        """Share of the pool in use or waited for"""
+        return (self.in_use + self.waiting) / max(1, self.pool.get_max_size())
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool saturation for /metrics"""
+        labels = [f"le_{bound}ms" for bound in ACQUIRE_BUCKETS_MS] + [f"gt_{ACQUIRE_BUCKETS_MS[-1]}ms"]
+        return {
+            "name": self.name,
+            "lag_seconds": self.lag_seconds,
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "acquired": self.acquired,
+            "acquire_timeouts": self.acquire_timeouts,
+            "max_acquire_ms": round(self.max_acquire_ms, 3),
+            "acquire_ms_histogram": dict(zip(labels, self._acquire_histogram)),
+            "recycled": self.recycled,
+            "healthy": self.healthy,
+            "health_failures": self.health_failures,
+            "saturated_health_checks": self.saturated_checks,
+        }
+
+
+class ReplicaRouter:
+    """
+    Picks the pool for a read: one of the replicas, or the primary when none
+    is usable.
+
+    A replica is usable while its last probe succeeded (or it has not been
+    probed yet) and its lag is within max_lag. Among the usable ones,
+    round_robin takes turns, least_busy takes the one with the smallest
+    share of connections in use or waited for, and lag_aware the least
+    behind (ties by busyness).
+    """
+
+    STRATEGIES = ("round_robin", "least_busy", "lag_aware")
+
+    def __init__(
+        self,
+        primary: DatabasePool,
+        replicas: List[DatabasePool],
+        strategy: str = DB_REPLICA_SELECTION,
+        max_lag: float = DB_REPLICA_MAX_LAG_SECONDS,
+    ):
+        if strategy not in self.STRATEGIES:
+            logger.warning(f"Unknown DB_REPLICA_SELECTION {strategy}, using least_busy")
+            strategy = "least_busy"
+        self.primary = primary
+        self.replicas = replicas
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.reads = 0
+        self.primary_fallbacks = 0
+        self._next = 0
+
+    def _usable(self, replica: DatabasePool) -> bool:
+        return replica.healthy is not False and (
+            replica.lag_seconds is None or replica.lag_seconds <= self.max_lag
+        )
+
+    def choose(self) -> DatabasePool:
+        self.reads += 1
+        usable = [replica for replica in self.replicas if self._usable(replica)]
+        if not usable:
+            if self.replicas:
+                self.primary_fallbacks += 1
+            return self.primary
+        if self.strategy == "round_robin":
+            self._next = (self._next + 1) % len(usable)
+            return usable[self._next]
+        if self.strategy == "lag_aware":
+            return min(usable, key=lambda replica: (replica.lag_seconds or 0.0, replica.busy()))
+        return min(usable, key=DatabasePool.busy)
+
+    async def close(self):
+        for replica in self.replicas:
+            await replica.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing counters and per-replica pool stats for /metrics"""
+        return {
+            "strategy": self.strategy,
+            "max_lag_seconds": self.max_lag,
+            "reads": self.reads,
+            "primary_fallbacks": self.primary_fallbacks,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
+
+async def init_connection(conn):
+    """
+    Pool init hook: json/jsonb columns come back decoded and parameters are
+    encoded from Python objects, with the fast JSON codec. Codecs are set
+    before the hot statements are prepared, which pick them up.
+    """
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            schema="pg_catalog",
+            encoder=json_codec.dumps,
+            decoder=json_codec.loads,
+            format="text",
+        )
+    await registry.prepare_warm(conn)
+    conn.created_at = time.monotonic()
+
+
+async def create_pool(connection_kwargs: dict) -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        **connection_kwargs,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=DB_CONNECTION_MAX_IDLE_SECONDS,
+        server_settings={"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)},
+        connection_class=PreparedConnection,
+        init=init_connection,
+    )
+
+
+async def create_replica_pools() -> List[DatabasePool]:
+    """Pools for DB_REPLICA_HOSTS; an unreachable replica is left out (reads use the others)"""
+    replicas = []
+    for kwargs in get_replica_connection_kwargs():
+        name = f"{kwargs['host']}:{kwargs['port']}"
+        try:
+            replica = DatabasePool(
+                await create_pool(kwargs),
+                name=name,
+                replica=True,
+                health_interval=DB_REPLICA_CHECK_INTERVAL_SECONDS,
+            )
+        except Exception as e:
+            logger.error(f"Failed to create pool for read replica {name}, not using it: {e}")
+            continue
+        replica.start()
+        replicas.append(replica)
+        logger.info(f"Read replica pool {name} created")
+    return replicas
+
+
+async def get_db_pool(readonly: bool = False):
+    """
+    Get or create database connection pool. readonly=True returns a read
+    replica's pool when DB_REPLICA_HOSTS are configured (see ReplicaRouter);
+    only use it for reads that may be slightly behind the primary.
+    """
+    global db_pool, replica_router
+    if db_pool is None:
+        try:
+            db_pool = DatabasePool(await create_pool(get_connection_kwargs()))
+            db_pool.start()
             print('Connected to PostgreSQL database')
             logger.info("Database connection pool created successfully")
         except Exception as e:
             print(f'PostgreSQL pool error: {e}')
             logger.error(f"Failed to create database pool: {e}")
             raise
+        replica_router = ReplicaRouter(db_pool, await create_replica_pools())
+    if readonly and replica_router is not None:
+        return replica_router.choose()
     return db_pool
 
+def db_pool_stats() -> Optional[Dict[str, Any]]:
+    return db_pool.stats() if db_pool else None
+
+
+def db_replica_lag_window() -> Optional[float]:
+    """
+    Seconds a replica read may trail the primary: a replica is used while its
+    last probe saw at most DB_REPLICA_MAX_LAG_SECONDS, and the lag can grow
+    until the next probe has finished. None when reads are not routed to
+    replicas.
+    """
+    if not (replica_router and replica_router.replicas):
+        return None
+    return (
+        replica_router.max_lag
+        + DB_REPLICA_CHECK_INTERVAL_SECONDS
+        + DB_HEALTH_CHECK_TIMEOUT_SECONDS
+    )
+
+
+def db_replica_stats() -> Optional[Dict[str, Any]]:
+    return replica_router.stats() if replica_router and replica_router.replicas else None
+
+
+def db_health() -> Optional[Dict[str, Any]]:
+    if not db_pool:
+        return None
+    health = db_pool.health()
+    if replica_router and replica_router.replicas:
+        health["replicas"] = [replica.health() for replica in replica_router.replicas]
+    return health
+
+
 async def close_db_pool():
-    """Close database connection pool"""
-    global db_pool
+    """Close database connection pools"""
+    global db_pool, replica_router
+    if replica_router:
+        await replica_router.close()
+        replica_router = None
     if db_pool:
         await db_pool.close()
         db_pool = None
-        logger.info("Database connection pool closed")
\ No newline at end of file
+        logger.info("Database connection pool closed")
+
+
+class NotificationListener:
+    """Dedicated (non-pooled) connection that LISTENs on a channel and reconnects when lost"""
+
+    def __init__(
+        self,
+        channel: str,
+        on_notification: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None,
+        on_disconnect: Optional[Callable[[], None]] = None,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        keepalive_interval: float = 30.0,
+    ):
+        self.channel = channel
+        self.on_notification = on_notification
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.keepalive_interval = keepalive_interval
+        self.connected = False
+        self.notifications_received = 0
+        self._task: Optional[asyncio.Task] = None
+        self._conn: Optional[asyncpg.Connection] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _handle_notification(self, connection, pid, channel, payload):
+        self.notifications_received += 1
+        try:
+            self.on_notification(payload)
+        except Exception as e:
+            logger.error(f"Error handling notification on {channel}: {e}")
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._conn = await asyncpg.connect(**get_connection_kwargs())
+                self._conn.add_termination_listener(lambda conn: lost.set())
+                await self._conn.add_listener(self.channel, self._handle_notification)
+                self.connected = True
+                delay = self.reconnect_delay
+                logger.info(f"Listening for notifications on '{self.channel}'")
+                if self.on_connect:
+                    self.on_connect()
+
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), self.keepalive_interval)
+                    except asyncio.TimeoutError:
+                        # Detect half-open sockets that never report termination
+                        await self._conn.execute("SELECT 1", timeout=5)
+                logger.warning(f"Notification connection for '{self.channel}' lost")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification listener for '{self.channel}' failed: {e}")
+            finally:
+                was_connected = self.connected
+                self.connected = False
+                if self._conn is not None and not self._conn.is_closed():
+                    try:
+                        await self._conn.close()
+                    except Exception:
+                        self._conn.terminate()
+                self._conn = None
+                if was_connected and self.on_disconnect:
+                    self.on_disconnect()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
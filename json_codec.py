@@ -0,0 +1,77 @@
+# json_codec.py
+import os
+import json
+import logging
+from typing import Any, Callable, Union
+
+logger = logging.getLogger(__name__)
+
+# JSON encode/decode used on the hot paths (realtime frames, JSON columns,
+# HTTP and GraphQL responses). Picks orjson, then msgspec, then stdlib json;
+# JSON_CODEC=orjson|msgspec|stdlib forces one.
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()
+
+# Decode failures raise this for every backend (orjson/msgspec errors subclass it or are wrapped)
+JSONDecodeError = ValueError
+
+
+def _stdlib_codec():
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return encoder.encode(obj).encode("utf-8")
+
+    return "stdlib", encoder.encode, dumps_bytes, json.loads
+
+
+def _orjson_codec():
+    import orjson
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=str).decode("utf-8")
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str)
+
+    return "orjson", dumps, dumps_bytes, orjson.loads
+
+
+def _msgspec_codec():
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=str)
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj: Any) -> str:
+        return encoder.encode(obj).decode("utf-8")
+
+    def loads(data: Union[str, bytes]) -> Any:
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise JSONDecodeError(str(e)) from e
+
+    return "msgspec", dumps, encoder.encode, loads
+
+
+_CODECS = {"orjson": _orjson_codec, "msgspec": _msgspec_codec, "stdlib": _stdlib_codec}
+
+
+def _select_codec():
+    names = [JSON_CODEC] if JSON_CODEC in _CODECS else ["orjson", "msgspec", "stdlib"]
+    for name in names:
+        try:
+            return _CODECS[name]()
+        except ImportError:
+            logger.warning(f"JSON codec {name} not installed, falling back")
+    return _stdlib_codec()
+
+
+BACKEND: str
+dumps: Callable[[Any], str]
+dumps_bytes: Callable[[Any], bytes]
+loads: Callable[[Union[str, bytes]], Any]
+
+BACKEND, dumps, dumps_bytes, loads = _select_codec()
+logger.info(f"Using {BACKEND} JSON codec")
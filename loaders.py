@@ -0,0 +1,101 @@
+# loaders.py
+import logging
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from strawberry.dataloader import DataLoader
+
+from schema import NewsArticle
+from database import get_db_pool
+from similarity import fetch_similar_articles
+from statements import registry
+from utils import NEWS_ARTICLE_COLUMNS, map_db_rows_to_news_articles
+
+logger = logging.getLogger(__name__)
+
+
+class ArticleKey(NamedTuple):
+    article_id: int
+    # Columns the caller's selection needs, see utils.selected_article_columns
+    columns: Tuple[str, ...]
+
+
+SIMILAR_DEFAULT_LIMIT = 5
+SIMILAR_DEFAULT_MIN_SIMILARITY = 0.4
+
+
+class SimilarArticlesKey(NamedTuple):
+    article_id: int
+    limit: int
+    min_similarity: float
+    max_age_days: Optional[int]
+
+    @classmethod
+    def of(
+        cls,
+        article_id: int,
+        limit: Optional[int],
+        min_similarity: Optional[float],
+        max_age_days: Optional[int],
+    ) -> "SimilarArticlesKey":
+        """Key for resolver arguments; an explicit null limit or min_similarity means the default"""
+        return cls(
+            article_id,
+            SIMILAR_DEFAULT_LIMIT if limit is None else limit,
+            SIMILAR_DEFAULT_MIN_SIMILARITY if min_similarity is None else min_similarity,
+            max_age_days,
+        )
+
+
+async def load_articles_by_id(keys: List[ArticleKey]) -> List[Optional[NewsArticle]]:
+    """Batch load articles with a single WHERE id = ANY($1) query over the union of columns"""
+    wanted = {column for key in keys for column in key.columns}
+    columns = [column for column in NEWS_ARTICLE_COLUMNS if column in wanted]
+    pool = await get_db_pool(readonly=True)
+    async with pool.acquire() as conn:
+        rows = await registry.fetch_dynamic(
+            conn,
+            "articles_by_id",
+            f"SELECT {', '.join(columns)} FROM news_article WHERE id = ANY($1::bigint[])",
+            list({key.article_id for key in keys}),
+        )
+
+    articles = {
+        row["id"]: article for row, article in zip(rows, map_db_rows_to_news_articles(rows))
+    }
+    return [articles.get(key.article_id) for key in keys]
+
+
+async def load_similar_articles(
+    keys: List[SimilarArticlesKey],
+) -> List[List[NewsArticle]]:
+    """Batch similar-article searches; keys sharing the same filters share one query"""
+    groups: Dict[tuple, set] = defaultdict(set)
+    for key in keys:
+        groups[(key.limit, key.min_similarity, key.max_age_days)].add(key.article_id)
+
+    results: Dict[SimilarArticlesKey, List[NewsArticle]] = {}
+    pool = await get_db_pool(readonly=True)
+    async with pool.acquire() as conn:
+        for (limit, min_similarity, max_age_days), article_ids in groups.items():
+            similar = await fetch_similar_articles(
+                conn, list(article_ids), limit, min_similarity, max_age_days
+            )
+            for target_id, rows in similar.items():
+                key = SimilarArticlesKey(target_id, limit, min_similarity, max_age_days)
+                results[key] = map_db_rows_to_news_articles(rows)
+
+    return [results.get(key, []) for key in keys]
+
+
+class Loaders:
+    """Request-scoped DataLoaders, created per GraphQL request in main.py"""
+
+    def __init__(self):
+        self.article_by_id = DataLoader(load_fn=load_articles_by_id)
+        self.similar_by_id = DataLoader(load_fn=load_similar_articles)
+
+
+async def get_graphql_context() -> dict:
+    """Strawberry context getter: merged into the default request context"""
+    return {"loaders": Loaders()}
@@ -14,9 +14,30 @@ from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 from resolvers import Query
-from database import get_db_pool, close_db_pool
+from cache import resolver_cache
+from call_control import call_control, stop_call_control
+from call_sessions import call_sessions
+from conversation_log import (
+    conversation_log_writer,
+    start_conversation_log_writer,
+    stop_conversation_log_writer,
+)
+from cache_invalidation import (
+    cache_invalidation_stats,
+    start_cache_invalidation,
+    stop_cache_invalidation,
+)
+from database import close_db_pool, db_health, db_pool_stats, db_replica_stats, get_db_pool
+from migrations import run_migrations
+from loaders import get_graphql_context
+from media_frames import frame_stats
+from realtime_pool import realtime_pool, start_realtime_pool, stop_realtime_pool
+from similarity import similarity_stats, start_neighbor_refresher, stop_neighbor_refresher
+from statements import registry
+import json_codec
 from twilio_phone_service import setup_twilio_routes
 from vonage_phone_service import setup_vonage_routes
+from webhooks import start_webhook_dispatcher, stop_webhook_dispatcher, webhook_stats
 
 # Load environment variables
 load_dotenv()
@@ -35,7 +56,13 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     try:
-        await get_db_pool()
+        pool = await get_db_pool()
+        await run_migrations(pool)
+        await start_cache_invalidation()
+        await start_neighbor_refresher()
+        await start_conversation_log_writer()
+        await start_webhook_dispatcher()
+        await start_realtime_pool()
         logger.info("🚀 News GraphQL API started successfully")
         logger.info(f"📊 Health check available at /health")
         logger.info(f"🔍 GraphQL endpoint available at /graphql")
@@ -48,18 +75,42 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     try:
+        await stop_realtime_pool()
+        await stop_neighbor_refresher()
+        await stop_call_control()
+        await stop_conversation_log_writer()
+        await stop_webhook_dispatcher()
+        await stop_cache_invalidation()
         await close_db_pool()
         logger.info("🛑 News GraphQL API shutdown completed")
     except Exception as e:
         logger.error(f"❌ Error during shutdown: {e}")
 
 
+class CodecJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fast codec from json_codec.py"""
+
+    def render(self, content) -> bytes:
+        return json_codec.dumps_bytes(content)
+
+
+class CodecGraphQLRouter(GraphQLRouter):
+    """GraphQL router that parses requests and renders results with json_codec"""
+
+    def decode_json(self, data):
+        return json_codec.loads(data)
+
+    def encode_json(self, data) -> str:
+        return json_codec.dumps(data)
+
+
 # Create FastAPI app
 app = FastAPI(
     title="News GraphQL API",
     version="1.0.0",
     description="GraphQL API for news articles with FastAPI and Strawberry",
     lifespan=lifespan,
+    default_response_class=CodecJSONResponse,
 )
 
 # TODO:: REMEMBER UPDATE THESE WHEN WE GO FOR PRODUCTION
@@ -78,7 +129,7 @@ app.add_middleware(
 
 # Create GraphQL schema
 schema = strawberry.Schema(query=Query)
-graphql_app = GraphQLRouter(schema)
+graphql_app = CodecGraphQLRouter(schema, context_getter=get_graphql_context)
 
 # Mount GraphQL endpoint
 app.include_router(graphql_app, prefix="/graphql")
@@ -97,6 +148,29 @@ async def health_check():
         "timestamp": datetime.now().isoformat(),
         "service": "News GraphQL API",
         "version": "1.0.0",
+        "database": db_health(),
+    }
+
+
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for caches and connection handling"""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "resolver_cache": resolver_cache.stats(),
+        "cache_invalidation": cache_invalidation_stats(),
+        "database_pool": db_pool_stats(),
+        "database_replicas": db_replica_stats(),
+        "statements": registry.stats(),
+        "similar_articles": similarity_stats(),
+        "media_frames": dict(frame_stats),
+        "twilio_api": call_control.stats(),
+        "call_sessions": call_sessions.stats(),
+        "realtime_pool": realtime_pool.stats(),
+        "conversation_log": conversation_log_writer.stats(),
+        "webhooks": webhook_stats(),
+        "json_codec": json_codec.BACKEND,
     }
 
 
@@ -110,6 +184,7 @@ async def root():
         "endpoints": {
             "graphql": "/graphql",
             "health": "/health",
+            "metrics": "/metrics",
             "docs": "/docs",
             "incoming_call": "/incoming-call",
             "trigger_call": "/trigger-call (POST)",
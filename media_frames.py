@@ -0,0 +1,138 @@
+# media_frames.py
+import re
+import json
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import json_codec
+
+# Fast path for the per-20ms audio frames relayed between Twilio and OpenAI.
+# Audio frames are recognised from the start of the raw JSON text and their
+# base64 payload is sliced out and re-wrapped as is: no json.loads/dumps and
+# no base64 decode/encode. Anything unusual (other key order, escapes) returns
+# None and the caller falls back to a full json.loads.
+
+# G.711 µ-law at 8 kHz: one byte per sample, 8 bytes per millisecond
+ULAW_BYTES_PER_MS = 8
+
+_TWILIO_MEDIA = re.compile(r'\{\s*"event"\s*:\s*"media"\s*,')
+_TWILIO_PAYLOAD = re.compile(r'"payload"\s*:\s*"([A-Za-z0-9+/=]*)"')
+_TWILIO_TIMESTAMP = re.compile(r'"timestamp"\s*:\s*"?(\d+)')
+
+_OPENAI_AUDIO_DELTA = re.compile(r'\{\s*"type"\s*:\s*"response\.audio\.delta"\s*,')
+_OPENAI_DELTA = re.compile(r'"delta"\s*:\s*"([A-Za-z0-9+/=]*)"')
+
+frame_stats = {"fast_path": 0, "parsed": 0}
+
+
+def parse_twilio_media(message: str) -> Optional[Tuple[str, Optional[int]]]:
+    """(base64 payload, timestamp ms) of a Twilio "media" event, or None for anything else"""
+    if not _TWILIO_MEDIA.match(message):
+        return None
+    payload = _TWILIO_PAYLOAD.search(message)
+    if payload is None:
+        return None
+    timestamp = _TWILIO_TIMESTAMP.search(message)
+    frame_stats["fast_path"] += 1
+    return payload.group(1), int(timestamp.group(1)) if timestamp else None
+
+
+def parse_openai_audio_delta(message: str) -> Optional[str]:
+    """Base64 audio of an OpenAI "response.audio.delta" event, or None for anything else"""
+    if not _OPENAI_AUDIO_DELTA.match(message):
+        return None
+    delta = _OPENAI_DELTA.search(message)
+    if delta is None:
+        return None
+    frame_stats["fast_path"] += 1
+    return delta.group(1)
+
+
+def parse_control_event(message: str) -> dict:
+    """Full JSON parse, for the (rare) events that are not audio"""
+    frame_stats["parsed"] += 1
+    return json_codec.loads(message)
+
+
+def openai_append_frame(payload: str) -> str:
+    """input_audio_buffer.append event carrying an already base64 encoded payload"""
+    return '{"type":"input_audio_buffer.append","audio":"' + payload + '"}'
+
+
+def twilio_media_frame_prefix(stream_sid: str) -> str:
+    """Constant head of the outbound media frames of one stream"""
+    return '{"event":"media","streamSid":' + json.dumps(stream_sid) + ',"media":{"payload":"'
+
+
+def twilio_media_frame(prefix: str, payload: str) -> str:
+    return prefix + payload + '"}}'
+
+
+def base64_decoded_len(data: str) -> int:
+    """Byte length of base64 data, computed from the text without decoding it"""
+    padding = 2 if data.endswith("==") else 1 if data.endswith("=") else 0
+    return len(data) * 3 // 4 - padding
+
+
+def base64_audio_ms(data: str, bytes_per_ms: int = ULAW_BYTES_PER_MS) -> int:
+    """Duration in whole ms of base64 encoded audio"""
+    return base64_decoded_len(data) // bytes_per_ms
+
+
+def twilio_mark_frame(stream_sid: str, name: str) -> str:
+    return '{"event":"mark","streamSid":' + json.dumps(stream_sid) + ',"mark":{"name":"' + name + '"}}'
+
+
+class PlaybackMarks:
+    """
+    Coalesced Twilio playback marks for the AI audio sent on one stream.
+
+    Twilio echoes a mark back once everything sent before it has been
+    played. Instead of one mark per audio delta, a mark is due once
+    `interval_ms` of audio has been sent since the previous one; its name is
+    the total ms of audio sent so far, so an echoed mark tells how much has
+    been played. Pending marks are kept in send order in a deque.
+    """
+
+    __slots__ = ("interval_ms", "pending", "sent_ms", "marked_ms", "played_ms")
+
+    def __init__(self, interval_ms: int):
+        self.interval_ms = interval_ms
+        self.pending: Deque[int] = deque()
+        self.sent_ms = 0
+        self.marked_ms = 0
+        self.played_ms = 0
+
+    def audio_sent(self, ms: int) -> Optional[str]:
+        """Count sent audio; the name of the mark to send now, if one is due"""
+        self.sent_ms += ms
+        if self.sent_ms - self.marked_ms >= self.interval_ms:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Mark for the audio not covered by a mark yet (e.g. at the end of a response)"""
+        if self.sent_ms == self.marked_ms:
+            return None
+        self.marked_ms = self.sent_ms
+        self.pending.append(self.sent_ms)
+        return str(self.sent_ms)
+
+    def played(self, name: str):
+        """A mark echoed by Twilio: it and every mark sent before it were played"""
+        try:
+            ms = int(name)
+        except ValueError:
+            return
+        while self.pending and self.pending[0] <= ms:
+            self.played_ms = self.pending.popleft()
+
+    def clear(self):
+        """Twilio's buffer was cleared: the pending marks will never be echoed"""
+        self.pending.clear()
+        self.played_ms = self.marked_ms = self.sent_ms
+
+    @property
+    def unplayed_ms(self) -> int:
+        """Audio sent but not yet confirmed played (to the precision of the mark cadence)"""
+        return self.sent_ms - self.played_ms
@@ -0,0 +1,453 @@
+# migrations.py
+import os
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant so concurrent workers apply migrations one at a time
+MIGRATION_LOCK_ID = 724_331_001
+
+# Database objects owned by this backend (the news generator owns the tables).
+# Append new migrations to the end, never edit an applied one.
+MIGRATIONS: List[Tuple[str, str]] = [
+    (
+        "0001_news_change_notify",
+        """
+        CREATE OR REPLACE FUNCTION newsroom_notify_news_article() RETURNS trigger AS $$
+        DECLARE
+            changed_id bigint;
+            new_featured boolean;
+            old_featured boolean;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed_id := OLD.id;
+            ELSE
+                changed_id := NEW.id;
+                new_featured := COALESCE(NEW.featured, false);
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                old_featured := COALESCE(OLD.featured, false);
+            END IF;
+
+            PERFORM pg_notify('news_changes', json_build_object(
+                'table', TG_TABLE_NAME,
+                'op', TG_OP,
+                'id', changed_id,
+                'featured', new_featured,
+                'old_featured', old_featured,
+                'slugs', (
+                    SELECT json_agg(c.slug)
+                    FROM news_article_category nac
+                    JOIN category c ON c.id = nac.category_id
+                    WHERE nac.article_id = changed_id
+                )
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION newsroom_notify_news_article_category() RETURNS trigger AS $$
+        DECLARE
+            link RECORD;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                link := OLD;
+            ELSE
+                link := NEW;
+            END IF;
+
+            PERFORM pg_notify('news_changes', json_build_object(
+                'table', TG_TABLE_NAME,
+                'op', TG_OP,
+                'article_id', link.article_id,
+                'slug', (SELECT slug FROM category WHERE id = link.category_id),
+                'featured', (
+                    SELECT COALESCE(featured, false)
+                    FROM news_article
+                    WHERE id = link.article_id
+                )
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION newsroom_notify_category() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('news_changes', json_build_object(
+                'table', TG_TABLE_NAME,
+                'op', TG_OP,
+                'slug', CASE WHEN TG_OP = 'DELETE' THEN OLD.slug ELSE NEW.slug END,
+                'old_slug', CASE WHEN TG_OP = 'UPDATE' THEN OLD.slug END
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS newsroom_notify_news_article ON news_article;
+        CREATE TRIGGER newsroom_notify_news_article
+            AFTER INSERT OR UPDATE OR DELETE ON news_article
+            FOR EACH ROW EXECUTE FUNCTION newsroom_notify_news_article();
+
+        DROP TRIGGER IF EXISTS newsroom_notify_news_article_category ON news_article_category;
+        CREATE TRIGGER newsroom_notify_news_article_category
+            AFTER INSERT OR UPDATE OR DELETE ON news_article_category
+            FOR EACH ROW EXECUTE FUNCTION newsroom_notify_news_article_category();
+
+        DROP TRIGGER IF EXISTS newsroom_notify_category ON category;
+        CREATE TRIGGER newsroom_notify_category
+            AFTER INSERT OR UPDATE OR DELETE ON category
+            FOR EACH ROW EXECUTE FUNCTION newsroom_notify_category();
+        """,
+    ),
+    (
+        "0002_category_article_stats",
+        """
+        -- Article counts per category, kept up to date by triggers so that
+        -- top_categories reads O(categories) rows instead of joining every link.
+        CREATE TABLE IF NOT EXISTS category_article_totals (
+            category_id bigint NOT NULL,
+            language text NOT NULL,
+            article_count bigint NOT NULL DEFAULT 0,
+            PRIMARY KEY (category_id, language)
+        );
+
+        -- Same counts bucketed by publish day, for time-window queries
+        CREATE TABLE IF NOT EXISTS category_article_daily (
+            category_id bigint NOT NULL,
+            language text NOT NULL,
+            day date NOT NULL,
+            article_count bigint NOT NULL DEFAULT 0,
+            PRIMARY KEY (category_id, language, day)
+        );
+        CREATE INDEX IF NOT EXISTS category_article_daily_day_idx
+            ON category_article_daily (day);
+
+        CREATE OR REPLACE FUNCTION newsroom_bump_category_stats(
+            p_category_id bigint, p_language text, p_published_at timestamptz, p_delta int
+        ) RETURNS void AS $$
+        BEGIN
+            INSERT INTO category_article_totals AS t (category_id, language, article_count)
+            VALUES (p_category_id, COALESCE(p_language, ''), p_delta)
+            ON CONFLICT (category_id, language)
+            DO UPDATE SET article_count = t.article_count + EXCLUDED.article_count;
+
+            IF p_published_at IS NOT NULL THEN
+                INSERT INTO category_article_daily AS d (category_id, language, day, article_count)
+                VALUES (p_category_id, COALESCE(p_language, ''), p_published_at::date, p_delta)
+                ON CONFLICT (category_id, language, day)
+                DO UPDATE SET article_count = d.article_count + EXCLUDED.article_count;
+            END IF;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION newsroom_category_stats_link() RETURNS trigger AS $$
+        DECLARE
+            article RECORD;
+        BEGIN
+            -- When the article itself is deleted, the cascaded link delete finds
+            -- no article; newsroom_category_stats_article already counted it out.
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                SELECT language, published_at INTO article
+                FROM news_article WHERE id = OLD.article_id;
+                IF FOUND THEN
+                    PERFORM newsroom_bump_category_stats(
+                        OLD.category_id, article.language, article.published_at, -1
+                    );
+                END IF;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                SELECT language, published_at INTO article
+                FROM news_article WHERE id = NEW.article_id;
+                IF FOUND THEN
+                    PERFORM newsroom_bump_category_stats(
+                        NEW.category_id, article.language, article.published_at, 1
+                    );
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION newsroom_category_stats_article() RETURNS trigger AS $$
+        DECLARE
+            link RECORD;
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND OLD.language IS NOT DISTINCT FROM NEW.language
+               AND OLD.published_at IS NOT DISTINCT FROM NEW.published_at THEN
+                RETURN NULL;
+            END IF;
+
+            FOR link IN
+                SELECT category_id FROM news_article_category WHERE article_id = OLD.id
+            LOOP
+                PERFORM newsroom_bump_category_stats(
+                    link.category_id, OLD.language, OLD.published_at, -1
+                );
+                IF TG_OP = 'UPDATE' THEN
+                    PERFORM newsroom_bump_category_stats(
+                        link.category_id, NEW.language, NEW.published_at, 1
+                    );
+                END IF;
+            END LOOP;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Triggers first: CREATE TRIGGER waits out concurrent writers, so the
+        -- backfill below sees every row written before the counters took over.
+        DROP TRIGGER IF EXISTS newsroom_category_stats_link ON news_article_category;
+        CREATE TRIGGER newsroom_category_stats_link
+            AFTER INSERT OR UPDATE OR DELETE ON news_article_category
+            FOR EACH ROW EXECUTE FUNCTION newsroom_category_stats_link();
+
+        -- BEFORE DELETE, so the article's links are still there to count out
+        DROP TRIGGER IF EXISTS newsroom_category_stats_article_delete ON news_article;
+        CREATE TRIGGER newsroom_category_stats_article_delete
+            BEFORE DELETE ON news_article
+            FOR EACH ROW EXECUTE FUNCTION newsroom_category_stats_article();
+
+        DROP TRIGGER IF EXISTS newsroom_category_stats_article_update ON news_article;
+        CREATE TRIGGER newsroom_category_stats_article_update
+            AFTER UPDATE OF language, published_at ON news_article
+            FOR EACH ROW EXECUTE FUNCTION newsroom_category_stats_article();
+
+        TRUNCATE category_article_totals, category_article_daily;
+
+        INSERT INTO category_article_totals (category_id, language, article_count)
+        SELECT nac.category_id, COALESCE(na.language, ''), COUNT(DISTINCT na.id)
+        FROM news_article_category nac
+        JOIN news_article na ON na.id = nac.article_id
+        GROUP BY 1, 2;
+
+        INSERT INTO category_article_daily (category_id, language, day, article_count)
+        SELECT nac.category_id, COALESCE(na.language, ''), na.published_at::date, COUNT(DISTINCT na.id)
+        FROM news_article_category nac
+        JOIN news_article na ON na.id = nac.article_id
+        WHERE na.published_at IS NOT NULL
+        GROUP BY 1, 2, 3;
+        """,
+    ),
+    (
+        "0003_article_neighbors",
+        """
+        -- Precomputed top-K similar articles, refreshed by similarity.py
+        CREATE TABLE IF NOT EXISTS article_neighbors (
+            article_id bigint NOT NULL REFERENCES news_article(id) ON DELETE CASCADE,
+            rank smallint NOT NULL,
+            neighbor_id bigint NOT NULL REFERENCES news_article(id) ON DELETE CASCADE,
+            similarity real NOT NULL,
+            PRIMARY KEY (article_id, rank)
+        );
+        CREATE INDEX IF NOT EXISTS article_neighbors_neighbor_idx
+            ON article_neighbors (neighbor_id);
+
+        -- Articles whose neighbor list must be (re)computed
+        CREATE TABLE IF NOT EXISTS article_neighbors_stale (
+            article_id bigint PRIMARY KEY REFERENCES news_article(id) ON DELETE CASCADE,
+            queued_at timestamptz NOT NULL DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS article_neighbors_stale_queued_idx
+            ON article_neighbors_stale (queued_at);
+
+        CREATE OR REPLACE FUNCTION newsroom_queue_article_neighbors() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                -- Lists that contain the deleted article lose an entry
+                INSERT INTO article_neighbors_stale (article_id)
+                SELECT DISTINCT article_id FROM article_neighbors
+                WHERE neighbor_id = OLD.id AND article_id <> OLD.id
+                ON CONFLICT DO NOTHING;
+                RETURN OLD;
+            END IF;
+
+            IF NEW.embedding IS NOT NULL
+               AND (TG_OP = 'INSERT' OR OLD.embedding IS DISTINCT FROM NEW.embedding) THEN
+                INSERT INTO article_neighbors_stale (article_id)
+                VALUES (NEW.id)
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS newsroom_queue_article_neighbors ON news_article;
+        CREATE TRIGGER newsroom_queue_article_neighbors
+            AFTER INSERT OR UPDATE OF embedding ON news_article
+            FOR EACH ROW EXECUTE FUNCTION newsroom_queue_article_neighbors();
+
+        DROP TRIGGER IF EXISTS newsroom_queue_article_neighbors_delete ON news_article;
+        CREATE TRIGGER newsroom_queue_article_neighbors_delete
+            BEFORE DELETE ON news_article
+            FOR EACH ROW EXECUTE FUNCTION newsroom_queue_article_neighbors();
+
+        -- Backfill: the refresher works through existing articles in the background
+        INSERT INTO article_neighbors_stale (article_id)
+        SELECT id FROM news_article WHERE embedding IS NOT NULL
+        ON CONFLICT DO NOTHING;
+        """,
+    ),
+    (
+        "0004_webhook_outbox",
+        """
+        -- Outgoing webhooks, delivered at least once by webhooks.py. A row is
+        -- written in the same transaction as the change it reports; claiming
+        -- pushes next_attempt_at forward by a lease, so a row held by a worker
+        -- that died becomes due again once the lease runs out.
+        CREATE TABLE IF NOT EXISTS webhook_outbox (
+            id bigserial PRIMARY KEY,
+            event text NOT NULL,
+            url text NOT NULL,
+            payload jsonb NOT NULL,
+            attempts integer NOT NULL DEFAULT 0,
+            next_attempt_at timestamptz NOT NULL DEFAULT NOW(),
+            last_error text,
+            created_at timestamptz NOT NULL DEFAULT NOW(),
+            delivered_at timestamptz,
+            -- Gave up after the maximum number of attempts (kept for replay)
+            failed_at timestamptz
+        );
+        CREATE INDEX IF NOT EXISTS webhook_outbox_due_idx
+            ON webhook_outbox (next_attempt_at)
+            WHERE delivered_at IS NULL AND failed_at IS NULL;
+        """,
+    ),
+    (
+        "0005_category_stats_article_delete",
+        """
+        -- 0002 returned NULL from the BEFORE DELETE trigger as well, which
+        -- cancelled every article delete after counting the article out.
+        CREATE OR REPLACE FUNCTION newsroom_category_stats_article() RETURNS trigger AS $$
+        DECLARE
+            link RECORD;
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND OLD.language IS NOT DISTINCT FROM NEW.language
+               AND OLD.published_at IS NOT DISTINCT FROM NEW.published_at THEN
+                RETURN NULL;
+            END IF;
+
+            FOR link IN
+                SELECT category_id FROM news_article_category WHERE article_id = OLD.id
+            LOOP
+                PERFORM newsroom_bump_category_stats(
+                    link.category_id, OLD.language, OLD.published_at, -1
+                );
+                IF TG_OP = 'UPDATE' THEN
+                    PERFORM newsroom_bump_category_stats(
+                        link.category_id, NEW.language, NEW.published_at, 1
+                    );
+                END IF;
+            END LOOP;
+
+            -- BEFORE DELETE: NULL would skip the delete
+            IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Recount: every cancelled delete left the counters one too low
+        TRUNCATE category_article_totals, category_article_daily;
+
+        INSERT INTO category_article_totals (category_id, language, article_count)
+        SELECT nac.category_id, COALESCE(na.language, ''), COUNT(DISTINCT na.id)
+        FROM news_article_category nac
+        JOIN news_article na ON na.id = nac.article_id
+        GROUP BY 1, 2;
+
+        INSERT INTO category_article_daily (category_id, language, day, article_count)
+        SELECT nac.category_id, COALESCE(na.language, ''), na.published_at::date, COUNT(DISTINCT na.id)
+        FROM news_article_category nac
+        JOIN news_article na ON na.id = nac.article_id
+        WHERE na.published_at IS NOT NULL
+        GROUP BY 1, 2, 3;
+        """,
+    ),
+    (
+        "0006_article_neighbors_propagate",
+        """
+        -- A new or re-embedded article may belong in other articles' lists.
+        -- propagate marks the queue entries whose refresh must also queue
+        -- those lists (see similarity.QUEUE_REVERSE_NEIGHBORS_SQL); lists
+        -- queued that way or by a deleted neighbor do not propagate further.
+        ALTER TABLE article_neighbors_stale
+            ADD COLUMN IF NOT EXISTS propagate boolean NOT NULL DEFAULT false;
+
+        CREATE OR REPLACE FUNCTION newsroom_queue_article_neighbors() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                -- Lists that contain the deleted article lose an entry
+                INSERT INTO article_neighbors_stale (article_id)
+                SELECT DISTINCT article_id FROM article_neighbors
+                WHERE neighbor_id = OLD.id AND article_id <> OLD.id
+                ON CONFLICT DO NOTHING;
+                RETURN OLD;
+            END IF;
+
+            IF NEW.embedding IS NOT NULL
+               AND (TG_OP = 'INSERT' OR OLD.embedding IS DISTINCT FROM NEW.embedding) THEN
+                INSERT INTO article_neighbors_stale (article_id, propagate)
+                VALUES (NEW.id, true)
+                ON CONFLICT (article_id) DO UPDATE SET propagate = true;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Lists computed so far never picked up articles inserted after them
+        INSERT INTO article_neighbors_stale (article_id)
+        SELECT id FROM news_article WHERE embedding IS NOT NULL
+        ON CONFLICT DO NOTHING;
+        """,
+    ),
+]
+
+
+async def run_migrations(pool):
+    """Apply pending migrations. Failures are logged, the server keeps running without them"""
+    if os.getenv("DB_RUN_MIGRATIONS", "true").lower() != "true":
+        logger.info("DB_RUN_MIGRATIONS disabled, skipping migrations")
+        return
+
+    async with pool.acquire() as conn:
+        # Backfills and waiting for another instance's lock may outlast
+        # DB_STATEMENT_TIMEOUT_MS; the pool resets this on release
+        await conn.execute("SET statement_timeout = 0")
+        await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+        try:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS backend_schema_migrations (
+                    name text PRIMARY KEY,
+                    applied_at timestamptz NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            applied = {
+                row["name"]
+                for row in await conn.fetch("SELECT name FROM backend_schema_migrations")
+            }
+
+            for name, sql in MIGRATIONS:
+                if name in applied:
+                    continue
+                try:
+                    async with conn.transaction():
+                        await conn.execute(sql)
+                        await conn.execute(
+                            "INSERT INTO backend_schema_migrations (name) VALUES ($1)",
+                            name,
+                        )
+                    logger.info(f"Applied migration {name}")
+                except Exception as e:
+                    # Later migrations may depend on this one, so stop here
+                    logger.warning(f"Migration {name} failed, skipping the rest: {e}")
+                    break
+
+        except Exception as e:
+            logger.warning(f"Could not run migrations: {e}")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
@@ -0,0 +1,274 @@
+# realtime_pool.py
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import websockets
+from websockets.protocol import State
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+# Point at a local fake realtime server for testing
+OPENAI_REALTIME_URL = os.getenv(
+    "OPENAI_REALTIME_URL",
+    "wss://api.openai.com/v1/realtime?model=gpt-4o-mini-realtime-preview-2024-12-17",
+)
+# Ready connections kept per always-warm configuration (the default script)
+REALTIME_POOL_SIZE = int(os.getenv("REALTIME_POOL_SIZE", 1))
+# Unused warm connections are closed after this long (realtime sessions expire server side)
+REALTIME_POOL_MAX_IDLE_SECONDS = float(os.getenv("REALTIME_POOL_MAX_IDLE_SECONDS", 300))
+REALTIME_POOL_INTERVAL_SECONDS = 5.0
+# Connect + session.update -> session.updated
+REALTIME_READY_TIMEOUT_SECONDS = float(os.getenv("REALTIME_READY_TIMEOUT_SECONDS", 10))
+
+TTFA_SAMPLES = 500
+
+
+def config_key(session_update: Dict[str, Any]) -> str:
+    """Pool key of a session.update: hash of voice, instructions, language etc."""
+    canonical = json.dumps(session_update, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+class _WarmConnection:
+    __slots__ = ("task", "created_at")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.created_at = time.monotonic()
+
+
+class RealtimeConnectionPool:
+    """
+    Pre-connected, pre-configured OpenAI realtime websockets.
+
+    A warm connection has finished the websocket handshake and had its
+    session.update acknowledged, so a call can start talking as soon as it is
+    handed out. Connections are keyed by their session configuration:
+    keep_warm() configurations are topped up to `size` in the background,
+    prewarm() opens a one-off connection for a call that is about to connect
+    (e.g. while the phone rings). acquire() waits for a connection that is
+    still warming up instead of opening a second one, and falls back to a
+    cold connect when there is none.
+    """
+
+    def __init__(
+        self,
+        url: str = OPENAI_REALTIME_URL,
+        api_key: Optional[str] = None,
+        size: int = REALTIME_POOL_SIZE,
+        max_idle: float = REALTIME_POOL_MAX_IDLE_SECONDS,
+        ready_timeout: float = REALTIME_READY_TIMEOUT_SECONDS,
+        interval: float = REALTIME_POOL_INTERVAL_SECONDS,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.size = size
+        self.max_idle = max_idle
+        self.ready_timeout = ready_timeout
+        self.interval = interval
+        self.warm_hits = 0
+        self.cold_opens = 0
+        self.open_failures = 0
+        self.expired = 0
+        self._entries: Dict[str, Deque[_WarmConnection]] = {}
+        self._persistent: Dict[str, Dict[str, Any]] = {}
+        self._ready_ms: Deque[float] = deque(maxlen=TTFA_SAMPLES)
+        self._ttfa_ms: Deque[float] = deque(maxlen=TTFA_SAMPLES)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for entries in self._entries.values():
+            while entries:
+                await self._discard(entries.popleft())
+
+    def keep_warm(self, session_update: Dict[str, Any]):
+        """Keep `size` ready connections for this configuration at all times"""
+        self._persistent[config_key(session_update)] = session_update
+        self._wake.set()
+
+    def prewarm(self, session_update: Dict[str, Any]):
+        """Open one connection for a call that will ask for this configuration soon"""
+        self._add(config_key(session_update), session_update)
+
+    async def acquire(self, session_update: Dict[str, Any]):
+        """A configured realtime websocket; the caller owns (and closes) it"""
+        key = config_key(session_update)
+        entries = self._entries.get(key)
+        while entries:
+            entry = entries.popleft()
+            if key in self._persistent:
+                self._wake.set()
+            try:
+                # wait() instead of awaiting the task: a warm-up that failed or
+                # was cancelled must not raise here
+                await asyncio.wait([entry.task])
+            except asyncio.CancelledError:
+                await self._discard(entry)
+                raise
+            if entry.task.cancelled() or entry.task.exception() is not None:
+                continue  # failures are logged by _opened
+            ws = entry.task.result()
+            if ws.state is State.OPEN:
+                self.warm_hits += 1
+                return ws
+            await self._discard(entry)
+
+        self.cold_opens += 1
+        return await self._open(session_update)
+
+    def record_time_to_first_audio(self, elapsed_ms: float):
+        self._ttfa_ms.append(elapsed_ms)
+
+    def _add(self, key: str, session_update: Dict[str, Any]):
+        task = asyncio.create_task(self._open(session_update))
+        task.add_done_callback(self._opened)
+        self._entries.setdefault(key, deque()).append(_WarmConnection(task))
+
+    def _opened(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.open_failures += 1
+            logger.warning(f"Could not pre-warm OpenAI realtime connection: {task.exception()}")
+
+    async def _open(self, session_update: Dict[str, Any]):
+        started = time.perf_counter()
+        ws = await websockets.connect(
+            self.url,
+            additional_headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "OpenAI-Beta": "realtime=v1",
+            },
+        )
+        try:
+            await ws.send(json_codec.dumps(session_update))
+            await asyncio.wait_for(self._wait_until_configured(ws), self.ready_timeout)
+        except BaseException:
+            await ws.close()
+            raise
+        self._ready_ms.append((time.perf_counter() - started) * 1000)
+        return ws
+
+    @staticmethod
+    async def _wait_until_configured(ws):
+        # session.created arrives first, then the acknowledgement of our update
+        async for message in ws:
+            event = json_codec.loads(message)
+            if event.get("type") == "session.updated":
+                return
+            if event.get("type") == "error":
+                raise RuntimeError(f"OpenAI rejected session.update: {event.get('error')}")
+        raise ConnectionError("OpenAI realtime connection closed before session.updated")
+
+    async def _discard(self, entry: _WarmConnection):
+        if not entry.task.done():
+            entry.task.cancel()
+            return
+        if not entry.task.cancelled() and entry.task.exception() is None:
+            try:
+                await entry.task.result().close()
+            except Exception:
+                pass
+
+    async def _maintain(self):
+        # Sweep without awaiting, so acquire() never sees a half-swept pool
+        deadline = time.monotonic() - self.max_idle
+        discarded = []
+        for key, entries in list(self._entries.items()):
+            kept = deque()
+            for entry in entries:
+                failed = entry.task.done() and (
+                    entry.task.cancelled()
+                    or entry.task.exception() is not None
+                    or entry.task.result().state is not State.OPEN
+                )
+                if failed or entry.created_at < deadline:
+                    if not failed:
+                        self.expired += 1
+                    discarded.append(entry)
+                else:
+                    kept.append(entry)
+            if kept:
+                self._entries[key] = kept
+            else:
+                del self._entries[key]
+
+        for key, session_update in self._persistent.items():
+            for _ in range(self.size - len(self._entries.get(key, ()))):
+                self._add(key, session_update)
+
+        for entry in discarded:
+            await self._discard(entry)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self._maintain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Realtime pool maintenance failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool hit rate, warm-up time and time to first audio for /metrics"""
+        entries = [entry for entries in self._entries.values() for entry in entries]
+        return {
+            "warm_hits": self.warm_hits,
+            "cold_opens": self.cold_opens,
+            "open_failures": self.open_failures,
+            "expired": self.expired,
+            "ready": sum(1 for entry in entries if entry.task.done()),
+            "warming": sum(1 for entry in entries if not entry.task.done()),
+            "always_warm_configs": len(self._persistent),
+            "ready_ms": _percentiles(self._ready_ms),
+            "time_to_first_audio_ms": _percentiles(self._ttfa_ms),
+        }
+
+
+def _percentiles(samples) -> Optional[Dict[str, float]]:
+    if not samples:
+        return None
+    ordered: List[float] = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": round(ordered[len(ordered) // 2], 3),
+        "p95": round(ordered[int(len(ordered) * 0.95)], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+realtime_pool = RealtimeConnectionPool(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+async def start_realtime_pool():
+    if realtime_pool.api_key:
+        realtime_pool.start()
+    else:
+        logger.info("OPENAI_API_KEY not set, realtime connections are not pre-warmed")
+
+
+async def stop_realtime_pool():
+    await realtime_pool.stop()
@@ -1,21 +1,320 @@
 # resolvers.py
+import asyncpg
 import strawberry
 from strawberry import ID
 import logging
-from typing import List, Optional
-
-from schema import CategoryStats, NewsArticle, NewsOrderBy, SimilarNewsArticle
+from typing import Any, List, Optional
+
+from schema import (
+    CategoryStats,
+    NewsArticle,
+    NewsArticleConnection,
+    NewsArticleEdge,
+    NewsOrderBy,
+    PageInfo,
+    SimilarArticlesGroup,
+    SimilarNewsArticle,
+)
+from cache import cached_resolver
+from cache_invalidation import (
+    TOP_CATEGORIES_TAG,
+    article_tags,
+    category_list_tags,
+    list_tags,
+)
 from database import get_db_pool
-from utils import build_order_clause, map_db_row_to_news_article
+from loaders import (
+    SIMILAR_DEFAULT_LIMIT,
+    SIMILAR_DEFAULT_MIN_SIMILARITY,
+    ArticleKey,
+    SimilarArticlesKey,
+)
+from statements import registry
+from utils import (
+    MAX_PAGE_SIZE,
+    ORDER_FIELD_COLUMNS,
+    build_keyset_clauses,
+    build_order_clause,
+    clamp_page_size,
+    encode_cursor,
+    map_db_rows_to_news_articles,
+    order_variant,
+    resolve_order,
+    selected_article_columns,
+    selected_field_names,
+    TOTAL_COUNT_CAP,
+)
 
 logger = logging.getLogger(__name__)
 
+# Column lists for the cursor paginated list resolvers (sort columns always included)
+NEWS_LIST_COLUMNS = """
+    id, canonical_news_id, language, lead, summary,
+    published_at, updated_at, categories, hero_image_url
+"""
+FEATURED_NEWS_LIST_COLUMNS = """
+    id, canonical_news_id, language, lead, summary,
+    location_tags, author,
+    published_at, updated_at, featured, categories, hero_image_url
+"""
+CATEGORY_NEWS_LIST_COLUMNS = """
+    na.id, na.canonical_news_id, na.language, na.lead, na.summary,
+    na.published_at, na.updated_at, na.author, na.featured, na.categories, na.hero_image_url
+"""
+IN_CATEGORY_CONDITION = """EXISTS (
+    SELECT 1
+    FROM news_article_category nac
+    JOIN category c ON c.id = nac.category_id
+    WHERE nac.article_id = na.id AND c.slug = $1
+)"""
+
+# SQL templates for the statement registry; {order_clause} / {columns} are
+# filled per variant and every variant is prepared under its own name
+NEWS_OFFSET_SQL = """
+    SELECT 
+        id, language, lead, summary,
+        published_at, updated_at, categories, hero_image_url
+    FROM news_article 
+    WHERE COALESCE(featured, false) = false
+    {order_clause}
+    LIMIT $1 OFFSET $2
+"""
+FEATURED_NEWS_OFFSET_SQL = """
+    SELECT 
+        id, language, lead, summary,
+        location_tags, author,
+        published_at, updated_at, featured, categories, hero_image_url
+    FROM news_article 
+    WHERE featured = true
+    {order_clause}
+    LIMIT $1 OFFSET $2
+"""
+CATEGORY_NEWS_OFFSET_SQL = """
+    SELECT DISTINCT
+        na.id, na.language, na.lead, na.summary, 
+        na.published_at, na.updated_at, na.author, na.featured, na.categories, na.hero_image_url
+    FROM news_article na
+    JOIN news_article_category nac ON na.id = nac.article_id
+    JOIN category c ON c.id = nac.category_id
+    WHERE c.slug = $1 AND COALESCE(na.featured, false) = {featured}
+    {order_clause}
+    LIMIT $2 OFFSET $3
+"""
+# Counter tables from migrations.py (0002_category_article_stats)
+TOP_CATEGORIES_SQL = """
+    SELECT c.id, c.slug, SUM(s.article_count)::bigint AS article_count
+    FROM category_article_totals s
+    JOIN category c ON c.id = s.category_id
+    WHERE ($2::text IS NULL OR s.language = $2)
+    GROUP BY c.id, c.slug
+    HAVING SUM(s.article_count) > 0
+    ORDER BY article_count DESC
+    LIMIT $1
+"""
+TOP_CATEGORIES_WINDOW_SQL = """
+    SELECT c.id, c.slug, SUM(s.article_count)::bigint AS article_count
+    FROM category_article_daily s
+    JOIN category c ON c.id = s.category_id
+    WHERE ($2::text IS NULL OR s.language = $2)
+      AND s.day >= (NOW() - make_interval(days => $3::int))::date
+    GROUP BY c.id, c.slug
+    HAVING SUM(s.article_count) > 0
+    ORDER BY article_count DESC
+    LIMIT $1
+"""
+# Used until the counter tables exist
+TOP_CATEGORIES_LIVE_SQL = """
+    SELECT 
+        c.id,
+        c.slug,
+        COUNT(DISTINCT na.id) as article_count
+    FROM category c
+    LEFT JOIN news_article_category nac ON c.id = nac.category_id
+    LEFT JOIN news_article na ON na.id = nac.article_id
+    WHERE na.id IS NOT NULL
+      AND ($2::text IS NULL OR na.language = $2)
+      AND ($3::int IS NULL OR na.published_at >= (NOW() - make_interval(days => $3::int))::date)
+    GROUP BY c.id, c.slug
+    HAVING COUNT(DISTINCT na.id) > 0
+    ORDER BY article_count DESC
+    LIMIT $1
+"""
+NEWS_BY_LANGUAGE_COUNT_SQL = """
+    SELECT count(*) FROM (
+        SELECT 1 FROM news_article WHERE language = $1 LIMIT $2
+    ) AS capped
+"""
+NEWS_BY_STATUS_COUNT_SQL = """
+    SELECT count(*) FROM (
+        SELECT 1 FROM news_article WHERE status = $1 LIMIT $2
+    ) AS capped
+"""
+
+
+def ordered_statement(
+    name: str,
+    template: str,
+    order_by: Optional[NewsOrderBy],
+    warm: bool = False,
+    **params: str,
+) -> str:
+    """Register (once) and return the statement for one ORDER BY variant"""
+    return registry.define(
+        f"{name}.{order_variant(order_by)}",
+        template.format(order_clause=build_order_clause(order_by), **params),
+        warm=warm,
+    )
+
+
+# Front page defaults are prepared on every new pool connection
+ordered_statement("news", NEWS_OFFSET_SQL, None, warm=True)
+ordered_statement("featured_news", FEATURED_NEWS_OFFSET_SQL, None, warm=True)
+registry.define("top_categories", TOP_CATEGORIES_SQL)
+registry.define("top_categories.window", TOP_CATEGORIES_WINDOW_SQL)
+registry.define("top_categories.live", TOP_CATEGORIES_LIVE_SQL)
+registry.define("news_by_language.count", NEWS_BY_LANGUAGE_COUNT_SQL)
+registry.define("news_by_status.count", NEWS_BY_STATUS_COUNT_SQL)
+
+
+async def fetch_news_connection(
+    name: str,
+    select_from: str,
+    conditions: List[str],
+    params: List[Any],
+    first: Optional[int],
+    after: Optional[str],
+    order_by: Optional[NewsOrderBy],
+    alias: str = "",
+    count_statement: Optional[str] = None,
+    projected: bool = False,
+) -> NewsArticleConnection:
+    """
+    Fetch one keyset page: seeks past the `after` cursor instead of using OFFSET.
+
+    With count_statement (params + cap), total_count is filled in as well,
+    and total_count_capped tells whether there were more rows than the cap.
+    projected marks a select_from that depends on the client's selection; it
+    runs through registry.fetch_dynamic instead of a registered statement.
+    """
+    page_size = clamp_page_size(first)
+    order_field, _ = resolve_order(order_by)
+    sort_column = ORDER_FIELD_COLUMNS[order_field]
+
+    keyset_condition, order_clause, keyset_params, variant = build_keyset_clauses(
+        order_by, after, len(params) + 1, alias
+    )
+    all_conditions = list(conditions)
+    if keyset_condition:
+        all_conditions.append(keyset_condition)
+    all_params = [*params, *keyset_params]
+
+    where_clause = f"WHERE {' AND '.join(all_conditions)}" if all_conditions else ""
+    statement = f"{name}.{order_variant(order_by)}.{variant}"
+    sql = f"""
+        {select_from}
+        {where_clause}
+        {order_clause}
+        LIMIT ${len(all_params) + 1}
+        """
+
+    pool = await get_db_pool(readonly=True)
+    async with pool.acquire() as conn:
+        # One extra row tells whether there is a next page
+        if projected:
+            rows = await registry.fetch_dynamic(conn, statement, sql, *all_params, page_size + 1)
+        else:
+            rows = await registry.fetch(
+                conn, registry.define(statement, sql), *all_params, page_size + 1
+            )
+        # Counting one past the cap tells an exact count from a capped one
+        total_count = (
+            await registry.fetchval(conn, count_statement, *params, TOTAL_COUNT_CAP + 1)
+            if count_statement
+            else None
+        )
+
+    has_next_page = len(rows) > page_size
+    rows = rows[:page_size]
+    edges = [
+        NewsArticleEdge(
+            cursor=encode_cursor(order_field, row[sort_column], row["id"]),
+            node=node,
+        )
+        for row, node in zip(rows, map_db_rows_to_news_articles(rows))
+    ]
+
+    return NewsArticleConnection(
+        edges=edges,
+        page_info=PageInfo(
+            has_next_page=has_next_page,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+        total_count=min(total_count, TOTAL_COUNT_CAP) if total_count is not None else None,
+        total_count_capped=total_count > TOTAL_COUNT_CAP if total_count is not None else None,
+    )
+
+
+async def fetch_projected_connection(
+    info: strawberry.Info,
+    name: str,
+    column: str,
+    value: str,
+    first: Optional[int],
+    after: Optional[str],
+    order_by: Optional[NewsOrderBy],
+) -> NewsArticleConnection:
+    """Keyset page filtered on one column, selecting only the requested NewsArticle columns"""
+    order_field, _ = resolve_order(order_by)
+    # Only the columns the client selected, no markdown/JSON nobody reads
+    columns = selected_article_columns(
+        info, ("edges", "node"), extra=(ORDER_FIELD_COLUMNS[order_field],)
+    )
+    wants_total = bool({"total_count", "total_count_capped"} & selected_field_names(info))
+
+    return await fetch_news_connection(
+        name,
+        f"SELECT {', '.join(columns)} FROM news_article",
+        [f"{column} = $1"],
+        [value],
+        first,
+        after,
+        order_by,
+        count_statement=f"{name}.count" if wants_total else None,
+        projected=True,
+    )
+
+
+async def fetch_projected_list(
+    info: strawberry.Info, name: str, column: str, value: str
+) -> List[NewsArticle]:
+    """
+    Newest MAX_PAGE_SIZE articles with column = value, selecting only the
+    requested columns (the *_connection fields page past that)
+    """
+    columns = selected_article_columns(info)
+    pool = await get_db_pool(readonly=True)
+    async with pool.acquire() as conn:
+        rows = await registry.fetch_dynamic(
+            conn,
+            f"{name}.list",
+            f"""
+            SELECT {', '.join(columns)} FROM news_article
+            WHERE {column} = $1
+            ORDER BY published_at DESC
+            LIMIT $2
+            """,
+            value,
+            MAX_PAGE_SIZE,
+        )
+    return map_db_rows_to_news_articles(rows)
+
 
 @strawberry.type
 class Query:
 
     # All the news (without featured)
     @strawberry.field
+    @cached_resolver("news", tags=lambda args: list_tags(False))
     async def news(
         self,
         offset: Optional[int] = None,
@@ -35,30 +334,48 @@ class Query:
             if final_limit <= 0:
                 return []
 
-            order_clause = build_order_clause(order_by)
+            statement = ordered_statement("news", NEWS_OFFSET_SQL, order_by)
 
-            pool = await get_db_pool()
+            pool = await get_db_pool(readonly=True)
             async with pool.acquire() as conn:
-                query = f"""
-                    SELECT 
-                        id, language, lead, summary,
-                        published_at, updated_at, categories, hero_image_url
-                    FROM news_article 
-                    WHERE COALESCE(featured, false) = false
-                    {order_clause}
-                    LIMIT $1 OFFSET $2
-                """
-
-                rows = await conn.fetch(query, final_limit, effective_offset)
+                rows = await registry.fetch(
+                    conn, statement, final_limit, effective_offset
+                )
 
-                return [map_db_row_to_news_article(dict(row)) for row in rows]
+                return map_db_rows_to_news_articles(rows)
 
         except Exception as e:
             logger.error(f"Error fetching news: {e}")
             raise Exception("Failed to fetch news articles")
 
+    # All the news (without featured), cursor paginated
+    @strawberry.field
+    @cached_resolver("news_connection", tags=lambda args: list_tags(False))
+    async def news_connection(
+        self,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        order_by: Optional[NewsOrderBy] = None,
+    ) -> NewsArticleConnection:
+        """Fetch news articles one keyset page at a time"""
+        try:
+            return await fetch_news_connection(
+                "news_connection",
+                f"SELECT {NEWS_LIST_COLUMNS} FROM news_article",
+                ["COALESCE(featured, false) = false"],
+                [],
+                first,
+                after,
+                order_by,
+            )
+
+        except Exception as e:
+            logger.error(f"Error fetching news connection: {e}")
+            raise Exception("Failed to fetch news articles")
+
     # Featured news articles
     @strawberry.field
+    @cached_resolver("featured_news", tags=lambda args: list_tags(True))
     async def featured_news(
         self,
         limit: Optional[int] = None,
@@ -78,51 +395,72 @@ class Query:
             if final_limit <= 0:
                 return []
 
-            order_clause = build_order_clause(order_by)
+            statement = ordered_statement(
+                "featured_news", FEATURED_NEWS_OFFSET_SQL, order_by
+            )
 
-            pool = await get_db_pool()
+            pool = await get_db_pool(readonly=True)
             async with pool.acquire() as conn:
-                query = f"""
-                    SELECT 
-                        id, language, lead, summary,
-                        location_tags, author,
-                        published_at, updated_at, featured, categories, hero_image_url
-                    FROM news_article 
-                    WHERE featured = true
-                    {order_clause}
-                    LIMIT $1 OFFSET $2
-                """
-
-                rows = await conn.fetch(query, final_limit, effective_offset)
+                rows = await registry.fetch(
+                    conn, statement, final_limit, effective_offset
+                )
 
-                return [map_db_row_to_news_article(dict(row)) for row in rows]
+                return map_db_rows_to_news_articles(rows)
 
         except Exception as e:
             logger.error(f"Error fetching featured news: {e}")
             raise Exception("Failed to fetch featured news articles")
 
+    # Featured news articles, cursor paginated
+    @strawberry.field
+    @cached_resolver("featured_news_connection", tags=lambda args: list_tags(True))
+    async def featured_news_connection(
+        self,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        order_by: Optional[NewsOrderBy] = None,
+    ) -> NewsArticleConnection:
+        """Fetch featured news articles one keyset page at a time"""
+        try:
+            return await fetch_news_connection(
+                "featured_news_connection",
+                f"SELECT {FEATURED_NEWS_LIST_COLUMNS} FROM news_article",
+                ["featured = true"],
+                [],
+                first if first is not None else 2,
+                after,
+                order_by,
+            )
+
+        except Exception as e:
+            logger.error(f"Error fetching featured news connection: {e}")
+            raise Exception("Failed to fetch featured news articles")
+
     # Most relevant categories based on category count (How many articles are in each category)
     @strawberry.field
-    async def top_categories(self, limit: Optional[int] = 8) -> List[CategoryStats]:
-        """Yksinkertainen versio ilman kielirajausta"""
+    @cached_resolver("top_categories", tags=lambda args: {TOP_CATEGORIES_TAG})
+    async def top_categories(
+        self,
+        limit: Optional[int] = 8,
+        language: Optional[str] = None,
+        max_age_days: Optional[int] = None,
+    ) -> List[CategoryStats]:
+        """Category article counts from the counter tables, optionally per language and time window"""
         try:
-            pool = await get_db_pool()
+            pool = await get_db_pool(readonly=True)
             async with pool.acquire() as conn:
-                query = """
-                SELECT 
-                    c.id,
-                    c.slug,
-                    COUNT(DISTINCT na.id) as article_count
-                FROM category c
-                LEFT JOIN news_article_category nac ON c.id = nac.category_id
-                LEFT JOIN news_article na ON na.id = nac.article_id
-                WHERE na.id IS NOT NULL
-                GROUP BY c.id, c.slug
-                HAVING COUNT(DISTINCT na.id) > 0
-                ORDER BY article_count DESC
-                LIMIT $1
-                """
-                rows = await conn.fetch(query, limit)
+                try:
+                    if max_age_days is None:
+                        rows = await registry.fetch(conn, "top_categories", limit, language)
+                    else:
+                        rows = await registry.fetch(
+                            conn, "top_categories.window", limit, language, max_age_days
+                        )
+                except asyncpg.exceptions.UndefinedTableError:
+                    # Migration 0002 not applied (yet), count from the live tables
+                    rows = await registry.fetch(
+                        conn, "top_categories.live", limit, language, max_age_days
+                    )
 
                 return [
                     CategoryStats(
@@ -139,6 +477,10 @@ class Query:
 
     # We use this is user want to search news by category
     @strawberry.field
+    @cached_resolver(
+        "news_by_category",
+        tags=lambda args: category_list_tags(args["category_slug"], False),
+    )
     async def news_by_category(
         self,
         offset: Optional[int] = None,
@@ -159,32 +501,57 @@ class Query:
             if final_limit <= 0:
                 return []
 
-            order_clause = build_order_clause(order_by)
+            statement = ordered_statement(
+                "news_by_category", CATEGORY_NEWS_OFFSET_SQL, order_by, featured="false"
+            )
 
-            pool = await get_db_pool()
+            pool = await get_db_pool(readonly=True)
             async with pool.acquire() as conn:
-                query = f"""
-                    SELECT DISTINCT
-                        na.id, na.language, na.lead, na.summary, 
-                        na.published_at, na.updated_at, na.author, na.featured, na.categories, na.hero_image_url
-                    FROM news_article na
-                    JOIN news_article_category nac ON na.id = nac.article_id
-                    JOIN category c ON c.id = nac.category_id
-                    WHERE c.slug = $1 AND COALESCE(na.featured, false) = false
-                    {order_clause}
-                    LIMIT $2 OFFSET $3
-                """
-                rows = await conn.fetch(
-                    query, category_slug, final_limit, effective_offset
+                rows = await registry.fetch(
+                    conn, statement, category_slug, final_limit, effective_offset
                 )
-                return [map_db_row_to_news_article(dict(row)) for row in rows]
+                return map_db_rows_to_news_articles(rows)
 
         except Exception as e:
             logger.error(f"Error fetching news by category: {e}")
             raise Exception("Failed to fetch news by category")
 
+    # News by category, cursor paginated
+    @strawberry.field
+    @cached_resolver(
+        "news_by_category_connection",
+        tags=lambda args: category_list_tags(args["category_slug"], False),
+    )
+    async def news_by_category_connection(
+        self,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        order_by: Optional[NewsOrderBy] = None,
+        category_slug: str = "",
+    ) -> NewsArticleConnection:
+        """Fetch news of one category one keyset page at a time"""
+        try:
+            return await fetch_news_connection(
+                "news_by_category_connection",
+                f"SELECT {CATEGORY_NEWS_LIST_COLUMNS} FROM news_article na",
+                [IN_CATEGORY_CONDITION, "COALESCE(na.featured, false) = false"],
+                [category_slug],
+                first,
+                after,
+                order_by,
+                alias="na.",
+            )
+
+        except Exception as e:
+            logger.error(f"Error fetching news by category connection: {e}")
+            raise Exception("Failed to fetch news by category")
+
     # Featured news articles WITH CATEGORY
     @strawberry.field
+    @cached_resolver(
+        "featured_news_by_category",
+        tags=lambda args: category_list_tags(args["category_slug"], True),
+    )
     async def featured_news_by_category(
         self,
         limit: Optional[int] = None,
@@ -205,166 +572,182 @@ class Query:
             if final_limit <= 0:
                 return []
 
-            order_clause = build_order_clause(order_by)
+            statement = ordered_statement(
+                "featured_news_by_category", CATEGORY_NEWS_OFFSET_SQL, order_by, featured="true"
+            )
 
-            pool = await get_db_pool()
+            pool = await get_db_pool(readonly=True)
             async with pool.acquire() as conn:
-                query = f"""
-                    SELECT DISTINCT
-                        na.id, na.language, na.lead, na.summary, 
-                        na.published_at, na.updated_at, na.author, na.featured, na.categories, na.hero_image_url
-                    FROM news_article na
-                    JOIN news_article_category nac ON na.id = nac.article_id
-                    JOIN category c ON c.id = nac.category_id
-                    WHERE c.slug = $1 AND COALESCE(na.featured, false) = true
-                    {order_clause}
-                    LIMIT $2 OFFSET $3
-                """
-                rows = await conn.fetch(
-                    query, category_slug, final_limit, effective_offset
+                rows = await registry.fetch(
+                    conn, statement, category_slug, final_limit, effective_offset
                 )
-                return [map_db_row_to_news_article(dict(row)) for row in rows]
+                return map_db_rows_to_news_articles(rows)
 
         except Exception as e:
             logger.error(f"Error fetching featured news by category: {e}")
             raise Exception("Failed to fetch featured news by category")
 
-    # SINGLE ARTICLE -> FIND BY ID
+    # Featured news by category, cursor paginated
     @strawberry.field
-    async def news_article(self, id: ID) -> Optional[NewsArticle]:
-        """Fetch single news article by ID"""
+    @cached_resolver(
+        "featured_news_by_category_connection",
+        tags=lambda args: category_list_tags(args["category_slug"], True),
+    )
+    async def featured_news_by_category_connection(
+        self,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        order_by: Optional[NewsOrderBy] = None,
+        category_slug: str = "",
+    ) -> NewsArticleConnection:
+        """Fetch featured news of one category one keyset page at a time"""
         try:
-            pool = await get_db_pool()
-            async with pool.acquire() as conn:
-                query = """
-                    SELECT 
-                        id, canonical_news_id, language, version, lead, summary, status,
-                        location_tags, sources, interviews, review_status, author,
-                        body_blocks, enrichment_status, markdown_content,
-                        published_at, updated_at, original_article_type, featured, categories, hero_image_url
-                    FROM news_article 
-                    WHERE id = $1
-                """
-
-                row = await conn.fetchrow(query, int(id))
+            return await fetch_news_connection(
+                "featured_news_by_category_connection",
+                f"SELECT {CATEGORY_NEWS_LIST_COLUMNS} FROM news_article na",
+                [IN_CATEGORY_CONDITION, "COALESCE(na.featured, false) = true"],
+                [category_slug],
+                first if first is not None else 2,
+                after,
+                order_by,
+                alias="na.",
+            )
 
-                if not row:
-                    return None
+        except Exception as e:
+            logger.error(f"Error fetching featured news by category connection: {e}")
+            raise Exception("Failed to fetch featured news by category")
 
-                return map_db_row_to_news_article(dict(row))
+    # SINGLE ARTICLE -> FIND BY ID
+    # Loaded through the request DataLoader, so several articles asked in one
+    # GraphQL request (e.g. aliased fields) are fetched with one query
+    @strawberry.field
+    @cached_resolver(
+        "news_article",
+        tags=lambda args: article_tags(args["id"]),
+        vary_on=selected_article_columns,
+    )
+    async def news_article(self, info: strawberry.Info, id: ID) -> Optional[NewsArticle]:
+        """Fetch single news article by ID"""
+        try:
+            return await info.context["loaders"].article_by_id.load(
+                ArticleKey(int(id), selected_article_columns(info))
+            )
 
         except Exception as e:
             logger.error(f"Error fetching news article: {e}")
             raise Exception("Failed to fetch news article")
 
     # Similar news articles based on lead and summary
+    # Batched through the request DataLoader into one lateral k-NN query
 
     @strawberry.field
     async def similar_articles(
         self,
+        info: strawberry.Info,
         article_id: int,
-        limit: Optional[int] = 5,
-        min_similarity: Optional[float] = 0.4,
+        limit: Optional[int] = SIMILAR_DEFAULT_LIMIT,
+        min_similarity: Optional[float] = SIMILAR_DEFAULT_MIN_SIMILARITY,
         max_age_days: Optional[int] = None,
     ) -> List[NewsArticle]:  # Käytä NewsArticle tyyppiä, ei SimilarNewsArticle
         """Hae samankaltaisia artikkeleita embedding-vektorien perusteella"""
 
         try:
-            pool = await get_db_pool()
-            async with pool.acquire() as conn:
-                where_conditions = [
-                    "na.id != $1",
-                    "na.embedding IS NOT NULL",
-                    "target.embedding IS NOT NULL",
-                    f"(1 - (na.embedding <=> target.embedding)) > $2",  # Korjaa tämä
-                ]
+            return await info.context["loaders"].similar_by_id.load(
+                SimilarArticlesKey.of(article_id, limit, min_similarity, max_age_days)
+            )
 
-                params = [article_id, min_similarity]
-                param_counter = 3
+        except Exception as e:
+            logger.error(f"Error fetching similar articles: {e}")
+            raise Exception("Failed to fetch similar articles")
 
-                if max_age_days is not None:
-                    where_conditions.append(
-                        f"na.published_at > NOW() - INTERVAL '{max_age_days} days'"
-                    )
+    # Similar articles for many cards at once (e.g. a category page), one query for all
+    @strawberry.field
+    async def similar_articles_batch(
+        self,
+        info: strawberry.Info,
+        article_ids: List[int],
+        limit: Optional[int] = SIMILAR_DEFAULT_LIMIT,
+        min_similarity: Optional[float] = SIMILAR_DEFAULT_MIN_SIMILARITY,
+        max_age_days: Optional[int] = None,
+    ) -> List[SimilarArticlesGroup]:
+        """Similar articles grouped per requested article id, in request order"""
+        try:
+            if len(article_ids) > MAX_PAGE_SIZE:
+                raise ValueError(f"At most {MAX_PAGE_SIZE} article ids per request")
 
-                where_clause = " AND ".join(where_conditions)
-
-                query = f"""
-                    SELECT 
-                        na.id,
-                        na.language,
-                        na.lead,
-                        na.summary,
-                        na.published_at,
-                        na.updated_at,
-                        na.categories,
-                        na.hero_image_url
-                    FROM news_article na
-                    CROSS JOIN (
-                        SELECT embedding 
-                        FROM news_article 
-                        WHERE id = $1
-                    ) AS target
-                    WHERE {where_clause}
-                    ORDER BY na.embedding <=> target.embedding
-                    LIMIT $3
-                """
-
-                rows = await conn.fetch(query, *params + [limit])
-
-                # Yksinkertainen mapping
-                return [map_db_row_to_news_article(dict(row)) for row in rows]
+            results = await info.context["loaders"].similar_by_id.load_many(
+                [
+                    SimilarArticlesKey.of(article_id, limit, min_similarity, max_age_days)
+                    for article_id in article_ids
+                ]
+            )
+            return [
+                SimilarArticlesGroup(article_id=article_id, articles=articles)
+                for article_id, articles in zip(article_ids, results)
+            ]
 
         except Exception as e:
-            logger.error(f"Error fetching similar articles: {e}")
+            logger.error(f"Error fetching similar articles batch: {e}")
             raise Exception("Failed to fetch similar articles")
 
     # NOT USED YET... WHEN WE HAVE MULTIPLE LANGUAGES, THEN MAYBE WE NEED THIS
-    @strawberry.field
-    async def news_by_language(self, language: str) -> List[NewsArticle]:
-        """Fetch news articles by language"""
+    @strawberry.field(
+        deprecation_reason=f"Returns at most {MAX_PAGE_SIZE} articles; use newsByLanguageConnection"
+    )
+    async def news_by_language(self, info: strawberry.Info, language: str) -> List[NewsArticle]:
+        """Fetch the newest news articles by language (capped at MAX_PAGE_SIZE)"""
         try:
-            pool = await get_db_pool()
-            async with pool.acquire() as conn:
-                query = """
-                    SELECT 
-                        id, canonical_news_id, language, version, lead, summary, status,
-                        location_tags, sources, interviews, review_status, author,
-                        body_blocks, enrichment_status, markdown_content,
-                        published_at, updated_at, original_article_type
-                    FROM news_article 
-                    WHERE language = $1
-                    ORDER BY published_at DESC
-                """
+            return await fetch_projected_list(info, "news_by_language", "language", language)
 
-                rows = await conn.fetch(query, language)
+        except Exception as e:
+            logger.error(f"Error fetching news by language: {e}")
+            raise Exception("Failed to fetch news articles by language")
 
-                return [map_db_row_to_news_article(dict(row)) for row in rows]
+    @strawberry.field
+    async def news_by_language_connection(
+        self,
+        info: strawberry.Info,
+        language: str,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        order_by: Optional[NewsOrderBy] = None,
+    ) -> NewsArticleConnection:
+        """Fetch news articles by language, one keyset page at a time"""
+        try:
+            return await fetch_projected_connection(
+                info, "news_by_language", "language", language, first, after, order_by
+            )
 
         except Exception as e:
             logger.error(f"Error fetching news by language: {e}")
             raise Exception("Failed to fetch news articles by language")
 
+    @strawberry.field(
+        deprecation_reason=f"Returns at most {MAX_PAGE_SIZE} articles; use newsByStatusConnection"
+    )
+    async def news_by_status(self, info: strawberry.Info, status: str) -> List[NewsArticle]:
+        """Fetch the newest news articles by status (capped at MAX_PAGE_SIZE)"""
+        try:
+            return await fetch_projected_list(info, "news_by_status", "status", status)
+
+        except Exception as e:
+            logger.error(f"Error fetching news by status: {e}")
+            raise Exception("Failed to fetch news articles by status")
+
     @strawberry.field
-    async def news_by_status(self, status: str) -> List[NewsArticle]:
-        """Fetch news articles by status"""
+    async def news_by_status_connection(
+        self,
+        info: strawberry.Info,
+        status: str,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        order_by: Optional[NewsOrderBy] = None,
+    ) -> NewsArticleConnection:
+        """Fetch news articles by status, one keyset page at a time"""
         try:
-            pool = await get_db_pool()
-            async with pool.acquire() as conn:
-                query = """
-                    SELECT 
-                        id, canonical_news_id, language, version, lead, summary, status,
-                        location_tags, sources, interviews, review_status, author,
-                        body_blocks, enrichment_status, markdown_content,
-                        published_at, updated_at, original_article_type
-                    FROM news_article 
-                    WHERE status = $1
-                    ORDER BY published_at DESC
-                """
-
-                rows = await conn.fetch(query, status)
-
-                return [map_db_row_to_news_article(dict(row)) for row in rows]
+            return await fetch_projected_connection(
+                info, "news_by_status", "status", status, first, after, order_by
+            )
 
         except Exception as e:
             logger.error(f"Error fetching news by status: {e}")
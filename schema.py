@@ -79,6 +79,36 @@ class SimilarNewsArticle:
     similarity_score: float = strawberry.field(name="similarity_score")
 
 
+# similar_articles_batch: results for one requested article
+@strawberry.type
+class SimilarArticlesGroup:
+    article_id: int = strawberry.field(name="article_id")
+    articles: List[NewsArticle]
+
+
+# Relay-style connection for cursor (keyset) pagination
+@strawberry.type
+class PageInfo:
+    has_next_page: bool = strawberry.field(name="has_next_page")
+    end_cursor: Optional[str] = strawberry.field(default=None, name="end_cursor")
+
+
+@strawberry.type
+class NewsArticleEdge:
+    cursor: str
+    node: NewsArticle
+
+
+@strawberry.type
+class NewsArticleConnection:
+    edges: List[NewsArticleEdge]
+    page_info: PageInfo = strawberry.field(name="page_info")
+    # Only counted when selected, and only up to TOTAL_COUNT_CAP rows
+    total_count: Optional[int] = strawberry.field(default=None, name="total_count")
+    # True when there are more rows than total_count says (it hit the cap)
+    total_count_capped: Optional[bool] = strawberry.field(default=None, name="total_count_capped")
+
+
 # Enums
 @strawberry.enum
 class SortOrder(Enum):
@@ -0,0 +1,318 @@
+# similarity.py
+import os
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import asyncpg
+
+from database import get_db_pool
+from statements import registry
+
+logger = logging.getLogger(__name__)
+
+# Length of the precomputed neighbor lists (article_neighbors, migration 0003)
+NEIGHBORS_K = int(os.getenv("SIMILAR_NEIGHBORS_K", 20))
+USE_NEIGHBOR_TABLE = os.getenv("SIMILAR_USE_NEIGHBOR_TABLE", "true").lower() == "true"
+REFRESH_INTERVAL_SECONDS = float(os.getenv("SIMILAR_REFRESH_INTERVAL_SECONDS", 30))
+REFRESH_BATCH_SIZE = int(os.getenv("SIMILAR_REFRESH_BATCH_SIZE", 50))
+
+# The live query reads this many nearest candidates from the index before the
+# similarity / age filters are applied (keep it within hnsw.ef_search)
+ANN_MIN_CANDIDATES = int(os.getenv("SIMILAR_ANN_MIN_CANDIDATES", 40))
+ANN_CANDIDATE_FACTOR = 4
+
+# ORDER BY distance LIMIT n is what lets pgvector walk an HNSW/IVFFlat index;
+# the similarity threshold and age window only filter that candidate set.
+SIMILAR_ARTICLES_LIVE_SQL = """
+    SELECT t.target_id, s.*
+    FROM unnest($1::bigint[]) AS t(target_id)
+    JOIN news_article target ON target.id = t.target_id
+    CROSS JOIN LATERAL (
+        SELECT
+            na.id, na.language, na.lead, na.summary,
+            na.published_at, na.updated_at, na.categories, na.hero_image_url,
+            1 - (na.embedding <=> target.embedding) AS similarity
+        FROM news_article na
+        WHERE na.id != target.id
+        ORDER BY na.embedding <=> target.embedding
+        LIMIT $4
+    ) AS s
+    WHERE target.embedding IS NOT NULL
+      AND s.similarity > $2
+      AND ($3::int IS NULL OR s.published_at > NOW() - make_interval(days => $3::int))
+    ORDER BY t.target_id, s.similarity DESC
+"""
+
+# Whole (fresh) precomputed lists; filters are applied in Python so we can
+# tell a short filtered list apart from a list that ran out of neighbors
+SIMILAR_ARTICLES_NEIGHBORS_SQL = """
+    SELECT
+        n.article_id AS target_id, n.similarity,
+        s.id, s.language, s.lead, s.summary,
+        s.published_at, s.updated_at, s.categories, s.hero_image_url,
+        ($2::int IS NULL OR s.published_at > NOW() - make_interval(days => $2::int)) AS in_window
+    FROM article_neighbors n
+    JOIN news_article s ON s.id = n.neighbor_id
+    WHERE n.article_id = ANY($1::bigint[])
+      AND NOT EXISTS (
+          SELECT 1 FROM article_neighbors_stale q WHERE q.article_id = n.article_id
+      )
+    ORDER BY n.article_id, n.rank
+"""
+
+CLAIM_STALE_SQL = """
+    DELETE FROM article_neighbors_stale
+    WHERE article_id IN (
+        SELECT article_id FROM article_neighbors_stale
+        ORDER BY queued_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING article_id, propagate
+"""
+
+DELETE_NEIGHBORS_SQL = "DELETE FROM article_neighbors WHERE article_id = ANY($1::bigint[])"
+
+INSERT_NEIGHBORS_SQL = """
+    INSERT INTO article_neighbors (article_id, rank, neighbor_id, similarity)
+    SELECT
+        t.target_id,
+        row_number() OVER (PARTITION BY t.target_id ORDER BY s.distance),
+        s.id,
+        1 - s.distance
+    FROM unnest($1::bigint[]) AS t(target_id)
+    JOIN news_article target ON target.id = t.target_id
+    CROSS JOIN LATERAL (
+        SELECT na.id, na.embedding <=> target.embedding AS distance
+        FROM news_article na
+        WHERE na.id != target.id
+          AND na.embedding IS NOT NULL
+        ORDER BY na.embedding <=> target.embedding
+        LIMIT $2
+    ) AS s
+    WHERE target.embedding IS NOT NULL
+"""
+
+# After a new or re-embedded article's list is computed: queue the lists it
+# now belongs in, i.e. its nearest candidates whose list does not contain it
+# and is short or ends below its similarity. Candidates go past the target's
+# own top K, because "X is in A's top K" does not imply the reverse.
+QUEUE_REVERSE_NEIGHBORS_SQL = """
+    INSERT INTO article_neighbors_stale (article_id)
+    SELECT DISTINCT c.id
+    FROM unnest($1::bigint[]) AS t(target_id)
+    JOIN news_article target ON target.id = t.target_id
+    CROSS JOIN LATERAL (
+        SELECT na.id, 1 - (na.embedding <=> target.embedding) AS similarity
+        FROM news_article na
+        WHERE na.id != target.id
+          AND na.embedding IS NOT NULL
+        ORDER BY na.embedding <=> target.embedding
+        LIMIT $2
+    ) AS c
+    WHERE target.embedding IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM article_neighbors n
+          WHERE n.article_id = c.id AND n.neighbor_id = t.target_id
+      )
+      AND (
+          SELECT count(*) < $3 OR min(n.similarity) < c.similarity
+          FROM article_neighbors n
+          WHERE n.article_id = c.id
+      )
+    ON CONFLICT DO NOTHING
+    RETURNING article_id
+"""
+
+STALE_BACKLOG_SQL = "SELECT count(*) FROM article_neighbors_stale"
+
+registry.define("similar_articles.live", SIMILAR_ARTICLES_LIVE_SQL, warm=True)
+registry.define("similar_articles.neighbors", SIMILAR_ARTICLES_NEIGHBORS_SQL)
+registry.define("article_neighbors.claim", CLAIM_STALE_SQL)
+registry.define("article_neighbors.delete", DELETE_NEIGHBORS_SQL)
+registry.define("article_neighbors.insert", INSERT_NEIGHBORS_SQL)
+registry.define("article_neighbors.queue_reverse", QUEUE_REVERSE_NEIGHBORS_SQL)
+registry.define("article_neighbors.backlog", STALE_BACKLOG_SQL)
+
+lookup_stats = {"neighbor_hits": 0, "live_lookups": 0}
+
+
+def ann_candidates(limit: int) -> int:
+    return max(limit * ANN_CANDIDATE_FACTOR, ANN_MIN_CANDIDATES)
+
+
+async def _from_neighbor_lists(
+    conn,
+    article_ids: Sequence[int],
+    limit: int,
+    min_similarity: float,
+    max_age_days: Optional[int],
+) -> Dict[int, List[asyncpg.Record]]:
+    try:
+        rows = await registry.fetch(
+            conn, "similar_articles.neighbors", list(article_ids), max_age_days
+        )
+    except asyncpg.exceptions.UndefinedTableError:
+        # Migration 0003 not applied (yet)
+        return {}
+
+    lists: Dict[int, List[asyncpg.Record]] = defaultdict(list)
+    for row in rows:
+        lists[row["target_id"]].append(row)
+
+    results = {}
+    for target_id, neighbors in lists.items():
+        matches = [
+            row
+            for row in neighbors
+            if row["similarity"] > min_similarity
+            and (max_age_days is None or row["in_window"])
+        ]
+        # A full list filtered below `limit` may be hiding matches past rank K
+        if len(matches) >= limit or len(neighbors) < NEIGHBORS_K:
+            results[target_id] = matches[:limit]
+    return results
+
+
+async def fetch_similar_articles(
+    conn,
+    article_ids: Sequence[int],
+    limit: int,
+    min_similarity: float,
+    max_age_days: Optional[int],
+) -> Dict[int, List[asyncpg.Record]]:
+    """Similar-article rows per target id: precomputed lists when usable, else the live index query"""
+    results: Dict[int, List[asyncpg.Record]] = {}
+    if USE_NEIGHBOR_TABLE and limit <= NEIGHBORS_K:
+        results = await _from_neighbor_lists(
+            conn, article_ids, limit, min_similarity, max_age_days
+        )
+        lookup_stats["neighbor_hits"] += len(results)
+
+    remaining = [article_id for article_id in article_ids if article_id not in results]
+    if remaining:
+        lookup_stats["live_lookups"] += len(remaining)
+        rows = await registry.fetch(
+            conn,
+            "similar_articles.live",
+            remaining,
+            min_similarity,
+            max_age_days,
+            ann_candidates(limit),
+        )
+        for row in rows:
+            matches = results.setdefault(row["target_id"], [])
+            if len(matches) < limit:
+                matches.append(row)
+
+    return results
+
+
+class NeighborRefresher:
+    """Background task that recomputes neighbor lists for articles queued in article_neighbors_stale"""
+
+    def __init__(
+        self,
+        interval: float = REFRESH_INTERVAL_SECONDS,
+        batch_size: int = REFRESH_BATCH_SIZE,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.refreshed = 0
+        self.reverse_queued = 0
+        self.errors = 0
+        self.backlog: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh_batch(self) -> int:
+        """Recompute one batch of stale lists in a single transaction; returns the batch size"""
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                claimed = await registry.fetch(conn, "article_neighbors.claim", self.batch_size)
+                article_ids = [row["article_id"] for row in claimed]
+                if article_ids:
+                    await registry.fetch(conn, "article_neighbors.delete", article_ids)
+                    await registry.fetch(
+                        conn, "article_neighbors.insert", article_ids, NEIGHBORS_K
+                    )
+                propagate = [row["article_id"] for row in claimed if row["propagate"]]
+                if propagate:
+                    queued = await registry.fetch(
+                        conn,
+                        "article_neighbors.queue_reverse",
+                        propagate,
+                        ann_candidates(NEIGHBORS_K),
+                        NEIGHBORS_K,
+                    )
+                    self.reverse_queued += len(queued)
+            self.backlog = await registry.fetchval(conn, "article_neighbors.backlog")
+
+        self.refreshed += len(article_ids)
+        return len(article_ids)
+
+    async def _run(self):
+        while True:
+            try:
+                # Drain the queue in batches, then wait for new work
+                while await self.refresh_batch() == self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except (
+                asyncpg.exceptions.UndefinedTableError,
+                asyncpg.exceptions.UndefinedColumnError,
+            ):
+                logger.warning(
+                    "article_neighbors tables missing or outdated (migrations 0003, 0006), "
+                    "neighbor refresh disabled"
+                )
+                return
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Neighbor list refresh failed: {e}")
+
+            await asyncio.sleep(self.interval)
+
+
+refresher: Optional[NeighborRefresher] = None
+
+
+def similarity_stats() -> Dict[str, Any]:
+    return {
+        **lookup_stats,
+        "neighbors_k": NEIGHBORS_K,
+        "refreshed": refresher.refreshed if refresher else 0,
+        "reverse_queued": refresher.reverse_queued if refresher else 0,
+        "refresh_errors": refresher.errors if refresher else 0,
+        "stale_backlog": refresher.backlog if refresher else None,
+    }
+
+
+async def start_neighbor_refresher():
+    global refresher
+    if USE_NEIGHBOR_TABLE and refresher is None:
+        refresher = NeighborRefresher()
+        refresher.start()
+
+
+async def stop_neighbor_refresher():
+    global refresher
+    if refresher is not None:
+        await refresher.stop()
+        refresher = None
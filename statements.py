@@ -0,0 +1,150 @@
+# statements.py
+import time
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+import asyncpg
+from asyncpg.prepared_stmt import PreparedStatement
+
+logger = logging.getLogger(__name__)
+
+
+class PreparedConnection(asyncpg.Connection):
+    """Pool connection class that keeps the registry's prepared statements per connection"""
+
+    def get_prepared(self, name: str) -> Optional[PreparedStatement]:
+        return self.__dict__.get("_prepared_statements", {}).get(name)
+
+    def set_prepared(self, name: str, statement: Optional[PreparedStatement]):
+        prepared = self.__dict__.setdefault("_prepared_statements", {})
+        if statement is None:
+            prepared.pop(name, None)
+        else:
+            prepared[name] = statement
+
+
+class StatementRegistry:
+    """
+    Central registry of named SQL statements.
+
+    Each statement is prepared once per pooled connection (the warm ones in the
+    pool's init hook, the rest on first use), so hot queries skip parse and plan.
+    Prepared statements are never evicted, so names must come from a fixed
+    set; SQL built from the client's selection goes through fetch_dynamic.
+    """
+
+    def __init__(self):
+        self._sql: Dict[str, str] = {}
+        self._warm: Set[str] = set()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def define(self, name: str, sql: str, warm: bool = False) -> str:
+        """Register a statement (idempotent) and return its name"""
+        existing = self._sql.get(name)
+        if existing is None:
+            self._sql[name] = sql
+            self._stats[name] = self._new_stats()
+        elif existing != sql:
+            raise ValueError(f"Statement {name} is already defined with different SQL")
+        if warm:
+            self._warm.add(name)
+        return name
+
+    def sql(self, name: str) -> str:
+        return self._sql[name]
+
+    @staticmethod
+    def _new_stats() -> Dict[str, float]:
+        return {"calls": 0, "errors": 0, "prepares": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+    async def prepare_warm(self, conn: PreparedConnection):
+        """Pool init hook: prepare the hot statements on a new connection"""
+        for name in sorted(self._warm):
+            try:
+                await self._prepare(conn, name)
+            except Exception as e:
+                # A missing table must not keep the pool from starting
+                logger.warning(f"Could not prepare statement {name}: {e}")
+
+    async def _prepare(self, conn, name: str) -> PreparedStatement:
+        statement = await conn.prepare(self._sql[name])
+        conn.set_prepared(name, statement)
+        self._stats[name]["prepares"] += 1
+        return statement
+
+    async def _run(self, conn, name: str, method: str, args: tuple, timeout=None):
+        stats = self._stats[name]
+        started = time.perf_counter()
+        try:
+            statement = conn.get_prepared(name) or await self._prepare(conn, name)
+            try:
+                return await getattr(statement, method)(*args, timeout=timeout)
+            except (
+                asyncpg.exceptions.InvalidCachedStatementError,
+                asyncpg.exceptions.OutdatedSchemaCacheError,
+            ):
+                # Schema changed under the prepared plan; re-prepare once if we can
+                conn.set_prepared(name, None)
+                if conn.is_in_transaction():
+                    raise
+                statement = await self._prepare(conn, name)
+                return await getattr(statement, method)(*args, timeout=timeout)
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            self._record(stats, started)
+
+    @staticmethod
+    def _record(stats: Dict[str, float], started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    async def fetch(self, conn, name: str, *args, timeout=None) -> List[asyncpg.Record]:
+        return await self._run(conn, name, "fetch", args, timeout)
+
+    async def fetchrow(self, conn, name: str, *args, timeout=None) -> Optional[asyncpg.Record]:
+        return await self._run(conn, name, "fetchrow", args, timeout)
+
+    async def fetchval(self, conn, name: str, *args, timeout=None) -> Any:
+        return await self._run(conn, name, "fetchval", args, timeout)
+
+    async def fetch_dynamic(
+        self, conn, name: str, sql: str, *args, timeout=None
+    ) -> List[asyncpg.Record]:
+        """
+        Run SQL whose text varies with the request (e.g. the client's column
+        selection) without registering it. asyncpg's per-connection statement
+        cache prepares it and closes the least recently used statements, so
+        the number of variants per connection stays bounded. Timings are
+        kept under `name`, which must come from a fixed set.
+        """
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = self._new_stats()
+        started = time.perf_counter()
+        try:
+            return await conn.fetch(sql, *args, timeout=timeout)
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            self._record(stats, started)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-statement execution counts and timings for /metrics"""
+        return {
+            name: {
+                **stats,
+                "avg_ms": round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                "total_ms": round(stats["total_ms"], 3),
+                "max_ms": round(stats["max_ms"], 3),
+            }
+            for name, stats in sorted(self._stats.items())
+            if stats["calls"] or stats["prepares"]
+        }
+
+
+registry = StatementRegistry()
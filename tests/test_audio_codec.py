@@ -0,0 +1,124 @@
+"""
+G.711 µ-law tables and the streaming resamplers in audio_codec.py.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from audio_codec import (  # noqa: E402
+    FrameBuffer,
+    L16ToUlaw,
+    PolyphaseResampler,
+    UlawToL16,
+    l16_decode,
+    l16_encode,
+    ulaw_decode,
+    ulaw_encode,
+)
+
+
+def reference_ulaw_encode(sample: int) -> int:
+    """Scalar linear2ulaw from the reference g711.c"""
+    pcm = sample >> 2
+    mask = 0xFF
+    if pcm < 0:
+        pcm = -pcm
+        mask = 0x7F
+    pcm = min(pcm, 8159) + 0x21
+    segment = pcm.bit_length() - 6
+    if segment >= 8:
+        return 0x7F ^ mask
+    return ((segment << 4) | ((pcm >> (segment + 1)) & 0x0F)) ^ mask
+
+
+def tone(frequency, rate, seconds=0.5, amplitude=8000.0):
+    t = np.arange(int(rate * seconds)) / rate
+    return amplitude * np.sin(2 * np.pi * frequency * t)
+
+
+def test_ulaw_codes_survive_decode_encode():
+    codes = bytes(range(256))
+    decoded = ulaw_decode(codes)
+    # 0x7F is "negative zero" and encodes back as 0xFF
+    expected = codes.replace(b"\x7f", b"\xff")
+    assert ulaw_encode(decoded) == expected
+
+
+def test_ulaw_encode_matches_reference():
+    samples = np.arange(-32768, 32768, 7, dtype=np.int16)
+    expected = bytes(reference_ulaw_encode(int(s)) for s in samples)
+    assert ulaw_encode(samples) == expected
+
+
+def test_ulaw_round_trip_error_stays_within_a_quantisation_step():
+    samples = np.arange(-32000, 32000, 13, dtype=np.int16)
+    decoded = ulaw_decode(ulaw_encode(samples)).astype(np.int32)
+    error = np.abs(decoded - samples)
+    # The step doubles every segment; half a step of error at most
+    assert np.all(error <= np.maximum(16, np.abs(samples.astype(np.int32)) // 16))
+
+
+def test_l16_is_little_endian():
+    assert l16_encode(np.array([1, -2], dtype=np.int16)) == b"\x01\x00\xfe\xff"
+    assert list(l16_decode(b"\x01\x00\xfe\xff")) == [1, -2]
+
+
+@pytest.mark.parametrize("up, down", [(2, 1), (1, 2), (3, 2)])
+def test_streamed_resampling_matches_one_shot(up, down):
+    signal = np.random.default_rng(1).normal(0, 4000, 4000)
+    one_shot = PolyphaseResampler(up, down).process(signal)
+
+    streamed = PolyphaseResampler(up, down)
+    chunks = np.split(signal, [160, 161, 500, 1337, 2000, 3999])
+    joined = np.concatenate([streamed.process(chunk) for chunk in chunks])
+
+    assert len(joined) == len(one_shot) == len(signal) * up // down
+    np.testing.assert_allclose(joined, one_shot, atol=1e-6)
+
+
+def test_reset_forgets_previous_input():
+    resampler = PolyphaseResampler(2, 1)
+    signal = tone(1000, 8000)
+    first = resampler.process(signal)
+    resampler.process(np.ones(7))
+    resampler.reset()
+    np.testing.assert_allclose(resampler.process(signal), first)
+
+
+@pytest.mark.parametrize("up, down, rate", [(2, 1, 8000), (1, 2, 16000)])
+def test_resampling_keeps_telephone_band_tones(up, down, rate):
+    output = PolyphaseResampler(up, down).process(tone(1000, rate))
+    steady = output[len(output) // 4:]
+    assert np.max(np.abs(steady)) == pytest.approx(8000, rel=0.02)
+
+
+def test_tones_above_the_new_nyquist_are_filtered_out():
+    output = PolyphaseResampler(1, 2).process(tone(6000, 16000))
+    steady = output[len(output) // 4:]
+    assert np.max(np.abs(steady)) < 80
+
+
+def test_vonage_frames_convert_to_twilio_frames_and_back():
+    to_ulaw = L16ToUlaw(16000)
+    to_l16 = UlawToL16(16000)
+    frames = FrameBuffer(640)
+    pcm = l16_encode(np.rint(tone(440, 16000, seconds=0.2)).astype(np.int16))
+
+    ulaw = b"".join(to_ulaw.convert(frame) for frame in frames.push(pcm))
+    assert len(ulaw) == len(pcm) // 4  # 16-bit 16 kHz -> 8-bit 8 kHz
+
+    back = b"".join(to_l16.convert(ulaw[i:i + 160]) for i in range(0, len(ulaw), 160))
+    assert len(back) == len(pcm)
+
+
+def test_frame_buffer_rechunks_and_keeps_the_remainder():
+    frames = FrameBuffer(4)
+    assert frames.push(b"abcdef") == [b"abcd"]
+    assert frames.push(b"gh") == [b"efgh"]
+    assert frames.push(b"i") == []
+    frames.clear()
+    assert frames.push(b"jklm") == [b"jklm"]
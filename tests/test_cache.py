@@ -0,0 +1,177 @@
+"""
+TTLCache expiry, LRU eviction and tag invalidation, and cached_resolver's
+sharing of in-flight misses.
+"""
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cache  # noqa: E402
+from cache import TTLCache, cached_resolver, resolver_cache  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture(autouse=True)
+def empty_resolver_cache():
+    resolver_cache.clear()
+    yield
+    resolver_cache.clear()
+
+
+def test_entries_expire_after_ttl(clock):
+    ttl_cache = TTLCache(max_entries=10, ttl_seconds=60)
+    ttl_cache.set("default", 1)
+    ttl_cache.set("short", 2, ttl_seconds=5)
+
+    clock[0] += 5
+    assert ttl_cache.get("short") == (False, None)
+    assert ttl_cache.get("default") == (True, 1)
+
+    clock[0] += 55
+    assert ttl_cache.get("default") == (False, None)
+    assert ttl_cache.stats()["expirations"] == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    ttl_cache = TTLCache(max_entries=2, ttl_seconds=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+
+    assert ttl_cache.get("b") == (False, None)
+    assert ttl_cache.get("a") == (True, 1)
+    assert ttl_cache.get("c") == (True, 3)
+    assert ttl_cache.stats()["evictions"] == 1
+
+
+def test_invalidate_tags_drops_only_tagged_entries(clock):
+    ttl_cache = TTLCache(max_entries=10, ttl_seconds=60)
+    ttl_cache.set("list", 1, tags={"list:regular"})
+    ttl_cache.set("category", 2, tags={"category:sport:regular", "categories:regular"})
+    ttl_cache.set("article", 3, tags={"article:7"})
+    generation = ttl_cache.generation
+
+    assert ttl_cache.invalidate_tags({"categories:regular", "list:regular"}) == 2
+
+    assert ttl_cache.get("list") == (False, None)
+    assert ttl_cache.get("category") == (False, None)
+    assert ttl_cache.get("article") == (True, 3)
+    assert ttl_cache.generation == generation + 1
+    # The tag index forgets dropped keys, so re-adding does not resurrect old tags
+    ttl_cache.set("category", 4)
+    assert ttl_cache.invalidate_tags({"category:sport:regular"}) == 0
+    assert ttl_cache.get("category") == (True, 4)
+
+
+def test_replacing_an_entry_replaces_its_tags(clock):
+    ttl_cache = TTLCache(max_entries=10, ttl_seconds=60)
+    ttl_cache.set("key", 1, tags={"old"})
+    ttl_cache.set("key", 2, tags={"new"})
+
+    assert ttl_cache.invalidate_tags({"old"}) == 0
+    assert ttl_cache.invalidate_tags({"new"}) == 1
+
+
+def counting_resolver(name, started=None, release=None, tags=None):
+    calls = []
+
+    @cached_resolver(name, tags=tags)
+    async def resolver(limit: int = 10):
+        calls.append(limit)
+        if started is not None:
+            started.set()
+        if release is not None:
+            await release.wait()
+        return [limit] * len(calls)
+
+    return resolver, calls
+
+
+def test_cached_resolver_shares_one_query_between_concurrent_misses():
+    async def run():
+        release = asyncio.Event()
+        resolver, calls = counting_resolver("shared", release=release)
+        tasks = [asyncio.create_task(resolver(limit=3)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+        assert calls == [3]
+        assert results == [[3]] * 5
+        assert await resolver(limit=3) == [3]
+        assert calls == [3]
+
+    asyncio.run(run())
+
+
+def test_waiters_take_over_when_the_fetching_request_is_cancelled():
+    async def run():
+        started = asyncio.Event()
+        release = asyncio.Event()
+        resolver, calls = counting_resolver("takeover", started, release)
+        first = asyncio.create_task(resolver(limit=2))
+        await started.wait()
+        waiters = [asyncio.create_task(resolver(limit=2)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        first.cancel()  # e.g. its client disconnected
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        # One waiter ran the query again, the others shared its result
+        assert calls == [2, 2]
+        assert results == [[2, 2]] * 3
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_cancel_the_query():
+    async def run():
+        started = asyncio.Event()
+        release = asyncio.Event()
+        resolver, calls = counting_resolver("waiter_cancelled", started, release)
+        first = asyncio.create_task(resolver(limit=1))
+        await started.wait()
+        waiter = asyncio.create_task(resolver(limit=1))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        release.set()
+        assert await first == [1]
+        assert calls == [1]
+
+    asyncio.run(run())
+
+
+def test_result_is_not_stored_when_invalidated_while_fetching():
+    async def run():
+        started = asyncio.Event()
+        release = asyncio.Event()
+        resolver, calls = counting_resolver(
+            "invalidated", started, release, tags=lambda args: {"list:regular"}
+        )
+        first = asyncio.create_task(resolver(limit=4))
+        await started.wait()
+        resolver_cache.invalidate_tags({"list:regular"})
+        release.set()
+        assert await first == [4]
+
+        started.clear()
+        assert await resolver(limit=4) == [4, 4]
+        assert calls == [4, 4]
+
+    asyncio.run(run())
@@ -0,0 +1,154 @@
+"""
+TwilioCallControl against a scripted in-process HTTP client: retries,
+timeouts and which errors are safe to retry for each operation.
+"""
+import os
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+from twilio.base.exceptions import TwilioRestException
+from twilio.http import AsyncHttpClient
+from twilio.http.response import Response
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import call_control  # noqa: E402
+from call_control import TwilioCallControl  # noqa: E402
+
+STUB_URL = "http://127.0.0.1:9999"
+CALL_SID = "CA00000000000000000000000000000001"
+
+
+class ScriptedHttpClient(AsyncHttpClient):
+    """Answers each request with the next scripted step: (status, body), an exception or a delay"""
+
+    def __init__(self, *steps):
+        super().__init__(logger=None, is_async=True)
+        self.steps = list(steps)
+        self.requests = []
+        self.closed = False
+
+    async def request(self, method, uri, params=None, data=None, headers=None,
+                      auth=None, timeout=None, allow_redirects=False):
+        self.requests.append((method, uri, data))
+        step = self.steps.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        if isinstance(step, float):
+            # A slow answer: the response after the delay belongs to this request
+            delay, step = step, self.steps.pop(0)
+            await asyncio.sleep(delay)
+        status, body = step
+        return Response(status, json.dumps(body))
+
+    async def close(self):
+        self.closed = True
+
+
+def ok(status=201):
+    return status, {"sid": CALL_SID, "status": "queued"}
+
+
+def error(status):
+    return status, {"code": 20000 + status, "message": "error", "status": status}
+
+
+def connector_error():
+    key = SimpleNamespace(host="127.0.0.1", port=9999, ssl=False, is_ssl=False)
+    return aiohttp.ClientConnectorError(key, OSError("connection refused"))
+
+
+def run(http_client, operation, **options):
+    """Run operation(control) with http_client installed; returns (result or exception, control)"""
+    async def go():
+        control = TwilioCallControl(
+            "AC" + "0" * 32, "token", base_url=STUB_URL, retry_delay=0, **options
+        )
+        original = call_control.AsyncTwilioHttpClient
+        call_control.AsyncTwilioHttpClient = lambda timeout: http_client
+        try:
+            try:
+                return await operation(control), control
+            except Exception as e:
+                return e, control
+            finally:
+                await control.close()
+        finally:
+            call_control.AsyncTwilioHttpClient = original
+
+    return asyncio.run(go())
+
+
+def create(control):
+    return control.create_call("+358401234567", "+358409876543", f"{STUB_URL}/twiml")
+
+
+def end(control):
+    return control.end_call(CALL_SID)
+
+
+def test_create_call_goes_to_base_url():
+    client = ScriptedHttpClient(ok())
+    result, control = run(client, create)
+    assert result == CALL_SID
+    method, uri, data = client.requests[0]
+    assert method == "POST"
+    assert uri.startswith(f"{STUB_URL}/2010-04-01/Accounts/")
+    assert data["To"] == "+358401234567"
+    assert client.closed
+    assert control.stats()["create_call"]["calls"] == 1
+
+
+@pytest.mark.parametrize("failure", [error(429), connector_error()])
+def test_create_call_retries_when_twilio_cannot_have_placed_it(failure):
+    client = ScriptedHttpClient(failure, ok())
+    result, control = run(client, create)
+    assert result == CALL_SID
+    assert len(client.requests) == 2
+    assert control.stats()["create_call"]["retries"] == 1
+
+
+@pytest.mark.parametrize("failure", [error(500), error(400), aiohttp.ServerDisconnectedError()])
+def test_create_call_does_not_retry_other_errors(failure):
+    client = ScriptedHttpClient(failure, ok())
+    result, control = run(client, create)
+    assert isinstance(result, (TwilioRestException, aiohttp.ClientError))
+    assert len(client.requests) == 1
+    assert control.stats()["create_call"]["errors"] == 1
+
+
+def test_create_call_gives_up_after_max_retries():
+    client = ScriptedHttpClient(*[error(429)] * 3, ok())
+    result, control = run(client, create, max_retries=2)
+    assert isinstance(result, TwilioRestException) and result.status == 429
+    assert len(client.requests) == 3
+    assert control.stats()["create_call"]["retries"] == 2
+
+
+def test_create_call_timeout_is_not_retried():
+    client = ScriptedHttpClient(0.5, ok(), ok())
+    result, control = run(client, create, timeout=0.05)
+    assert isinstance(result, asyncio.TimeoutError)
+    assert len(client.requests) == 1
+
+
+def test_end_call_retries_timeouts_and_server_errors():
+    client = ScriptedHttpClient(0.5, ok(200), error(503), ok(200))
+    result, control = run(client, end, timeout=0.05)
+    assert not isinstance(result, Exception)
+    assert len(client.requests) == 3
+    method, uri, data = client.requests[-1]
+    assert uri.endswith(f"/Calls/{CALL_SID}.json")
+    assert data["Status"] == "completed"
+    assert control.stats()["end_call"]["retries"] == 2
+
+
+def test_end_call_does_not_retry_client_errors():
+    client = ScriptedHttpClient(error(404), ok(200))
+    result, _ = run(client, end)
+    assert isinstance(result, TwilioRestException) and result.status == 404
+    assert len(client.requests) == 1
@@ -0,0 +1,185 @@
+"""
+The audio frame fast paths in media_frames.py against a full json.loads of
+the same messages, and the playback mark bookkeeping.
+"""
+import os
+import sys
+import json
+import base64
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from media_frames import (  # noqa: E402
+    PlaybackMarks,
+    base64_audio_ms,
+    base64_decoded_len,
+    openai_append_frame,
+    parse_control_event,
+    parse_openai_audio_delta,
+    parse_twilio_media,
+    twilio_mark_frame,
+    twilio_media_frame,
+    twilio_media_frame_prefix,
+)
+
+STREAM_SID = "MZ00000000000000000000000000000001"
+PAYLOAD = "f/7+fX18e3t6+fn4+A=="
+
+
+def twilio_frame(event, **fields):
+    return json.dumps({"event": event, "sequenceNumber": "3", **fields, "streamSid": STREAM_SID})
+
+
+def media(payload=PAYLOAD, timestamp="5120"):
+    body = {"track": "inbound", "chunk": "2", "timestamp": timestamp, "payload": payload}
+    if timestamp is None:
+        del body["timestamp"]
+    return twilio_frame("media", media=body)
+
+
+def parsed_media(message):
+    """What the slow path makes of a Twilio media frame"""
+    data = json.loads(message)
+    timestamp = data["media"].get("timestamp")
+    return data["media"]["payload"], int(timestamp) if timestamp is not None else None
+
+
+@pytest.mark.parametrize("message", [
+    media(),
+    media(timestamp=None),
+    media(payload=""),
+    media().replace('"timestamp": "5120"', '"timestamp": 5120'),
+    json.dumps(json.loads(media()), separators=(",", ":")),
+    json.dumps(json.loads(media()), indent=2),
+])
+def test_twilio_media_matches_json_loads(message):
+    assert parse_twilio_media(message) == parsed_media(message)
+
+
+@pytest.mark.parametrize("message", [
+    twilio_frame("start", start={"streamSid": STREAM_SID, "callSid": "CA1", "mediaFormat": {
+        "encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1}}),
+    twilio_frame("stop", stop={"accountSid": "AC1", "callSid": "CA1"}),
+    twilio_frame("mark", mark={"name": "1200"}),
+    twilio_frame("connected", protocol="Call", version="1.0.0"),
+])
+def test_twilio_control_events_are_left_to_json_loads(message):
+    assert parse_twilio_media(message) is None
+    assert parse_control_event(message) == json.loads(message)
+
+
+@pytest.mark.parametrize("message", [
+    # Escaped characters cannot be sliced out as is
+    media(payload=PAYLOAD).replace("f/7+", "f\\/7+"),
+    media(payload=PAYLOAD).replace("fX18", "\\u0066X18"),
+    # Other key order: the event is not the first key
+    json.dumps({"streamSid": STREAM_SID, "event": "media", "media": {"payload": PAYLOAD}}),
+])
+def test_unusual_media_frames_fall_back_to_json_loads(message):
+    assert parse_twilio_media(message) is None
+    assert parse_control_event(message)["media"]["payload"] == PAYLOAD
+
+
+def openai_delta(delta=PAYLOAD):
+    return json.dumps({
+        "type": "response.audio.delta", "event_id": "event_1", "response_id": "resp_1",
+        "item_id": "item_1", "output_index": 0, "content_index": 0, "delta": delta,
+    })
+
+
+@pytest.mark.parametrize("message", [openai_delta(), openai_delta(""),
+                                     json.dumps(json.loads(openai_delta()), separators=(",", ":"))])
+def test_openai_audio_delta_matches_json_loads(message):
+    assert parse_openai_audio_delta(message) == json.loads(message)["delta"]
+
+
+@pytest.mark.parametrize("message", [
+    openai_delta().replace("f/7+", "f\\/7+"),
+    json.dumps({"type": "response.audio_transcript.delta", "delta": "Hei"}),
+    json.dumps({"type": "response.audio.done", "item_id": "item_1"}),
+])
+def test_other_openai_events_fall_back_to_json_loads(message):
+    assert parse_openai_audio_delta(message) is None
+
+
+def test_built_frames_are_valid_json():
+    assert json.loads(openai_append_frame(PAYLOAD)) == {
+        "type": "input_audio_buffer.append", "audio": PAYLOAD,
+    }
+    prefix = twilio_media_frame_prefix(STREAM_SID)
+    assert json.loads(twilio_media_frame(prefix, PAYLOAD)) == {
+        "event": "media", "streamSid": STREAM_SID, "media": {"payload": PAYLOAD},
+    }
+    assert json.loads(twilio_mark_frame(STREAM_SID, "1200")) == {
+        "event": "mark", "streamSid": STREAM_SID, "mark": {"name": "1200"},
+    }
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 159, 160, 161, 162, 800])
+def test_base64_decoded_len_matches_decoding(size):
+    data = base64.b64encode(bytes(size)).decode()
+    assert base64_decoded_len(data) == len(base64.b64decode(data)) == size
+
+
+def test_base64_audio_ms_of_ulaw_frames():
+    assert base64_audio_ms(base64.b64encode(bytes(160)).decode()) == 20
+    assert base64_audio_ms(base64.b64encode(bytes(167)).decode()) == 20
+    assert base64_audio_ms(base64.b64encode(bytes(640)).decode(), bytes_per_ms=32) == 20
+
+
+def test_marks_are_coalesced_to_the_interval():
+    marks = PlaybackMarks(100)
+    names = [marks.audio_sent(20) for _ in range(12)]
+    assert names == [None] * 4 + ["100"] + [None] * 4 + ["200"] + [None] * 2
+    assert list(marks.pending) == [100, 200]
+    assert marks.unplayed_ms == 240
+
+
+def test_flush_marks_the_rest_of_a_response_once():
+    marks = PlaybackMarks(100)
+    marks.audio_sent(60)
+    assert marks.flush() == "60"
+    assert marks.flush() is None
+    # The next mark is due a full interval after the flushed one
+    assert marks.audio_sent(80) is None
+    assert marks.audio_sent(20) == "160"
+
+
+def test_echoed_mark_confirms_it_and_every_earlier_mark():
+    marks = PlaybackMarks(100)
+    for _ in range(3):
+        marks.audio_sent(100)
+    marks.audio_sent(40)
+    assert list(marks.pending) == [100, 200, 300]
+
+    marks.played("200")
+    assert list(marks.pending) == [300]
+    assert marks.played_ms == 200
+    assert marks.unplayed_ms == 140
+
+    # A stale echo, or one that is not ours, changes nothing
+    marks.played("100")
+    marks.played("greeting")
+    assert marks.played_ms == 200
+    assert marks.unplayed_ms == 140
+
+    marks.played("300")
+    assert not marks.pending
+    assert marks.unplayed_ms == 40
+
+
+def test_clear_treats_everything_sent_as_done():
+    marks = PlaybackMarks(100)
+    marks.audio_sent(250)
+    marks.audio_sent(30)
+    marks.clear()
+    assert not marks.pending
+    assert marks.unplayed_ms == 0
+    # Echoes of marks sent before the clear are ignored
+    marks.played("250")
+    assert marks.unplayed_ms == 0
+    # Counting carries on from the total sent
+    assert marks.audio_sent(100) == "380"
+    assert marks.unplayed_ms == 100
@@ -1,9 +1,7 @@
 import os
 import json
-import base64
+import time
 import asyncio
-import httpx
-import websockets
 import logging
 from dotenv import load_dotenv
 from itertools import groupby
@@ -12,9 +10,28 @@ from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.websockets import WebSocketDisconnect
 from starlette.websockets import WebSocketState
 from twilio.twiml.voice_response import VoiceResponse, Connect
-from twilio.rest import Client
 from datetime import datetime
 
+import json_codec
+from call_control import call_control
+from call_sessions import CallSession, call_sessions
+from conversation_log import conversation_log_writer, conversation_record
+from database import get_db_pool
+from media_frames import (
+    PlaybackMarks,
+    base64_audio_ms,
+    openai_append_frame,
+    parse_control_event,
+    parse_openai_audio_delta,
+    parse_twilio_media,
+    twilio_mark_frame,
+    twilio_media_frame,
+    twilio_media_frame_prefix,
+)
+from realtime_pool import realtime_pool
+from statements import registry
+from webhooks import enqueue_webhook
+
 load_dotenv()
 
 SYSTEM_MESSAGE = (
@@ -43,14 +60,11 @@ TRANSCRIPTION_PROMPT = (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-twilio_client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
 LOCALTUNNEL_URL = os.getenv("LOCALTUNNEL_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 VOICE = "shimmer"
-
-# Global variable for current phone script
-current_phone_script = None
-current_article_id = None
+# Send response.create as soon as the stream starts, so the AI greets the callee
+GREETING_ON_START = os.getenv("OPENAI_GREETING_ON_START", "true").lower() == "true"
 
 LOG_EVENT_TYPES = [
     "error",
@@ -64,28 +78,41 @@ LOG_EVENT_TYPES = [
     "session.updated",
 ]
 SHOW_TIMING_MATH = False
-
-app = FastAPI()
-
-conversation_logs = {}
+# One playback mark per this much AI audio instead of one per audio delta
+TWILIO_MARK_INTERVAL_MS = int(os.getenv("TWILIO_MARK_INTERVAL_MS", 500))
+# On barge-in, the AI audio is truncated this far before what was sent
+TRUNCATE_BUFFER_MS = int(os.getenv("TRUNCATE_BUFFER_MS", 150))
+# Twilio sends "connected" and "start" right after the websocket opens
+STREAM_START_TIMEOUT_SECONDS = 10
+
+# Etsi viimeisin "initiated" status interview tälle article_id:lle
+COMPLETE_INTERVIEW_SQL = """
+    UPDATE phone_interview
+    SET
+        transcript_json = $1,
+        status = $2
+    WHERE news_article_id = $3
+    RETURNING id
 """
-Map Twilio Media Stream streamSid -> Twilio Call SID, so we can end the
-underlying PSTN call when the websocket stream ends.
-"""
-stream_to_call = {}
-"""
-Track article_id associations so transcripts are stored against the correct
-article, even with concurrent calls.
-call_to_article maps callSid -> article_id
-stream_to_article maps streamSid -> article_id
+
+COMPLETE_INTERVIEW_ATTEMPT_SQL = """
+    UPDATE phone_interview_attempt
+    SET ended_at = NOW(), status = $1
+    WHERE phone_interview_id = $2
 """
-call_to_article = {}
-stream_to_article = {}
+
+registry.define("phone_interview.complete", COMPLETE_INTERVIEW_SQL)
+registry.define("phone_interview_attempt.complete", COMPLETE_INTERVIEW_ATTEMPT_SQL)
+
+app = FastAPI()
 
 
 def setup_twilio_routes(app: FastAPI):
     """Setup all Twilio-related routes on the FastAPI app"""
 
+    # Calls without a phone script (inbound, /trigger-call) use the default session
+    realtime_pool.keep_warm(build_session_update())
+
     @app.api_route("/incoming-call", methods=["GET", "POST"])
     async def handle_incoming_call(request: Request):
         try:
@@ -149,17 +176,9 @@ def setup_twilio_routes(app: FastAPI):
                     content={"error": "Missing LOCALTUNNEL_URL environment variable"},
                 )
 
-            # Tallenna phone_script_json globaalisti initialize_session:ia varten
-            global current_phone_script, current_article_id
-            current_phone_script = phone_script_json
-            current_article_id = news_article_id
-
-            print("ÅÅÅÅÅÅÅÅÅÅÅÅÅÅÅÅÅÅ")
-            print("current_article_id: ", current_article_id)
-
             # Debug logging
             if phone_script_json:
-                logger.info("📱 phone_script_json received and stored globally")
+                logger.info("📱 phone_script_json received")
                 logger.info(f"   Voice: {phone_script_json.get('voice', 'not set')}")
                 logger.info(
                     f"   Language: {phone_script_json.get('language', 'not set')}"
@@ -170,25 +189,30 @@ def setup_twilio_routes(app: FastAPI):
             else:
                 logger.info("📱 No phone_script_json - using legacy mode")
 
-            call = twilio_client.calls.create(
+            call_sid = await call_control.create_call(
                 to=phone_number,
                 from_=twilio_phone_number,
                 url=f"{LOCALTUNNEL_URL}/incoming-call",
             )
 
             logger.info(
-                f"Interview call initiated - SID: {call.sid}, To: {phone_number}"
+                f"Interview call initiated - SID: {call_sid}, To: {phone_number}"
+            )
+            # Configure the call's OpenAI session while the phone rings
+            realtime_pool.prewarm(build_session_update(phone_script_json))
+            # Script and article are picked up by the call's media stream
+            call_sessions.create(
+                call_sid,
+                "twilio",
+                call_id=call_sid,
+                phone_script=phone_script_json,
+                article_id=news_article_id,
             )
-            conversation_logs[call.sid] = []
-
-            # Link this call to the news article so we can persist correctly later
-            if news_article_id:
-                call_to_article[call.sid] = news_article_id
 
             return JSONResponse(
                 content={
                     "status": "success",
-                    "call_sid": call.sid,
+                    "call_sid": call_sid,
                     "message": f"Interview call initiated to {phone_number}",
                     "to_number": phone_number,
                     "from_number": twilio_phone_number,
@@ -206,15 +230,6 @@ def setup_twilio_routes(app: FastAPI):
                 status_code=500,
                 content={"error": f"Failed to start interview: {str(e)}"},
             )
-        finally:
-            # Palauta alkuperäinen tilanne 5 minuutin kuluttua
-            async def restore_defaults():
-                await asyncio.sleep(300)
-                global current_phone_script
-                current_phone_script = None
-                logger.info("Phone script cleared, back to defaults")
-
-            asyncio.create_task(restore_defaults())
 
     @app.post("/trigger-call")
     async def trigger_call():
@@ -241,21 +256,21 @@ def setup_twilio_routes(app: FastAPI):
                     content={"error": "Missing LOCALTUNNEL_URL environment variable"},
                 )
 
-            call = twilio_client.calls.create(
+            call_sid = await call_control.create_call(
                 to=to_number,
                 from_=twilio_phone_number,
                 url=f"{LOCALTUNNEL_URL}/incoming-call",
             )
 
             logger.info(
-                f"Default call initiated successfully - SID: {call.sid}, To: {to_number}"
+                f"Default call initiated successfully - SID: {call_sid}, To: {to_number}"
             )
-            conversation_logs[call.sid] = []
+            call_sessions.create(call_sid, "twilio", call_id=call_sid)
 
             return JSONResponse(
                 content={
                     "status": "success",
-                    "call_sid": call.sid,
+                    "call_sid": call_sid,
                     "message": f"Call initiated to {to_number}",
                     "to_number": to_number,
                     "from_number": twilio_phone_number,
@@ -280,34 +295,67 @@ def setup_twilio_routes(app: FastAPI):
 
         # Local state
         openai_ws = None
+        session = None
         stream_sid = None
         latest_media_timestamp = 0
         last_assistant_item = None
-        mark_queue = []
+        marks = PlaybackMarks(TWILIO_MARK_INTERVAL_MS)
         response_start_timestamp_twilio = None
         call_ended = False
         ai_audio_ms_sent = 0  # ms of AI audio sent to Twilio for current response
         is_response_active = False  # track active AI response to avoid duplicates
+        media_frame_prefix = None  # '{"event":"media","streamSid":...' for this stream
+        stream_started_at = None  # until the first AI audio reaches Twilio
 
         try:
-            logger.info("Connecting to OpenAI Realtime API...")
-            openai_ws = await websockets.connect(
-                "wss://api.openai.com/v1/realtime?model=gpt-4o-mini-realtime-preview-2024-12-17",
-                additional_headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "OpenAI-Beta": "realtime=v1",
-                },
+            # The stream's call (and so its phone script) is only known from
+            # the "start" event, so OpenAI is connected after it
+            start = await asyncio.wait_for(
+                wait_for_stream_start(websocket), STREAM_START_TIMEOUT_SECONDS
+            )
+            if start is None:
+                return
+            stream_started_at = time.perf_counter()
+            stream_sid = start["streamSid"]
+            call_sid = start.get("callSid")
+            logger.info(f"Incoming stream has started {stream_sid}")
+            if call_sid:
+                logger.info(f"Linked streamSid {stream_sid} -> callSid {call_sid}")
+            else:
+                logger.warning("start event missing callSid – cannot link stream to call")
+            session = call_sessions.attach(call_sid or stream_sid, "twilio")
+            session.stream_id = stream_sid
+            call_sessions.link(stream_sid, session)
+            if session.article_id is not None:
+                logger.info(f"Linked streamSid {stream_sid} -> article_id {session.article_id}")
+
+            # Normally already connected and configured while the phone rang
+            logger.info("Getting OpenAI realtime session...")
+            openai_ws = await realtime_pool.acquire(
+                build_session_update(session.phone_script)
             )
-            logger.info("Successfully connected to OpenAI")
+            logger.info("OpenAI realtime session ready")
 
-            await initialize_session(openai_ws)
+            if GREETING_ON_START:
+                # Greet right away instead of waiting for the callee to speak first
+                await openai_ws.send(json_codec.dumps({"type": "response.create"}))
+                logger.info("📤 Initial response.create sent at stream start")
 
             async def receive_from_twilio():
-                nonlocal stream_sid, latest_media_timestamp, call_ended, last_assistant_item, response_start_timestamp_twilio
+                nonlocal latest_media_timestamp, call_ended
                 logger.info("Starting receive_from_twilio task")
                 try:
                     async for message in websocket.iter_text():
-                        data = json.loads(message)
+                        # Audio frames: forward the payload without parsing the JSON
+                        media = parse_twilio_media(message)
+                        if media is not None:
+                            payload, timestamp = media
+                            if timestamp is not None:
+                                latest_media_timestamp = timestamp
+                            await openai_ws.send(openai_append_frame(payload))
+                            continue
+
+                        data = parse_control_event(message)
                         logger.debug(f"Received Twilio event: {data.get('event')}")
 
                         if data["event"] == "media":
@@ -315,54 +363,15 @@ def setup_twilio_routes(app: FastAPI):
                                 latest_media_timestamp = int(data["media"]["timestamp"])
 
                             await openai_ws.send(
-                                json.dumps(
-                                    {
-                                        "type": "input_audio_buffer.append",
-                                        "audio": data["media"]["payload"],
-                                    }
-                                )
-                            )
-
-                        elif data["event"] == "start":
-                            stream_sid = data["start"]["streamSid"]
-                            logger.info(f"Incoming stream has started {stream_sid}")
-                            response_start_timestamp_twilio = None
-                            latest_media_timestamp = 0
-                            last_assistant_item = None
-
-                            if stream_sid not in conversation_logs:
-                                conversation_logs[stream_sid] = []
-
-                            call_sid = data["start"].get("callSid")
-                            if call_sid:
-                                stream_to_call[stream_sid] = call_sid
-                                logger.info(
-                                    f"Linked streamSid {stream_sid} -> callSid {call_sid}"
-                                )
-                                article_id_for_call = call_to_article.get(call_sid)
-                                if article_id_for_call is not None:
-                                    stream_to_article[stream_sid] = article_id_for_call
-                                    logger.info(
-                                        f"Linked streamSid {stream_sid} -> article_id {article_id_for_call}"
-                                    )
-                            else:
-                                logger.warning(
-                                    "start event missing callSid – cannot link stream to call"
-                                )
-
-                            logger.info(
-                                "Stream started, waiting for AI to respond based on initial session config."
+                                openai_append_frame(data["media"]["payload"])
                             )
 
                         elif data["event"] == "stop":
                             logger.info(f"Stream {stream_sid} has stopped")
                             call_ended = True
                             try:
-                                call_sid = stream_to_call.get(stream_sid)
                                 if call_sid:
-                                    twilio_client.calls(call_sid).update(
-                                        status="completed"
-                                    )
+                                    await call_control.end_call(call_sid)
                                     logger.info(
                                         f"☎️ Puhelu {call_sid} päätetty Twilion päästä"
                                     )
@@ -372,24 +381,18 @@ def setup_twilio_routes(app: FastAPI):
                                     )
                             except Exception as e:
                                 logger.error(f"Error ending call via Twilio API: {e}")
-                            finally:
-                                cs = stream_to_call.pop(stream_sid, None)
-                                if cs:
-                                    call_to_article.pop(cs, None)
-                                stream_to_article.pop(stream_sid, None)
                             break
 
-                        elif data["event"] == "mark" and mark_queue:
-                            mark_queue.pop(0)
+                        elif data["event"] == "mark":
+                            marks.played(data.get("mark", {}).get("name", ""))
 
                 except WebSocketDisconnect:
                     logger.info("Twilio WebSocket disconnected")
                     if not call_ended:
                         call_ended = True
                         try:
-                            call_sid = stream_to_call.get(stream_sid)
                             if call_sid:
-                                twilio_client.calls(call_sid).update(status="completed")
+                                await call_control.end_call(call_sid)
                                 logger.info(
                                     f"☎️ Puhelu {call_sid} päätetty Twilion päästä (WS disconnect)"
                                 )
@@ -401,11 +404,6 @@ def setup_twilio_routes(app: FastAPI):
                             logger.error(
                                 f"Error ending call via Twilio API on disconnect: {e}"
                             )
-                        finally:
-                            cs = stream_to_call.pop(stream_sid, None)
-                            if cs:
-                                call_to_article.pop(cs, None)
-                            stream_to_article.pop(stream_sid, None)
                 except Exception as e:
                     logger.error(f"Error in receive_from_twilio: {e}")
                     call_ended = True
@@ -413,7 +411,7 @@ def setup_twilio_routes(app: FastAPI):
                     logger.info("receive_from_twilio task ending")
 
             async def send_to_twilio():
-                nonlocal stream_sid, last_assistant_item, response_start_timestamp_twilio, call_ended, ai_audio_ms_sent, is_response_active
+                nonlocal last_assistant_item, call_ended, is_response_active
                 logger.info("Starting send_to_twilio task")
                 try:
                     async for openai_message in openai_ws:
@@ -421,7 +419,14 @@ def setup_twilio_routes(app: FastAPI):
                             logger.info("Call has ended, stopping send_to_twilio")
                             break
 
-                        response = json.loads(openai_message)
+                        # Audio deltas: re-wrap the base64 audio without decoding it
+                        delta = parse_openai_audio_delta(openai_message)
+                        if delta is not None:
+                            if not await forward_audio_delta(delta):
+                                break
+                            continue
+
+                        response = parse_control_event(openai_message)
 
                         if response.get("type") == "response.created":
                             is_response_active = True
@@ -437,9 +442,6 @@ def setup_twilio_routes(app: FastAPI):
                             logger.info(
                                 f"Updated session: {json.dumps(response.get('session', {}), indent=2)}"
                             )
-                            logger.info(
-                                "📤 Initial response.create sent after session.updated"
-                            )
 
                         if response.get("type") == "error":
                             error_code = response.get("error", {}).get("code")
@@ -455,21 +457,23 @@ def setup_twilio_routes(app: FastAPI):
                                 logger.error(f"OpenAI error: {response}")
                             continue
 
-                        # Do not manually create responses; server VAD create_response=True handles it
+                        # Server VAD (create_response=True) creates the replies; the only
+                        # manual response.create is the greeting at stream start
+                        # (GREETING_ON_START), so the callee does not have to speak first
 
                         if (
                             response.get("type")
                             == "conversation.item.input_audio_transcription.completed"
                         ):
                             transcript_text = response.get("transcript", "").strip()
-                            if transcript_text and stream_sid in conversation_logs:
+                            if transcript_text:
                                 logger.info(f"🎤 User: {transcript_text}")
                                 if (
-                                    not conversation_logs[stream_sid]
-                                    or conversation_logs[stream_sid][-1].get("text")
+                                    not session.conversation_log
+                                    or session.conversation_log[-1].get("text")
                                     != transcript_text
                                 ):
-                                    conversation_logs[stream_sid].append(
+                                    session.conversation_log.append(
                                         {"speaker": "user", "text": transcript_text}
                                     )
 
@@ -531,11 +535,8 @@ def setup_twilio_routes(app: FastAPI):
                                                     )
                                                 return
 
-                                            if (
-                                                transcript
-                                                and stream_sid in conversation_logs
-                                            ):
-                                                conversation_logs[stream_sid].append(
+                                            if transcript:
+                                                session.conversation_log.append(
                                                     {
                                                         "speaker": "assistant",
                                                         "text": transcript,
@@ -543,48 +544,13 @@ def setup_twilio_routes(app: FastAPI):
                                                 )
                                             logger.info(f"🤖 Assistant: {transcript}")
 
-                        if (
-                            response.get("type") == "response.audio.delta"
-                            and stream_sid
-                        ):
-                            try:
-                                decoded_bytes = base64.b64decode(response["delta"])
-                                audio_payload = base64.b64encode(decoded_bytes).decode(
-                                    "utf-8"
-                                )
-
-                                if websocket.client_state == WebSocketState.CONNECTED:
-                                    await websocket.send_json(
-                                        {
-                                            "event": "media",
-                                            "streamSid": stream_sid,
-                                            "media": {"payload": audio_payload},
-                                        }
-                                    )
-                                else:
-                                    logger.info(
-                                        "WebSocket not connected; stopping audio send"
-                                    )
-                                    break
-
-                                if response_start_timestamp_twilio is None:
-                                    ai_audio_ms_sent = 0
-                                    response_start_timestamp_twilio = (
-                                        latest_media_timestamp
-                                    )
-                                    if SHOW_TIMING_MATH:
-                                        print(
-                                            f"[DEBUG] set response_start_timestamp={response_start_timestamp_twilio}ms"
-                                        )
-
-                                ai_audio_ms_sent += int(len(decoded_bytes) / 8)
-                                await send_mark(websocket, stream_sid)
-                            except Exception as e:
-                                logger.error(f"Error sending audio to Twilio: {e}")
+                        if response.get("type") == "response.audio.delta":
+                            if not await forward_audio_delta(response["delta"]):
                                 break
 
                         if response.get("type") == "response.audio.done":
                             logger.info("✔️ AI finished audio response")
+                            await send_mark(marks.flush())
                             if websocket.client_state == WebSocketState.CONNECTED:
                                 await websocket.send_json({"event": "ai_response_done"})
 
@@ -603,21 +569,51 @@ def setup_twilio_routes(app: FastAPI):
                 finally:
                     logger.info("send_to_twilio task ending")
 
-            async def send_mark(connection, stream_sid_local):
-                if stream_sid_local:
-                    mark_event = {
-                        "event": "mark",
-                        "streamSid": stream_sid_local,
-                        "mark": {"name": "responsePart"},
-                    }
-                    if connection.client_state == WebSocketState.CONNECTED:
-                        await connection.send_json(mark_event)
-                    mark_queue.append("responsePart")
-                    if SHOW_TIMING_MATH:
-                        print("[DEBUG] sent mark=responsePart")
+            async def forward_audio_delta(delta):
+                """Send one base64 audio delta to Twilio; False when sending must stop"""
+                nonlocal response_start_timestamp_twilio, ai_audio_ms_sent, media_frame_prefix, stream_started_at
+                try:
+                    if websocket.client_state != WebSocketState.CONNECTED:
+                        logger.info("WebSocket not connected; stopping audio send")
+                        return False
+
+                    if media_frame_prefix is None:
+                        media_frame_prefix = twilio_media_frame_prefix(stream_sid)
+                    await websocket.send_text(
+                        twilio_media_frame(media_frame_prefix, delta)
+                    )
+                    if stream_started_at is not None:
+                        elapsed_ms = (time.perf_counter() - stream_started_at) * 1000
+                        realtime_pool.record_time_to_first_audio(elapsed_ms)
+                        logger.info(f"⏱️ Time to first audio: {elapsed_ms:.0f} ms")
+                        stream_started_at = None
+
+                    if response_start_timestamp_twilio is None:
+                        ai_audio_ms_sent = 0
+                        response_start_timestamp_twilio = latest_media_timestamp
+                        if SHOW_TIMING_MATH:
+                            print(
+                                f"[DEBUG] set response_start_timestamp={response_start_timestamp_twilio}ms"
+                            )
+
+                    audio_ms = base64_audio_ms(delta)
+                    ai_audio_ms_sent += audio_ms
+                    await send_mark(marks.audio_sent(audio_ms))
+                    return True
+                except Exception as e:
+                    logger.error(f"Error sending audio to Twilio: {e}")
+                    return False
+
+            async def send_mark(name):
+                if name is None:
+                    return
+                if websocket.client_state == WebSocketState.CONNECTED:
+                    await websocket.send_text(twilio_mark_frame(stream_sid, name))
+                if SHOW_TIMING_MATH:
+                    print(f"[DEBUG] sent mark={name} (unplayed={marks.unplayed_ms}ms)")
 
             async def handle_speech_started_event():
-                nonlocal response_start_timestamp_twilio, last_assistant_item, stream_sid, ai_audio_ms_sent
+                nonlocal response_start_timestamp_twilio, last_assistant_item, ai_audio_ms_sent
 
                 if not last_assistant_item:
                     logger.info("No active response to interrupt")
@@ -637,7 +633,6 @@ def setup_twilio_routes(app: FastAPI):
                     return
 
                 # Truncate point based ONLY on audio we've actually sent to Twilio
-                TRUNCATE_BUFFER_MS = 150  # small safety buffer
                 audio_end_ms = max(0, ai_audio_ms_sent - TRUNCATE_BUFFER_MS)
                 if audio_end_ms <= 0:
                     logger.info(
@@ -657,19 +652,19 @@ def setup_twilio_routes(app: FastAPI):
                         "content_index": 0,
                         "audio_end_ms": audio_end_ms,
                     }
-                    await openai_ws.send(json.dumps(truncate_event))
+                    await openai_ws.send(json_codec.dumps(truncate_event))
                     if websocket.client_state == WebSocketState.CONNECTED:
                         await websocket.send_json(
                             {"event": "clear", "streamSid": stream_sid}
                         )
-                    mark_queue.clear()
+                    marks.clear()
                     logger.info(
                         f"✂️ Truncated AI audio at {audio_end_ms}ms (of {ai_audio_ms_sent}ms total)"
                     )
 
                 except Exception as e:
                     logger.warning(f"Audio truncation failed (non-critical): {e}")
-                    mark_queue.clear()
+                    marks.clear()
 
                 finally:
                     last_assistant_item = None
@@ -723,28 +718,36 @@ def setup_twilio_routes(app: FastAPI):
             except Exception as e:
                 logger.error(f"Error closing Twilio WebSocket: {e}")
 
-            if stream_sid:
-                await save_conversation_log(stream_sid)
+            if session is not None:
+                await save_conversation_log(session)
+                call_sessions.remove(session)
 
             logger.info("Media stream handler completed")
 
 
-async def initialize_session(openai_ws):
-    """Initialize OpenAI session - Twilio:n mallin mukaan"""
-    global current_phone_script
+async def wait_for_stream_start(websocket: WebSocket):
+    """Read Twilio events up to "start" and return its payload (None if the stream closed first)"""
+    try:
+        while True:
+            data = parse_control_event(await websocket.receive_text())
+            if data.get("event") == "start":
+                return data["start"]
+            logger.debug(f"Received Twilio event before start: {data.get('event')}")
+    except WebSocketDisconnect:
+        logger.info("Twilio WebSocket disconnected before the stream started")
+        return None
+
 
+def build_session_update(phone_script=None) -> dict:
+    """OpenAI session.update for a call; realtime_pool pre-warms connections with it"""
     logger.info("📋 Building session configuration...")
-    logger.info(f"current_phone_script status: {current_phone_script is not None}")
-
-    # ODOTA 0.25s ennen session.update:a (kuten Twilio:n esimerkissä)
-    await asyncio.sleep(0.25)
-    logger.info("⏳ Sending session update after 250ms delay...")
+    logger.info(f"phone_script status: {phone_script is not None}")
 
     # Käytä phone_script_json jos saatavilla
-    if current_phone_script:
+    if phone_script:
         logger.info("🎯 USING PHONE_SCRIPT_JSON CONFIGURATION!")
-        instructions = current_phone_script.get("instructions")
-        requested_voice = current_phone_script.get("voice", VOICE)
+        instructions = phone_script.get("instructions")
+        requested_voice = phone_script.get("voice", VOICE)
 
         # Validoi voice
         supported_voices = [
@@ -760,15 +763,15 @@ async def initialize_session(openai_ws):
         if requested_voice in supported_voices:
             voice = requested_voice
         else:
-            voice = "coral" if current_phone_script.get("language") == "fi" else "alloy"
+            voice = "coral" if phone_script.get("language") == "fi" else "alloy"
             logger.warning(
                 f"Voice '{requested_voice}' not supported, using '{voice}' instead"
             )
 
-        temperature = current_phone_script.get("temperature", 0.8)
-        language = current_phone_script.get("language", "fi")
+        temperature = phone_script.get("temperature", 0.8)
+        language = phone_script.get("language", "fi")
 
-        clean_script = current_phone_script.copy()
+        clean_script = phone_script.copy()
         base_instructions = clean_script.pop("instructions")
 
         instructions = (
@@ -811,43 +814,22 @@ async def initialize_session(openai_ws):
         },
     }
 
-    print("TÄÄ KIINNOSTAA!")
-    print(session_update)
-
-    try:
-        logger.info("📤 Sending session update (Twilio style)...")
-        logger.info(f"Voice: {voice}, Temperature: {temperature}")
-        logger.info(f"Instructions: {instructions[:100]}...")
-
-        await openai_ws.send(json.dumps(session_update))
-        logger.info("✅ Session update sent successfully")
-
-    except Exception as e:
-        logger.error(f"❌ Failed to send session update: {e}")
-        raise
+    logger.info(f"Voice: {voice}, Temperature: {temperature}")
+    logger.info(f"Instructions: {instructions[:100]}...")
+    return session_update
 
 
-async def save_conversation_log(stream_sid):
+async def save_conversation_log(session: CallSession):
     """Save conversation log to files and UPDATE database using article_id."""
+    stream_sid = session.stream_id
     try:
-        if stream_sid not in conversation_logs or not conversation_logs[stream_sid]:
+        if not session.conversation_log:
             logger.info(
                 f"No conversation log found for stream_sid {stream_sid}, nothing to save."
             )
             return
 
-        conversation_log = conversation_logs.pop(stream_sid)
-
-        # Tallenna tiedostoihin (backup)
-        log_dir = "conversations_log"
-        os.makedirs(log_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_filepath = os.path.join(
-            log_dir, f"conversation_log_{stream_sid}_{timestamp}.json"
-        )
-
-        with open(log_filepath, "w", encoding="utf-8") as f:
-            json.dump(conversation_log, f, ensure_ascii=False, indent=2)
+        conversation_log = session.conversation_log
 
         # Luo dialogue_turns
         dialogue_turns = []
@@ -855,18 +837,15 @@ async def save_conversation_log(stream_sid):
             texts = [msg["text"] for msg in group]
             dialogue_turns.append({"speaker": speaker, "text": "\n".join(texts)})
 
-        turns_filepath = os.path.join(
-            log_dir, f"conversation_turns_{stream_sid}_{timestamp}.json"
+        # Tallenna tiedostoon (backup), taustalla
+        conversation_log_writer.submit(
+            conversation_record(
+                "twilio", stream_sid, conversation_log, dialogue_turns, call_sid=session.call_id
+            )
         )
-        with open(turns_filepath, "w", encoding="utf-8") as f:
-            json.dump(dialogue_turns, f, ensure_ascii=False, indent=2)
 
-        # PÄIVITÄ tietokanta käyttäen article_id:tä
-        # Prefer stream-specific mapping; fall back to global (single-call case)
-        global current_article_id
-        article_id = stream_to_article.pop(stream_sid, None)
-        if article_id is None:
-            article_id = current_article_id  # fallback for legacy/test flows
+        # PÄIVITÄ tietokanta käyttäen article_id:tä (set by /start-interview for this call)
+        article_id = session.article_id
 
         if article_id is not None:
             # THIS WILL SAVE INTERVIEW ANSWERS TO DB
@@ -884,9 +863,8 @@ async def save_conversation_log(stream_sid):
             logger.info("ℹ️ No article_id available - this is likely a test call")
 
         logger.info(
-            f"Conversation log for stream_sid {stream_sid} saved successfully ({len(conversation_log)} messages)"
+            f"Conversation log for stream_sid {stream_sid} queued ({len(conversation_log)} messages); the backup file and webhook delivery happen in the background"
         )
-        logger.info(f"Files saved: {log_filepath} and {turns_filepath}")
 
     except Exception as e:
         logger.error(f"Error saving conversation log for stream_sid {stream_sid}: {e}")
@@ -897,17 +875,6 @@ async def save_conversation_log(stream_sid):
 async def update_interview_by_article_id(article_id, dialogue_turns):
     """Update existing phone interview with transcript using article_id."""
     try:
-        import asyncpg
-
-        # Database connection
-        conn = await asyncpg.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            port=os.getenv("DB_PORT", 5432),
-            user=os.getenv("DB_USER", "postgres"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME", "newsroom"),
-        )
-
         # Prepare transcript data
         transcript_json = {
             "dialogue_turns": dialogue_turns,
@@ -923,40 +890,37 @@ async def update_interview_by_article_id(article_id, dialogue_turns):
             },
         }
 
-        # Etsi viimeisin "initiated" status interview tälle article_id:lle
-        update_query = """
-            UPDATE phone_interview 
-            SET 
-                transcript_json = $1,
-                status = $2
-            WHERE news_article_id = $3 
-            RETURNING id
-        """
-
-        interview_id = await conn.fetchval(
-            update_query,
-            json.dumps(transcript_json),  # $1 - transcript as JSONB
-            "completed",  # $2 - new status
-            article_id,  # $3 - article_id (news_article_id kolumnissa)
-        )
+        # Interview and its attempt are completed together or not at all
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                interview_id = await registry.fetchval(
+                    conn,
+                    "phone_interview.complete",
+                    transcript_json,  # $1 - transcript as JSONB (pool codec encodes it)
+                    "completed",  # $2 - new status
+                    article_id,  # $3 - article_id (news_article_id kolumnissa)
+                )
+                if interview_id:
+                    # Päivitä myös phone_interview_attempt jos sellainen on
+                    await registry.fetch(
+                        conn, "phone_interview_attempt.complete", "completed", interview_id
+                    )
+                    webhook = await queue_phone_interview_webhook(
+                        conn, article_id, dialogue_turns
+                    )
 
         if interview_id:
-            # Päivitä myös phone_interview_attempt jos sellainen on
-            await conn.execute(
-                """
-                UPDATE phone_interview_attempt 
-                SET ended_at = NOW(), status = $1
-                WHERE phone_interview_id = $2
-                """,
-                "completed",
-                interview_id,
-            )
-
             logger.info(
                 f"📊 Updated interview ID {interview_id} for article {article_id} with transcript ({len(dialogue_turns)} turns)"
             )
-            asyncio.create_task(send_phone_interview_webhook(article_id, dialogue_turns))
-            logger.info("📤 Webhook queued (fire-and-forget)")
+            if webhook is not None:
+                # Only now that the interview is committed
+                webhook.release()
+                if webhook.id is not None:
+                    logger.info(f"📤 Webhook {webhook.id} queued in outbox")
+                else:
+                    logger.info("📤 Webhook queued for in-memory delivery (no outbox table)")
         else:
             logger.warning(
                 f"⚠️ No initiated phone_interview found for article: {article_id}"
@@ -965,7 +929,6 @@ async def update_interview_by_article_id(article_id, dialogue_turns):
                 "This might be a test call or the interview was already completed"
             )
 
-        await conn.close()
         return interview_id
 
     except Exception as e:
@@ -974,30 +937,16 @@ async def update_interview_by_article_id(article_id, dialogue_turns):
 
 # WHEN interview is completed, we send a webhook to callback-server
 # This will trigger news enrichment and publishing process
-async def send_phone_interview_webhook(article_id: int, interview_content: list):
+async def queue_phone_interview_webhook(conn, article_id: int, interview_content: list):
     """
-    Lähettää puhelinhaastattelun webhook callback-serverille.
-    Vain article_id ja interview_content - yksinkertaista!
+    Lisää puhelinhaastattelun webhookin lähetysjonoon (webhook_outbox) samassa
+    transaktiossa kuin haastattelun päivitys. Vain article_id ja interview_content.
+    Palauttaa PendingWebhookin: kutsu release() vasta commitin jälkeen.
     """
     url = os.getenv("PHONE_INTERVIEW_WEBHOOK_URL")
     if not url:
         logger.info("PHONE_INTERVIEW_WEBHOOK_URL not set; skipping webhook")
-        return
-
-    headers = {
-        "Content-Type": "application/json",
-        "X-Webhook-Secret": os.getenv("WEBHOOK_SECRET", ""),
-    }
+        return None
 
     payload = {"article_id": article_id, "interview": interview_content}
-    
-    print("TÄÄ LÄHETETÄÄN! ",payload )
-    print(payload)
-
-    try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            resp = await client.post(url, json=payload, headers=headers)
-            resp.raise_for_status()  # 202 Accepted on ok
-        logger.info(f"✅ Phone interview webhook lähetetty: article_id={article_id}")
-    except Exception as e:
-        logger.error(f"❌ Phone interview webhook epäonnistui: {e}")
+    return await enqueue_webhook(conn, "phone_interview.completed", url, payload)
@@ -1,10 +1,17 @@
 # utils.py
 import json
 import re
+import base64
 import logging
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Optional, Any, Iterable, Sequence, Tuple
 from datetime import datetime
 
+from strawberry import Info
+from strawberry.types.nodes import SelectedField
+
+import json_codec
 from schema import (
     NewsArticle,
     Location,
@@ -19,42 +26,68 @@ from schema import (
 logger = logging.getLogger(__name__)
 
 
+# Applied in this order. Each pass is skipped when its marker character is
+# not in the text, since the pattern cannot match then; the output is the
+# same as running every pass.
+_MARKDOWN_PASSES = (
+    # Headers
+    ("#", re.compile(r"^#{1,6}\s+", re.MULTILINE), ""),
+    # Bold/italic
+    ("**", re.compile(r"\*\*(.*?)\*\*"), r"\1"),
+    ("__", re.compile(r"__(.*?)__"), r"\1"),
+    ("*", re.compile(r"\*(.*?)\*"), r"\1"),
+    ("_", re.compile(r"_(.*?)_"), r"\1"),
+    # Links
+    ("](", re.compile(r"\[([^\]]+)\]\([^)]+\)"), r"\1"),
+    # Code blocks
+    ("```", re.compile(r"```[\s\S]*?```"), ""),
+    ("`", re.compile(r"`([^`]+)`"), r"\1"),
+    # Quotes
+    (">", re.compile(r"^>\s+", re.MULTILINE), ""),
+    # Lists
+    (None, re.compile(r"^[-*+]\s+", re.MULTILINE), ""),
+    (".", re.compile(r"^\d+\.\s+", re.MULTILINE), ""),
+)
+_WHITESPACE = re.compile(r"\s+")
+_LIST_MARKERS = ("-", "*", "+")
+
+# Leads repeat across list responses; keyed by the text itself
+MARKDOWN_CACHE_SIZE = 4096
+
+
 def remove_markdown_syntax(text: str) -> str:
     """Remove markdown syntax from text - Python equivalent of JavaScript function"""
     if not text or not isinstance(text, str):
         return text
-
-    # Remove headers
-    text = re.sub(r"^#{1,6}\s+", "", text, flags=re.MULTILINE)
-    # Remove bold/italic
-    text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
-    text = re.sub(r"__(.*?)__", r"\1", text)
-    text = re.sub(r"\*(.*?)\*", r"\1", text)
-    text = re.sub(r"_(.*?)_", r"\1", text)
-    # Remove links
-    text = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", text)
-    # Remove code blocks
-    text = re.sub(r"```[\s\S]*?```", "", text)
-    text = re.sub(r"`([^`]+)`", r"\1", text)
-    # Remove quotes
-    text = re.sub(r"^>\s+", "", text, flags=re.MULTILINE)
-    # Remove lists
-    text = re.sub(r"^[-*+]\s+", "", text, flags=re.MULTILINE)
-    text = re.sub(r"^\d+\.\s+", "", text, flags=re.MULTILINE)
+    return _remove_markdown_syntax(text)
+
+
+@lru_cache(maxsize=MARKDOWN_CACHE_SIZE)
+def _remove_markdown_syntax(text: str) -> str:
+    for marker, pattern, replacement in _MARKDOWN_PASSES:
+        if marker is None:
+            if not any(char in text for char in _LIST_MARKERS):
+                continue
+        elif marker not in text:
+            continue
+        text = pattern.sub(replacement, text)
     # Clean whitespace
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+    return _WHITESPACE.sub(" ", text).strip()
 
 
 def parse_json_field(field_value: Any, default=None) -> Any:
-    """Safely parse JSON field"""
+    """
+    Safely parse JSON field. Pool connections decode json/jsonb columns
+    already (database.init_connection), so this only parses text, e.g.
+    from a ::text cast or a connection without the codecs.
+    """
     if field_value is None:
         return default
 
     if isinstance(field_value, str):
         try:
-            return json.loads(field_value)
-        except json.JSONDecodeError:
+            return json_codec.loads(field_value)
+        except json_codec.JSONDecodeError:
             logger.error(f"Error parsing JSON field: {field_value}")
             return default
 
@@ -151,6 +184,26 @@ def parse_interviews(interviews_data: Any) -> Optional[List[str]]:
     return []
 
 
+ORDER_FIELD_COLUMNS = {
+    NewsOrderField.ID: "id",
+    NewsOrderField.PUBLISHED_AT: "published_at",
+    NewsOrderField.UPDATED_AT: "updated_at",
+    NewsOrderField.CANONICAL_NEWS_ID: "canonical_news_id",
+}
+
+# Columns that can be NULL need special handling in keyset comparisons
+NULLABLE_ORDER_FIELDS = {
+    NewsOrderField.PUBLISHED_AT,
+    NewsOrderField.UPDATED_AT,
+    NewsOrderField.CANONICAL_NEWS_ID,
+}
+TIMESTAMP_ORDER_FIELDS = {NewsOrderField.PUBLISHED_AT, NewsOrderField.UPDATED_AT}
+
+MAX_PAGE_SIZE = 100
+# total_count stops counting here so it stays cheap on large archives
+TOTAL_COUNT_CAP = 10000
+
+
 def build_order_clause(order_by: Optional[NewsOrderBy]) -> str:
     """Build SQL ORDER BY clause"""
     if not order_by:
@@ -158,15 +211,165 @@ def build_order_clause(order_by: Optional[NewsOrderBy]) -> str:
 
     sort_order = "ASC" if order_by.order == SortOrder.ASC else "DESC"
 
-    field_mapping = {
-        NewsOrderField.ID: "id",
-        NewsOrderField.PUBLISHED_AT: "published_at",
-        NewsOrderField.UPDATED_AT: "updated_at",
-        NewsOrderField.CANONICAL_NEWS_ID: "canonical_news_id",
+    field_name = ORDER_FIELD_COLUMNS.get(order_by.field, "published_at")
+    return f"ORDER BY {field_name} {sort_order}"
+
+
+def resolve_order(order_by: Optional[NewsOrderBy]) -> Tuple[NewsOrderField, bool]:
+    """Return (order field, descending) with the same defaults as build_order_clause"""
+    if not order_by:
+        return NewsOrderField.PUBLISHED_AT, True
+    return order_by.field, order_by.order != SortOrder.ASC
+
+
+def clamp_page_size(first: Optional[int], default: int = 17) -> int:
+    """Clamp requested page size to 1..MAX_PAGE_SIZE"""
+    if first is None:
+        return default
+    return max(1, min(first, MAX_PAGE_SIZE))
+
+
+def encode_cursor(order_field: NewsOrderField, value: Any, article_id: Any) -> str:
+    """Encode an opaque cursor from the sort key of the last row on a page"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([order_field.value, value, int(article_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, order_field: NewsOrderField) -> Tuple[Any, int]:
+    """Decode cursor into (sort value, id). Raises ValueError on a bad or mismatched cursor"""
+    try:
+        field_name, value, article_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii"))
+        )
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if field_name != order_field.value:
+        raise ValueError("Cursor does not match the requested ordering")
+
+    if value is not None and order_field in TIMESTAMP_ORDER_FIELDS:
+        value = datetime.fromisoformat(value)
+    return value, int(article_id)
+
+
+def order_variant(order_by: Optional[NewsOrderBy]) -> str:
+    """Short label of an ordering for statement names, e.g. 'published_at.desc'"""
+    order_field, descending = resolve_order(order_by)
+    return f"{ORDER_FIELD_COLUMNS[order_field]}.{'desc' if descending else 'asc'}"
+
+
+def build_keyset_clauses(
+    order_by: Optional[NewsOrderBy],
+    after: Optional[str],
+    first_param_index: int,
+    alias: str = "",
+) -> Tuple[Optional[str], str, List[Any], str]:
+    """
+    Build keyset pagination SQL: (WHERE condition or None, ORDER BY clause, params, variant).
+
+    Rows are ordered by the sort column plus id as a tiebreaker, NULLs last, so
+    the condition can seek straight to the next page instead of using OFFSET.
+    The variant ("first", "after" or "after_null") names the SQL shape.
+    """
+    order_field, descending = resolve_order(order_by)
+    column = f"{alias}{ORDER_FIELD_COLUMNS[order_field]}"
+    id_column = f"{alias}id"
+    direction = "DESC" if descending else "ASC"
+    op = "<" if descending else ">"
+
+    if order_field == NewsOrderField.ID:
+        order_clause = f"ORDER BY {id_column} {direction}"
+    else:
+        order_clause = (
+            f"ORDER BY {column} {direction} NULLS LAST, {id_column} {direction}"
+        )
+
+    if not after:
+        return None, order_clause, [], "first"
+
+    value, last_id = decode_cursor(after, order_field)
+    value_param = f"${first_param_index}"
+
+    if order_field == NewsOrderField.ID:
+        return f"{id_column} {op} {value_param}", order_clause, [last_id], "after"
+
+    if value is None:
+        # Already inside the NULL tail of the ordering, only the id decides
+        condition = f"({column} IS NULL AND {id_column} {op} {value_param})"
+        return condition, order_clause, [last_id], "after_null"
+
+    id_param = f"${first_param_index + 1}"
+    condition = f"(({column}, {id_column}) {op} ({value_param}, {id_param})"
+    if order_field in NULLABLE_ORDER_FIELDS:
+        condition += f" OR {column} IS NULL"
+    condition += ")"
+    return condition, order_clause, [value, last_id], "after"
+
+
+# NewsArticle GraphQL fields map 1:1 to news_article columns, in SELECT order
+NEWS_ARTICLE_COLUMNS = (
+    "id",
+    "canonical_news_id",
+    "language",
+    "version",
+    "lead",
+    "summary",
+    "status",
+    "location_tags",
+    "sources",
+    "interviews",
+    "review_status",
+    "author",
+    "body_blocks",
+    "enrichment_status",
+    "markdown_content",
+    "published_at",
+    "updated_at",
+    "original_article_type",
+    "featured",
+    "categories",
+    "hero_image_url",
+)
+# Always selected: NewsArticle cannot be built without these
+REQUIRED_ARTICLE_COLUMNS = ("id", "language")
+
+
+def _flatten_selections(selections: Iterable[Any]) -> Iterable[SelectedField]:
+    """Yield selected fields, expanding fragment spreads and inline fragments"""
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            yield selection
+        else:
+            yield from _flatten_selections(selection.selections)
+
+
+def selected_field_names(info: Info, path: Sequence[str] = ()) -> set:
+    """Names selected under the current field, optionally below a path like ("edges", "node")"""
+    fields = list(_flatten_selections(info.selected_fields))
+    for name in path:
+        fields = [
+            child
+            for field in fields
+            for child in _flatten_selections(field.selections)
+            if child.name == name
+        ]
+    return {
+        child.name for field in fields for child in _flatten_selections(field.selections)
     }
 
-    field_name = field_mapping.get(order_by.field, "published_at")
-    return f"ORDER BY {field_name} {sort_order}"
+
+def selected_article_columns(
+    info: Info, path: Sequence[str] = (), extra: Sequence[str] = ()
+) -> Tuple[str, ...]:
+    """news_article columns needed for the NewsArticle fields the client selected"""
+    names = selected_field_names(info, path)
+    return tuple(
+        column
+        for column in NEWS_ARTICLE_COLUMNS
+        if column in names or column in REQUIRED_ARTICLE_COLUMNS or column in extra
+    )
 
 
 def format_datetime(dt: Optional[datetime]) -> Optional[str]:
@@ -174,28 +377,81 @@ def format_datetime(dt: Optional[datetime]) -> Optional[str]:
     return dt.isoformat() if dt else None
 
 
-def map_db_row_to_news_article(row: Dict[str, Any]) -> NewsArticle:
-    """Map database row to NewsArticle object"""
-    return NewsArticle(
-        id=str(row["id"]),
-        canonical_news_id=row.get("canonical_news_id", 0),
-        language=row["language"],
-        version=row.get("version"),
-        lead=remove_markdown_syntax(row.get("lead")) if row.get("lead") else None,
-        summary=row.get("summary"),
-        status=row.get("status"),
-        location_tags=parse_location_tags(row.get("location_tags")),
-        sources=parse_sources(row.get("sources")),
-        interviews=parse_interviews(row.get("interviews")),
-        review_status=row.get("review_status"),
-        author=row.get("author"),
-        body_blocks=parse_body_blocks(row.get("body_blocks")),
-        enrichment_status=row.get("enrichment_status"),
-        markdown_content=row.get("markdown_content"),
-        published_at=format_datetime(row.get("published_at")),
-        updated_at=format_datetime(row.get("updated_at")),
-        original_article_type=row.get("original_article_type"),
-        featured=row.get("featured"),
-        categories=row.get("categories", []),
-        hero_image_url=row.get("hero_image_url")
-    )
+# Shared result for the (common) empty JSON columns; tuples, so no caller can
+# mutate what other articles share. GraphQL serializes them as lists.
+_EMPTY = ()
+
+
+def _lead(value: Optional[str]) -> Optional[str]:
+    return remove_markdown_syntax(value) if value else None
+
+
+def _empty_or(parse):
+    def convert(value):
+        return parse(value) if value else _EMPTY
+    return convert
+
+
+# Conversion of a selected news_article column to its NewsArticle field;
+# columns not listed are passed through as is
+_ARTICLE_CONVERTERS = {
+    "id": str,
+    "lead": _lead,
+    "location_tags": parse_location_tags,
+    "sources": _empty_or(parse_sources),
+    "interviews": _empty_or(parse_interviews),
+    "body_blocks": _empty_or(parse_body_blocks),
+    "published_at": format_datetime,
+    "updated_at": format_datetime,
+}
+
+
+class ArticleRowMapper:
+    """
+    Builds NewsArticle objects from rows with one fixed set of columns.
+
+    The columns to read and the ones that need converting are worked out
+    once per projection; each row is then read in one itemgetter call
+    (asyncpg Record or dict, no copy) and only the selected fields are
+    built. Unselected fields keep their defaults, which are never serialized.
+    """
+
+    __slots__ = ("columns", "getter", "converters")
+
+    def __init__(self, columns: Sequence[str]):
+        known = set(NEWS_ARTICLE_COLUMNS)
+        self.columns = tuple(column for column in columns if column in known)
+        # Rows always carry id and language (REQUIRED_ARTICLE_COLUMNS), so
+        # the getter returns a tuple
+        self.getter = itemgetter(*self.columns)
+        self.converters = tuple(
+            (column, _ARTICLE_CONVERTERS[column])
+            for column in self.columns
+            if column in _ARTICLE_CONVERTERS
+        )
+
+    def __call__(self, row) -> NewsArticle:
+        values = dict(zip(self.columns, self.getter(row)))
+        for column, convert in self.converters:
+            values[column] = convert(values[column])
+        values.setdefault("canonical_news_id", 0)
+        return NewsArticle(**values)
+
+
+@lru_cache(maxsize=256)
+def article_row_mapper(columns: Tuple[str, ...]) -> ArticleRowMapper:
+    """Mapper for rows with these columns (cached per projection)"""
+    return ArticleRowMapper(columns)
+
+
+def map_db_row_to_news_article(row) -> NewsArticle:
+    """Map database row (asyncpg Record or dict) to NewsArticle object"""
+    return article_row_mapper(tuple(row.keys()))(row)
+
+
+def map_db_rows_to_news_articles(rows: Sequence[Any]) -> List[NewsArticle]:
+    """Map a result set; all rows share the columns, so one mapper serves them all"""
+    if not rows:
+        return []
+    mapper = article_row_mapper(tuple(rows[0].keys()))
+    return [mapper(row) for row in rows]
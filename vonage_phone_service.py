@@ -1,17 +1,22 @@
 import os
-import json
 import base64
 import asyncio
 import websockets
 import logging
+import uuid
 from itertools import groupby
 from fastapi import FastAPI, WebSocket, Request
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.websockets import WebSocketDisconnect
 import vonage
-from datetime import datetime
 from dotenv import load_dotenv
 
+import json_codec
+from audio_codec import FrameBuffer, L16ToUlaw, UlawToL16
+from call_sessions import CallSession, call_sessions
+from conversation_log import conversation_log_writer, conversation_record
+from media_frames import openai_append_frame
+
 # Lataa .env tiedosto
 load_dotenv()
 
@@ -73,6 +78,11 @@ vonage_client = Vonage(auth=auth)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 VOICE = "shimmer"
 
+# Websocket audio format requested in the NCCO ("audio/l16;rate=16000")
+VONAGE_SAMPLE_RATE = 16000
+VONAGE_BYTES_PER_MS = VONAGE_SAMPLE_RATE * 2 // 1000
+VONAGE_FRAME_BYTES = VONAGE_BYTES_PER_MS * 20
+
 LOG_EVENT_TYPES = [
     "error",
     "response.content.done",
@@ -86,7 +96,11 @@ LOG_EVENT_TYPES = [
 SHOW_TIMING_MATH = False
 
 app = FastAPI()
-conversation_logs = {}
+
+
+def websocket_uri(session_key: str) -> str:
+    """NCCO websocket endpoint; the query string tells the socket which call session it serves"""
+    return f"{WEBHOOK_BASE_URL.replace('https://', 'wss://')}/websocket?session={session_key}"
 
 
 def setup_vonage_routes(app: FastAPI):
@@ -96,6 +110,9 @@ def setup_vonage_routes(app: FastAPI):
     async def handle_answer_webhook(request: Request):
         """Vonage webhook for incoming calls"""
         try:
+            # Inbound calls: Vonage passes the call's uuid to the answer URL
+            session_key = request.query_params.get("uuid") or uuid.uuid4().hex
+
             # NCCO (Nexmo Call Control Object) - Vonagen versio TwiML:stä
             ncco = [
                 {
@@ -108,7 +125,7 @@ def setup_vonage_routes(app: FastAPI):
                     "endpoint": [
                         {
                             "type": "websocket",
-                            "uri": f"{WEBHOOK_BASE_URL.replace('https://', 'wss://')}/websocket",
+                            "uri": websocket_uri(session_key),
                             "content-type": "audio/l16;rate=16000",
                         }
                     ],
@@ -166,9 +183,11 @@ def setup_vonage_routes(app: FastAPI):
                     content={"error": "Missing WEBHOOK_BASE_URL environment variable"},
                 )
 
-            global SYSTEM_MESSAGE
-            original_message = SYSTEM_MESSAGE
-            SYSTEM_MESSAGE = system_prompt
+            # The call's websocket picks its prompt up from this session
+            session_key = uuid.uuid4().hex
+            session = call_sessions.create(
+                session_key, "vonage", system_prompt=system_prompt
+            )
 
             # Määritä NCCO
             ncco = [
@@ -182,7 +201,7 @@ def setup_vonage_routes(app: FastAPI):
                     "endpoint": [
                         {
                             "type": "websocket",
-                            "uri": f"{WEBHOOK_BASE_URL.replace('https://', 'wss://')}/websocket",
+                            "uri": websocket_uri(session_key),
                             "content-type": "audio/l16;rate=16000",
                         }
                     ],
@@ -196,16 +215,20 @@ def setup_vonage_routes(app: FastAPI):
                 ncco=ncco,
             )
 
-            response = vonage_client.voice.create_call(call_request)
+            try:
+                response = vonage_client.voice.create_call(call_request)
+            except Exception:
+                call_sessions.remove(session)
+                raise
             call_uuid = response.uuid
+            session.call_id = call_uuid
+            call_sessions.link(call_uuid, session)
 
             logger.info(
                 f"Vonage interview call initiated - UUID: {call_uuid}, To: {phone_number}"
             )
             logger.info(f"Interview context: {interview_context}")
 
-            conversation_logs[call_uuid] = []
-
             return JSONResponse(
                 content={
                     "status": "success",
@@ -224,15 +247,6 @@ def setup_vonage_routes(app: FastAPI):
                 status_code=500,
                 content={"error": f"Failed to start interview: {str(e)}"},
             )
-        finally:
-
-            async def restore_message():
-                await asyncio.sleep(300)
-                global SYSTEM_MESSAGE
-                SYSTEM_MESSAGE = original_message
-                logger.info("System message restored to default")
-
-            asyncio.create_task(restore_message())
 
     @app.post("/trigger-call")
     async def trigger_call():
@@ -263,6 +277,9 @@ def setup_vonage_routes(app: FastAPI):
                     content={"error": "Missing WEBHOOK_BASE_URL environment variable"},
                 )
 
+            session_key = uuid.uuid4().hex
+            session = call_sessions.create(session_key, "vonage")
+
             ncco = [
                 {
                     "action": "talk",
@@ -274,7 +291,7 @@ def setup_vonage_routes(app: FastAPI):
                     "endpoint": [
                         {
                             "type": "websocket",
-                            "uri": f"{WEBHOOK_BASE_URL.replace('https://', 'wss://')}/websocket",
+                            "uri": websocket_uri(session_key),
                             "content-type": "audio/l16;rate=16000",
                         }
                     ],
@@ -294,15 +311,19 @@ def setup_vonage_routes(app: FastAPI):
             call_request = CreateCallRequest(**call_params)
             print("call_request luotu:", call_request)
 
-            response = vonage_client.voice.create_call(call_request)
+            try:
+                response = vonage_client.voice.create_call(call_request)
+            except Exception:
+                call_sessions.remove(session)
+                raise
             call_uuid = response.uuid
+            session.call_id = call_uuid
+            call_sessions.link(call_uuid, session)
 
             logger.info(
                 f"Default Vonage call initiated - UUID: {call_uuid}, To: {to_number}"
             )
 
-            conversation_logs[call_uuid] = []
-
             return JSONResponse(
                 content={
                     "status": "success",
@@ -342,12 +363,19 @@ def setup_vonage_routes(app: FastAPI):
             return
 
         openai_ws = None
-        call_uuid = None
+        session_key = websocket.query_params.get("session") or uuid.uuid4().hex
+        session = call_sessions.attach(session_key, "vonage")
+        if session.call_id is None:
+            session.call_id = session_key
         latest_media_timestamp = 0
         last_assistant_item = None
         mark_queue = []
         response_start_timestamp = None
         call_ended = False
+        # Stateful transcoders: keep resampler history across 20 ms frames
+        inbound_audio = L16ToUlaw(VONAGE_SAMPLE_RATE)
+        outbound_audio = UlawToL16(VONAGE_SAMPLE_RATE)
+        outbound_frames = FrameBuffer(VONAGE_FRAME_BYTES)
 
         try:
             logger.info("Connecting to OpenAI Realtime API...")
@@ -360,35 +388,34 @@ def setup_vonage_routes(app: FastAPI):
             )
             logger.info("Successfully connected to OpenAI")
 
-            await initialize_session(openai_ws)
+            await initialize_session(openai_ws, session)
 
             async def receive_from_vonage():
-                nonlocal call_uuid, latest_media_timestamp, call_ended
+                nonlocal latest_media_timestamp, call_ended
                 logger.info("Starting receive_from_vonage task")
                 try:
-                    async for message in websocket.iter_text():
-                        # Vonage WebSocket viestien käsittely
-                        if message:
-                            # Vonage lähettää audio dataa base64-enkoodattuna
-                            # Tämä pitää muuntaa OpenAI:lle sopivaan muotoon
+                    while True:
+                        message = await websocket.receive()
+                        if message["type"] == "websocket.disconnect":
+                            raise WebSocketDisconnect(message.get("code", 1000))
+
+                        # Binary frames: 20 ms of L16 16 kHz audio
+                        audio = message.get("bytes")
+                        if audio:
+                            latest_media_timestamp += len(audio) // VONAGE_BYTES_PER_MS
                             try:
-                                audio_data = base64.b64decode(message)
-                                # Muunna L16 16kHz -> muLaw 8kHz OpenAI:lle
-                                # Tämä on yksinkertaistettu - oikeassa toteutuksessa tarvitsisi
-                                # kunnollisen audio resampling -kirjaston
-                                audio_b64 = base64.b64encode(audio_data).decode()
-
+                                ulaw = inbound_audio.convert(audio)
                                 await openai_ws.send(
-                                    json.dumps(
-                                        {
-                                            "type": "input_audio_buffer.append",
-                                            "audio": audio_b64,
-                                        }
-                                    )
+                                    openai_append_frame(base64.b64encode(ulaw).decode())
                                 )
                             except Exception as e:
                                 logger.error(f"Error processing Vonage audio: {e}")
 
+                        # Text frames: events such as websocket:connected
+                        elif message.get("text"):
+                            event = json_codec.loads(message["text"])
+                            logger.info(f"Vonage websocket event: {event.get('event')}")
+
                 except WebSocketDisconnect:
                     logger.info("Vonage WebSocket disconnected")
                     call_ended = True
@@ -399,7 +426,7 @@ def setup_vonage_routes(app: FastAPI):
                     logger.info("receive_from_vonage task ending")
 
             async def send_to_vonage():
-                nonlocal call_uuid, last_assistant_item, response_start_timestamp, call_ended
+                nonlocal last_assistant_item, response_start_timestamp, call_ended
                 logger.info("Starting send_to_vonage task")
                 try:
                     async for openai_message in openai_ws:
@@ -407,7 +434,7 @@ def setup_vonage_routes(app: FastAPI):
                             logger.info("Call has ended, stopping send_to_vonage")
                             break
 
-                        response = json.loads(openai_message)
+                        response = json_codec.loads(openai_message)
 
                         if response.get("type") == "session.created":
                             logger.info("OpenAI session created successfully")
@@ -421,9 +448,9 @@ def setup_vonage_routes(app: FastAPI):
                             == "conversation.item.input_audio_transcription.completed"
                         ):
                             transcript_text = response.get("transcript", "").strip()
-                            if transcript_text and call_uuid in conversation_logs:
+                            if transcript_text:
                                 logger.info(f"🎤 User: {transcript_text}")
-                                conversation_logs[call_uuid].append(
+                                session.conversation_log.append(
                                     {"speaker": "user", "text": transcript_text}
                                 )
 
@@ -436,11 +463,8 @@ def setup_vonage_routes(app: FastAPI):
                                             part.get("type") == "audio"
                                             and "transcript" in part
                                         ):
-                                            if (
-                                                part["transcript"]
-                                                and call_uuid in conversation_logs
-                                            ):
-                                                conversation_logs[call_uuid].append(
+                                            if part["transcript"]:
+                                                session.conversation_log.append(
                                                     {
                                                         "speaker": "assistant",
                                                         "text": part["transcript"],
@@ -453,12 +477,12 @@ def setup_vonage_routes(app: FastAPI):
                         if response.get("type") == "response.audio.delta":
                             try:
                                 # OpenAI:lta tuleva audio muLaw 8kHz -> L16 16kHz Vonagelle
-                                audio_data = base64.b64decode(response["delta"])
-                                # Tässäkin tarvittaisiin kunnollinen resämplöinti
-                                audio_b64 = base64.b64encode(audio_data).decode()
-
-                                # Lähetä Vonagelle
-                                await websocket.send_text(audio_b64)
+                                pcm = outbound_audio.convert(
+                                    base64.b64decode(response["delta"])
+                                )
+                                # Vonage expects exactly 640 byte (20 ms) binary frames
+                                for frame in outbound_frames.push(pcm):
+                                    await websocket.send_bytes(frame)
 
                                 if response_start_timestamp is None:
                                     response_start_timestamp = latest_media_timestamp
@@ -504,7 +528,8 @@ def setup_vonage_routes(app: FastAPI):
                         "content_index": 0,
                         "audio_end_ms": elapsed,
                     }
-                    await openai_ws.send(json.dumps(truncate_event))
+                    await openai_ws.send(json_codec.dumps(truncate_event))
+                    outbound_frames.clear()
                 except Exception as e:
                     logger.error(f"Error truncating response: {e}")
                 finally:
@@ -545,11 +570,11 @@ def setup_vonage_routes(app: FastAPI):
             except Exception:
                 pass
 
-            if call_uuid:
-                await save_conversation_log(call_uuid)
+            await save_conversation_log(session)
+            call_sessions.remove(session)
 
 
-async def initialize_session(openai_ws):
+async def initialize_session(openai_ws, session: CallSession):
     """Initialize OpenAI session for Finnish interview"""
     session_update = {
         "type": "session.update",
@@ -557,17 +582,18 @@ async def initialize_session(openai_ws):
             "turn_detection": {
                 "type": "server_vad",
             },
-            "input_audio_format": "g711_ulaw",  # Tämä pitää ehkä muuttaa L16:ksi
-            "output_audio_format": "g711_ulaw",  # Tämä pitää ehkä muuttaa L16:ksi
+            # Vonage L16 16 kHz is transcoded to/from µ-law in audio_codec.py
+            "input_audio_format": "g711_ulaw",
+            "output_audio_format": "g711_ulaw",
             "voice": VOICE,
-            "instructions": SYSTEM_MESSAGE,
+            "instructions": session.system_prompt or SYSTEM_MESSAGE,
             "modalities": ["text", "audio"],
             "temperature": 0.8,
         },
     }
 
     logger.info("Initializing OpenAI session for Vonage integration")
-    await openai_ws.send(json.dumps(session_update))
+    await openai_ws.send(json_codec.dumps(session_update))
 
     create_message = {
         "type": "response.create",
@@ -576,41 +602,30 @@ async def initialize_session(openai_ws):
             "prompt": "Start the interview immediately by greeting the interviewee in Finnish and explaining the topic. Remember to speak ONLY Finnish.",
         },
     }
-    await openai_ws.send(json.dumps(create_message))
+    await openai_ws.send(json_codec.dumps(create_message))
     logger.info("Interview started via OpenAI")
 
 
-async def save_conversation_log(call_uuid):
+async def save_conversation_log(session: CallSession):
     """Save conversation log using call_uuid instead of stream_sid"""
+    call_uuid = session.call_id
     try:
-        if call_uuid not in conversation_logs or not conversation_logs[call_uuid]:
+        if not session.conversation_log:
             logger.info(f"No conversation log found for call_uuid {call_uuid}")
             return
 
-        conversation_log = conversation_logs.pop(call_uuid)
-
-        log_dir = "conversations_log"
-        os.makedirs(log_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_filepath = os.path.join(
-            log_dir, f"conversation_log_{call_uuid}_{timestamp}.json"
-        )
-
-        with open(log_filepath, "w", encoding="utf-8") as f:
-            json.dump(conversation_log, f, ensure_ascii=False, indent=2)
+        conversation_log = session.conversation_log
 
         dialogue_turns = []
         for speaker, group in groupby(conversation_log, key=lambda x: x["speaker"]):
             texts = [msg["text"] for msg in group]
             dialogue_turns.append({"speaker": speaker, "text": "\n".join(texts)})
 
-        turns_filepath = os.path.join(
-            log_dir, f"conversation_turns_{call_uuid}_{timestamp}.json"
+        conversation_log_writer.submit(
+            conversation_record("vonage", call_uuid, conversation_log, dialogue_turns)
         )
-        with open(turns_filepath, "w", encoding="utf-8") as f:
-            json.dump(dialogue_turns, f, ensure_ascii=False, indent=2)
 
-        logger.info(f"Vonage conversation log saved: {len(conversation_log)} messages")
+        logger.info(f"Vonage conversation log queued: {len(conversation_log)} messages")
 
     except Exception as e:
         logger.error(f"Error saving Vonage conversation log: {e}")
@@ -0,0 +1,329 @@
+# webhooks.py
+import os
+import random
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import asyncpg
+import httpx
+
+import json_codec
+from database import get_db_pool
+from statements import registry
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", 15))
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", 4))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 20))
+WEBHOOK_POLL_INTERVAL_SECONDS = float(os.getenv("WEBHOOK_POLL_INTERVAL_SECONDS", 5))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 25))
+WEBHOOK_RETRY_DELAY_SECONDS = float(os.getenv("WEBHOOK_RETRY_DELAY_SECONDS", 2))
+WEBHOOK_MAX_RETRY_DELAY_SECONDS = float(os.getenv("WEBHOOK_MAX_RETRY_DELAY_SECONDS", 3600))
+# A claimed row is due again after this long if its worker never reports back
+WEBHOOK_LEASE_SECONDS = float(os.getenv("WEBHOOK_LEASE_SECONDS", 60))
+
+ENQUEUE_SQL = """
+    INSERT INTO webhook_outbox (event, url, payload)
+    VALUES ($1, $2, $3::jsonb)
+    RETURNING id
+"""
+
+# SKIP LOCKED lets several workers claim disjoint batches
+CLAIM_DUE_SQL = """
+    UPDATE webhook_outbox o
+    SET attempts = o.attempts + 1,
+        next_attempt_at = NOW() + make_interval(secs => $2)
+    FROM (
+        SELECT id FROM webhook_outbox
+        WHERE delivered_at IS NULL AND failed_at IS NULL AND next_attempt_at <= NOW()
+        ORDER BY next_attempt_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    ) due
+    WHERE o.id = due.id
+    RETURNING o.id, o.event, o.url, o.payload::text AS payload, o.attempts
+"""
+
+MARK_DELIVERED_SQL = """
+    UPDATE webhook_outbox
+    SET delivered_at = NOW(), last_error = NULL
+    WHERE id = $1
+"""
+
+MARK_RETRY_SQL = """
+    UPDATE webhook_outbox
+    SET next_attempt_at = NOW() + make_interval(secs => $2), last_error = $3
+    WHERE id = $1
+"""
+
+MARK_FAILED_SQL = """
+    UPDATE webhook_outbox
+    SET failed_at = NOW(), last_error = $2
+    WHERE id = $1
+"""
+
+PENDING_SQL = """
+    SELECT COUNT(*) FROM webhook_outbox
+    WHERE delivered_at IS NULL AND failed_at IS NULL
+"""
+
+registry.define("webhook_outbox.enqueue", ENQUEUE_SQL)
+registry.define("webhook_outbox.claim", CLAIM_DUE_SQL)
+registry.define("webhook_outbox.delivered", MARK_DELIVERED_SQL)
+registry.define("webhook_outbox.retry", MARK_RETRY_SQL)
+registry.define("webhook_outbox.failed", MARK_FAILED_SQL)
+registry.define("webhook_outbox.pending", PENDING_SQL)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter after `attempts` failed deliveries"""
+    delay = min(WEBHOOK_RETRY_DELAY_SECONDS * 2 ** (attempts - 1), WEBHOOK_MAX_RETRY_DELAY_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class WebhookDispatcher:
+    """
+    Delivers the webhook outbox over one long-lived pooled HTTP client.
+
+    Due rows are claimed in batches with a lease and posted with at most
+    `concurrency` requests in flight; failures are rescheduled with
+    exponential backoff until max_attempts. Delivery is at least once: the
+    X-Webhook-Id header lets receivers drop duplicates.
+    """
+
+    def __init__(
+        self,
+        interval: float = WEBHOOK_POLL_INTERVAL_SECONDS,
+        batch_size: int = WEBHOOK_BATCH_SIZE,
+        concurrency: int = WEBHOOK_CONCURRENCY,
+        timeout: float = WEBHOOK_TIMEOUT_SECONDS,
+        max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+        lease_seconds: float = WEBHOOK_LEASE_SECONDS,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.delivered = 0
+        self.failed_attempts = 0
+        self.gave_up = 0
+        self.errors = 0
+        self.pending: Optional[int] = None
+        self.outbox_available = True
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._direct: Set[asyncio.Task] = set()
+        self._latency_ms: List[float] = []
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = [self._task, *self._direct] if self._task else list(self._direct)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self._client.aclose()
+
+    def wake(self):
+        """Deliver newly enqueued rows now instead of at the next poll"""
+        self._wake.set()
+
+    async def post(self, outbox_id: Optional[int], event: str, url: str, payload: str):
+        """One delivery attempt; raises on a network error or non-2xx response"""
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Secret": os.getenv("WEBHOOK_SECRET", ""),
+            "X-Webhook-Event": event,
+        }
+        if outbox_id is not None:
+            headers["X-Webhook-Id"] = str(outbox_id)
+        async with self._semaphore:
+            started = asyncio.get_running_loop().time()
+            try:
+                response = await self._client.post(url, content=payload, headers=headers)
+                response.raise_for_status()
+            finally:
+                self._record_latency((asyncio.get_running_loop().time() - started) * 1000)
+
+    def _record_latency(self, elapsed_ms: float):
+        self._latency_ms.append(elapsed_ms)
+        if len(self._latency_ms) > 1000:
+            del self._latency_ms[:500]
+
+    async def dispatch_batch(self) -> int:
+        """Claim and deliver one batch of due rows; returns the batch size"""
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            rows = await registry.fetch(
+                conn, "webhook_outbox.claim", self.batch_size, self.lease_seconds
+            )
+        # No connection is held while the HTTP requests are in flight
+        await asyncio.gather(*(self._deliver(row) for row in rows))
+
+        async with pool.acquire() as conn:
+            self.pending = await registry.fetchval(conn, "webhook_outbox.pending")
+        return len(rows)
+
+    async def _deliver(self, row: asyncpg.Record):
+        try:
+            await self.post(row["id"], row["event"], row["url"], row["payload"])
+        except Exception as e:
+            self.failed_attempts += 1
+            error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"[:1000]
+            pool = await get_db_pool()
+            async with pool.acquire() as conn:
+                if row["attempts"] >= self.max_attempts:
+                    self.gave_up += 1
+                    logger.error(
+                        f"Webhook {row['id']} ({row['event']}) failed {row['attempts']} times, giving up: {error}"
+                    )
+                    await registry.fetch(conn, "webhook_outbox.failed", row["id"], error)
+                else:
+                    delay = retry_delay(row["attempts"])
+                    logger.warning(
+                        f"Webhook {row['id']} ({row['event']}) failed, retrying in {delay:.0f}s: {error}"
+                    )
+                    await registry.fetch(conn, "webhook_outbox.retry", row["id"], delay, error)
+            return
+
+        self.delivered += 1
+        logger.info(f"✅ Webhook {row['id']} ({row['event']}) delivered")
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            await registry.fetch(conn, "webhook_outbox.delivered", row["id"])
+
+    def deliver_direct(self, event: str, url: str, payload: str):
+        """Best-effort in-memory delivery, for when the outbox table is missing"""
+        task = asyncio.create_task(self._deliver_direct(event, url, payload))
+        self._direct.add(task)
+        task.add_done_callback(self._direct.discard)
+
+    async def _deliver_direct(self, event: str, url: str, payload: str):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.post(None, event, url, payload)
+                self.delivered += 1
+                return
+            except Exception as e:
+                self.failed_attempts += 1
+                logger.warning(f"Webhook ({event}) failed, attempt {attempt}: {e}")
+                await asyncio.sleep(retry_delay(attempt))
+        self.gave_up += 1
+        logger.error(f"Webhook ({event}) not delivered, payload lost: {payload}")
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                while await self.dispatch_batch() == self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except asyncpg.exceptions.UndefinedTableError:
+                self.outbox_available = False
+                logger.warning("webhook_outbox table missing, webhooks are delivered in memory only")
+                return
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Webhook dispatch failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Delivery counters and latency for /metrics"""
+        latencies = sorted(self._latency_ms)
+        return {
+            "outbox": self.outbox_available,
+            "pending": self.pending,
+            "delivered": self.delivered,
+            "failed_attempts": self.failed_attempts,
+            "gave_up": self.gave_up,
+            "dispatch_errors": self.errors,
+            "in_memory": len(self._direct),
+            "p50_ms": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "max_ms": round(latencies[-1], 3) if latencies else None,
+        }
+
+
+dispatcher: Optional[WebhookDispatcher] = None
+
+
+class PendingWebhook:
+    """
+    A webhook enqueued inside a transaction. release() once the transaction
+    has committed: it wakes the dispatcher, or, when the outbox table is
+    missing, starts the in-memory delivery. A rolled back transaction never
+    releases it, so its webhook is never sent.
+    """
+
+    __slots__ = ("id", "_direct")
+
+    def __init__(self, outbox_id: Optional[int], direct: Optional[Tuple[str, str, str]] = None):
+        self.id = outbox_id
+        self._direct = direct
+
+    def release(self):
+        if self._direct is None:
+            notify_webhooks()
+        elif dispatcher is not None:
+            dispatcher.deliver_direct(*self._direct)
+
+
+async def enqueue_webhook(conn, event: str, url: str, payload: Any) -> PendingWebhook:
+    """
+    Add a webhook to the outbox on `conn`, inside the caller's transaction so
+    it commits or rolls back with the change it reports. Call release() on
+    the result after the commit.
+    """
+    try:
+        # Savepoint: a missing outbox table must not abort the caller's transaction
+        async with conn.transaction():
+            # The pool's jsonb codec encodes the payload
+            return PendingWebhook(
+                await registry.fetchval(conn, "webhook_outbox.enqueue", event, url, payload)
+            )
+    except asyncpg.exceptions.UndefinedTableError:
+        logger.warning("webhook_outbox table missing, webhook will be delivered in memory")
+        return PendingWebhook(None, (event, url, json_codec.dumps(payload)))
+
+
+def notify_webhooks():
+    if dispatcher is not None:
+        dispatcher.wake()
+
+
+def webhook_stats() -> Optional[Dict[str, Any]]:
+    return dispatcher.stats() if dispatcher else None
+
+
+async def start_webhook_dispatcher():
+    global dispatcher
+    if dispatcher is None:
+        dispatcher = WebhookDispatcher()
+        dispatcher.start()
+
+
+async def stop_webhook_dispatcher():
+    global dispatcher
+    if dispatcher is not None:
+        await dispatcher.stop()
+        dispatcher = None